@@ -2,17 +2,25 @@ from typing import List, Dict, Any, Optional, AsyncGenerator
 from app.services.openrouter_client import OpenRouterClient
 from app.services.openrouter_fallback_client import OpenRouterFallbackClient
 from app.services.mock_client import MockOpenRouterClient
+from app.services.rate_limiter import RateLimited
 from app.services.session_manager import session_manager
-from app.models.database import ChatHistory, AsyncSessionLocal
+from app.services.session_compactor import session_compactor
+from app.services.session_unit_of_work import SessionUnitOfWork
+from app.services.history_writer import history_writer
+from app.services.chat_history import get_history_page
 from app.core.config import settings
-from sqlalchemy import select
-import json
+from app.core.model_config import estimate_cost
+from app.core.metrics import llm_served, chat_turn_duration, record_usage
+from app.core.tracing import span
 import logging
 import asyncio
+import time
 from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "You are a helpful AI assistant with access to various tools. Remember the conversation context and user information shared in previous messages."
+
 
 class ChatAgent:
     def __init__(self, use_fallback: bool = True):
@@ -26,34 +34,29 @@ class ChatAgent:
         self.mock_client = MockOpenRouterClient()
         self.use_mock_mode = False
         
-    async def process_message(
-        self,
-        session_id: str,
-        user_message: str,
-        use_tools: bool = True
-    ) -> Dict[str, Any]:
-        """Process a user message and return response with tool usage info"""
-        
-        # Save user message to session FIRST
-        await session_manager.add_message(
-            session_id,
-            "user",
-            user_message
-        )
-        
-        # Get session context (now includes the new message)
-        messages = await session_manager.get_messages(session_id, limit=10)
-        
-        # Convert to OpenAI format
+    def _build_chat_messages(self, session_data: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Convert session data to OpenAI format messages"""
         chat_messages = []
         
         # Add system message first
         chat_messages.append({
             "role": "system",
-            "content": "You are a helpful AI assistant with access to various tools. Remember the conversation context and user information shared in previous messages."
+            "content": SYSTEM_PROMPT
         })
         
+        if not session_data:
+            return chat_messages
+        
+        # Running summary of compacted older turns
+        summary = session_data.get("context", {}).get("summary")
+        if summary:
+            chat_messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}"
+            })
+        
         # Add conversation history
+        messages = session_data.get("messages", [])[-settings.context_history_messages:]
         for msg in messages:
             if msg["role"] in ["user", "assistant"]:
                 chat_messages.append({
@@ -61,6 +64,36 @@ class ChatAgent:
                     "content": msg["content"]
                 })
         
+        return chat_messages
+    
+    async def process_message(
+        self,
+        session_id: str,
+        user_message: str,
+        use_tools: bool = True,
+        use_cache: bool = False,
+        session: Optional[SessionUnitOfWork] = None,
+        temperature: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a user message and return response with tool usage info
+        
+        session이 주어지면 호출자의 unit of work에 변경 사항을 모으고, 없으면 직접 열어서 반영한다.
+        temperature가 None이면 settings.temperature (completion cache는 기본적으로 temperature=0만 사용).
+        """
+        if session is None:
+            async with session_manager.unit_of_work(session_id) as session:
+                return await self.process_message(session_id, user_message, use_tools, use_cache, session, temperature)
+        session_id = session.session_id
+        started = time.perf_counter()
+        
+        # Save user message to session FIRST
+        session.add_message("user", user_message)
+        
+        # Session history (now includes the new message) - the client packs it per model window
+        with span("context_build"):
+            chat_messages = self._build_chat_messages(session.data)
+        
         # Get response from OpenRouter (with rate limit handling)
         response = None
         
@@ -77,17 +110,22 @@ class ChatAgent:
                     # Fallback client 사용
                     response = await self.openrouter_client.chat_completion_with_fallback(
                         messages=chat_messages,
-                        use_tools=use_tools
+                        use_tools=use_tools,
+                        temperature=temperature,
+                        use_cache=use_cache
                     )
                 else:
                     # 기존 client 사용
                     if use_tools:
                         response = await self.openrouter_client.chat_completion_with_tools(
-                            messages=chat_messages
+                            messages=chat_messages,
+                            temperature=temperature
                         )
                     else:
                         response = await self.openrouter_client.simple_chat_completion(
-                            messages=chat_messages
+                            messages=chat_messages,
+                            temperature=temperature,
+                            use_cache=use_cache
                         )
                 
                 # Rate limit 감지
@@ -101,6 +139,9 @@ class ChatAgent:
                             use_tools=use_tools
                         )
                         
+            except RateLimited:
+                # 로컬 한도로 요청을 보내지 않음 - upstream 장애가 아니므로 mock 모드로 바꾸지 않음 (503)
+                raise
             except Exception as e:
                 error_msg = str(e)
                 if "Rate limit exceeded" in error_msg or "429" in error_msg:
@@ -117,10 +158,15 @@ class ChatAgent:
         content = response.get("content", "") if response else ""
         tool_calls = response.get("tool_calls", []) if response else []
         usage = response.get("usage", {}) if response else {}
-        model_used = response.get("model_used", settings.default_model) if response else settings.default_model
+        model_used = (response.get("model_used") if response else None) or settings.default_model
+        cached = response.get("cached", False) if response else False
+        
+        llm_served.labels(model=model_used, mode="cached" if cached else "complete").inc()
+        if not cached:
+            record_usage(model_used, usage)
+        chat_turn_duration.labels(mode="complete").observe(time.perf_counter() - started)
         
-        await session_manager.add_message(
-            session_id,
+        session.add_message(
             "assistant",
             content,
             metadata={
@@ -130,8 +176,11 @@ class ChatAgent:
             }
         )
         
-        # 백그라운드로 DB 저장 (성능 향상)
-        asyncio.create_task(self._save_to_database(
+        # 세션이 길어졌으면 반영 후 백그라운드에서 요약
+        session.on_commit(lambda: session_compactor.schedule(session_id))
+        
+        # DB 저장은 write-behind 큐로 (writer가 모아서 commit)
+        await self._save_to_database(
             session_id=session_id,
             user_message=user_message,
             assistant_message=content,
@@ -142,49 +191,39 @@ class ChatAgent:
                 "usage": usage,
                 "model": model_used
             }
-        ))
+        )
         
         return {
             "content": content,
             "tool_calls": tool_calls,
             "usage": usage,
-            "model_used": model_used
+            "model_used": model_used,
+            "cached": cached
         }
     
     async def process_message_stream(
         self,
         session_id: str,
         user_message: str,
-        use_tools: bool = True
+        use_tools: bool = True,
+        session: Optional[SessionUnitOfWork] = None,
+        temperature: Optional[float] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """Process a user message with streaming response"""
+        if session is None:
+            async with session_manager.unit_of_work(session_id) as session:
+                async for chunk in self.process_message_stream(session_id, user_message, use_tools, session, temperature):
+                    yield chunk
+            return
+        session_id = session.session_id
+        started = time.perf_counter()
         
         # Save user message to session FIRST
-        await session_manager.add_message(
-            session_id,
-            "user",
-            user_message
-        )
-        
-        # Get session context (now includes the new message)
-        messages = await session_manager.get_messages(session_id, limit=10)
-        
-        # Convert to OpenAI format
-        chat_messages = []
+        session.add_message("user", user_message)
         
-        # Add system message first
-        chat_messages.append({
-            "role": "system",
-            "content": "You are a helpful AI assistant with access to various tools. Remember the conversation context and user information shared in previous messages."
-        })
-        
-        # Add conversation history
-        for msg in messages:
-            if msg["role"] in ["user", "assistant"]:
-                chat_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+        # Session history (now includes the new message) - the client packs it per model window
+        with span("context_build"):
+            chat_messages = self._build_chat_messages(session.data)
         
         try:
             # Stream response from client
@@ -206,27 +245,42 @@ class ChatAgent:
                 
                 yield {"type": "done", "model_used": response.get("model_used", "unknown")}
                 
-                # Save to session and DB in background
-                asyncio.create_task(self._save_stream_result(
-                    session_id, content, response.get("tool_calls", []), 
+                # Save to session and DB
+                await self._save_stream_result(
+                    session, content, response.get("tool_calls", []),
                     response.get("usage", {}), response.get("model_used", "unknown")
-                ))
+                )
             else:
                 # Real streaming from OpenRouter
                 if isinstance(self.openrouter_client, OpenRouterFallbackClient):
                     # Streaming with fallback
+                    content_parts = []
+                    tool_calls = []
+                    model_used = None
                     async for chunk in self.openrouter_client.stream_chat_completion_with_fallback(
                         messages=chat_messages,
-                        use_tools=use_tools
+                        use_tools=use_tools,
+                        temperature=temperature
                     ):
+                        if chunk["type"] == "token":
+                            content_parts.append(chunk["content"])
+                        elif chunk["type"] == "tool_result":
+                            tool_calls.append({"tool_name": chunk["tool"], "result": chunk["result"]})
+                        elif chunk["type"] == "done":
+                            model_used = chunk.get("model_used")
                         yield chunk
+                    
+                    if model_used:
+                        await self._save_stream_result(session, "".join(content_parts), tool_calls, {}, model_used)
                 else:
                     # Direct streaming (not implemented yet in base client)
                     # Fall back to non-streaming for now
                     response = await self.openrouter_client.chat_completion_with_tools(
-                        messages=chat_messages
+                        messages=chat_messages,
+                        temperature=temperature
                     ) if use_tools else await self.openrouter_client.simple_chat_completion(
-                        messages=chat_messages
+                        messages=chat_messages,
+                        temperature=temperature
                     )
                     
                     content = response.get("content", "")
@@ -234,22 +288,32 @@ class ChatAgent:
                         yield {"type": "token", "content": content[i:i+10]}
                         await asyncio.sleep(0.01)
                     
-                    yield {"type": "done", "model_used": response.get("model_used", settings.default_model)}
+                    model_used = response.get("model_used", settings.default_model)
+                    yield {"type": "done", "model_used": model_used}
+                    
+                    await self._save_stream_result(
+                        session, content, response.get("tool_calls", []),
+                        response.get("usage", {}), model_used
+                    )
                     
+        except RateLimited as e:
+            yield {"type": "error", "error": str(e), "retry_after": e.retry_after}
         except Exception as e:
             yield {"type": "error", "error": str(e)}
+        finally:
+            chat_turn_duration.labels(mode="stream").observe(time.perf_counter() - started)
     
     async def _save_stream_result(
         self,
-        session_id: str,
+        session: SessionUnitOfWork,
         content: str,
         tool_calls: List[Dict],
         usage: Dict,
         model_used: str
     ):
-        """Save streaming result to session and database"""
-        await session_manager.add_message(
-            session_id,
+        """Save streaming result to session (on commit) and database (write-behind queue)"""
+        session_id = session.session_id
+        session.add_message(
             "assistant",
             content,
             metadata={
@@ -258,6 +322,9 @@ class ChatAgent:
                 "model_used": model_used
             }
         )
+        session.on_commit(lambda: session_compactor.schedule(session_id))
+        llm_served.labels(model=model_used, mode="stream").inc()
+        record_usage(model_used, usage)
         
         # Save to database
         await self._save_to_database(
@@ -281,19 +348,20 @@ class ChatAgent:
         tools_used: List[str],
         metadata: Dict[str, Any]
     ):
-        """Save chat history to database"""
-        async with AsyncSessionLocal() as db:
-            chat_history = ChatHistory(
+        """Queue chat history row (saved in batches by history_writer)"""
+        model_used = metadata.get("model", "unknown")
+        usage = metadata.get("usage") or {}
+        with span("history_enqueue"):
+            await history_writer.submit(
                 session_id=session_id,
                 user_message=user_message,
                 assistant_message=assistant_message,
                 tools_used=tools_used,
-                model_used=metadata.get("model", "unknown"),
-                tokens_used=metadata.get("usage", {}).get("total_tokens"),
-                metadata=metadata
+                model_used=model_used,
+                tokens_used=usage.get("total_tokens"),
+                cost=estimate_cost(model_used, usage),
+                extra_metadata=metadata
             )
-            db.add(chat_history)
-            await db.commit()
     
     async def get_chat_history(
         self,
@@ -302,45 +370,8 @@ class ChatAgent:
     ) -> List[Dict[str, Any]]:
         """Get chat history from database"""
         try:
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(
-                    select(ChatHistory)
-                    .where(ChatHistory.session_id == session_id)
-                    .order_by(ChatHistory.created_at.desc())
-                    .limit(limit)
-                )
-                
-                history = []
-                for chat in result.scalars():
-                    # Safely handle metadata
-                    metadata = chat.metadata if chat.metadata else {}
-                    if isinstance(metadata, str):
-                        try:
-                            metadata = json.loads(metadata)
-                        except:
-                            metadata = {}
-                    
-                    # Safely handle tools_used
-                    tools_used = chat.tools_used if chat.tools_used else []
-                    if isinstance(tools_used, str):
-                        try:
-                            tools_used = json.loads(tools_used)
-                        except:
-                            tools_used = []
-                    
-                    history.append({
-                        "id": chat.id,
-                        "user_message": chat.user_message or "",
-                        "assistant_message": chat.assistant_message or "",
-                        "tools_used": tools_used,
-                        "model_used": chat.model_used or "unknown",
-                        "created_at": chat.created_at.isoformat() if chat.created_at else "",
-                        "metadata": metadata
-                    })
-                
-                # Reverse to get chronological order
-                return history[::-1]
-                
+            history, _ = await get_history_page(session_id, limit)
+            return history
         except Exception as e:
             logger.error(f"Error getting chat history: {str(e)}")
             return []
\ No newline at end of file
@@ -13,12 +13,12 @@ from langchain.schema import BaseMessage
 
 from app.core.config import settings
 from app.core.model_config import model_manager
+from app.services.http_client import get_openai_client
 from app.tools.calculator import CalculatorTool
 from app.tools.search import SearchTool
 from app.tools.weather import WeatherTool
 from app.tools.web_search import WebSearchTool
 import logging
-import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -48,7 +48,7 @@ class LangChainAgent:
         
     def _create_llm(self, model_id: str):
         """LLM 인스턴스 생성"""
-        return ChatOpenAI(
+        llm = ChatOpenAI(
             base_url=settings.openrouter_base_url,
             api_key=settings.openrouter_api_key,
             model=model_id,
@@ -57,6 +57,9 @@ class LangChainAgent:
             streaming=True,
             callbacks=[StreamingStdOutCallbackHandler()]
         )
+        # 비동기 호출은 프로세스 전역 커넥션 풀을 공유
+        llm.async_client = get_openai_client().chat.completions
+        return llm
         
     def _initialize_tools(self) -> List[Tool]:
         """도구들을 초기화"""
@@ -7,6 +7,7 @@ from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, AIMessage, SystemMessage
 from langchain.memory import ConversationBufferMemory
 from app.core.config import settings
+from app.services.http_client import get_openai_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,6 +31,8 @@ class SimpleAgent:
             temperature=settings.temperature,
             max_tokens=settings.max_tokens
         )
+        # 비동기 호출은 프로세스 전역 커넥션 풀을 공유
+        self.llm.async_client = get_openai_client().chat.completions
         
         # Agent의 시스템 프롬프트
         self.system_prompt = """You are a helpful AI assistant with the following capabilities:
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -13,12 +13,43 @@ class Settings(BaseSettings):
     openrouter_api_key: str
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
     
+    # HTTP Transport (모든 OpenRouter 요청이 공유하는 커넥션 풀)
+    http2_enabled: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout_seconds: float = 30.0
+    http_connect_timeout_seconds: float = 5.0
+    
+    # Serialization
+    json_backend: str = "auto"  # auto(orjson이 있으면 사용) | orjson | json
+    
     # Database
     database_url: str = "sqlite+aiosqlite:///./chat_history.db"
+    sqlite_performance_mode: bool = True  # WAL + synchronous=NORMAL + mmap/cache PRAGMA
+    sqlite_cache_size_kb: int = 64 * 1024  # 연결당 page cache (64MB)
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_read_pool_size: int = 4  # 조회 전용 연결 수 (쓰기는 연결 1개)
+    history_queue_max_size: int = 10000  # ChatHistory write-behind 큐 크기 (가득 차면 요청이 대기)
+    history_batch_size: int = 200  # 한 번에 commit하는 최대 행 수
+    history_flush_interval_seconds: float = 0.05  # 배치를 모으는 최대 대기 시간
+    history_write_retries: int = 3  # batch 저장 실패 시 재시도 횟수 (이후 행 단위로 저장)
+    history_retry_backoff_seconds: float = 0.1  # 재시도 대기 시간 (재시도마다 2배)
+    history_export_batch_size: int = 500  # NDJSON export 시 한 번에 읽는 행 수
     
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     redis_session_ttl: int = 3600
+    session_max_messages: int = 20  # 세션에 보관하는 최근 메시지 수 (전체 기록은 SQLite)
+    session_backend: str = "memory"  # memory | redis | redis_cached (프로세스 내 캐시 + client tracking) | mock
+    session_cache_max_entries: int = 1000  # redis_cached 로컬 캐시 크기
+    session_cache_max_connections: int = 16  # redis_cached 연결 pool 크기 (연결마다 client tracking)
+    session_max_sessions: int = 10000  # memory backend 세션 수 상한 (LRU 제거)
+    session_max_bytes: int = 256 * 1024 * 1024  # memory backend 대략적인 메모리 상한
+    session_sweep_interval_seconds: float = 60.0  # memory backend 만료 세션 정리 주기
+    session_compression: str = "zstd"  # zstd | lz4 | none (라이브러리가 없으면 압축하지 않음)
+    session_compress_min_bytes: int = 512  # 이 크기 이상의 세션 값만 압축
     
     # Application
     app_name: str = "Agent LLM POC"
@@ -26,6 +57,8 @@ class Settings(BaseSettings):
     app_host: str = "0.0.0.0"
     app_port: int = 8000
     log_level: str = "INFO"
+    metrics_enabled: bool = True  # GET /metrics (Prometheus)
+    tracing_enabled: bool = True  # 요청별 단계 시간 (Server-Timing 헤더 + request_trace 로그)
     
     # Model
     default_model: str = "moonshotai/kimi-k2:free"  # OpenRouter 무료 Agent 최적화 모델
@@ -33,14 +66,64 @@ class Settings(BaseSettings):
     temperature: float = 0.7
     
     # Agent Configuration
-    agent_timeout: int = 300
-    max_agents: int = 10
+    agent_timeout: int = 300  # 채팅 턴 하나의 최대 처리 시간 (초과 시 504 / 스트림 error 이벤트)
+    max_agents: int = 10  # 동시에 처리하는 채팅 턴 수 (admission control)
+    admission_enabled: bool = True
+    admission_queue_size: int = 20  # max_agents를 넘은 요청의 대기열 길이 (가득 차면 즉시 503)
+    admission_max_wait_seconds: float = 10.0  # 대기열에서 기다리는 최대 시간 (초과 시 503)
     
     # Model Fallback Configuration
     fallback_enabled: bool = True
     fallback_free_only: bool = True
     fallback_models: str = "deepseek/deepseek-chat-v3-0324:free,google/gemini-2.0-flash-exp:free,qwen/qwen3-235b-a22b-07-25:free"
     
+    # Context Packing (모델별 context window에 맞춰 대화 기록 구성)
+    context_history_messages: int = 20  # 세션에서 가져올 최대 메시지 수
+    context_safety_margin_tokens: int = 256  # 토큰 추정 오차 여유분
+    
+    # Session Compaction (오래된 대화를 요약으로 대체, 백그라운드 실행)
+    compaction_enabled: bool = True
+    compaction_trigger_tokens: int = 3000  # 세션 메시지 토큰 합이 이 값을 넘으면 요약 (session_max_messages에 가까워져도 요약)
+    compaction_keep_messages: int = 6  # 요약하지 않고 남길 최근 메시지 수
+    compaction_summary_max_chars: int = 2000
+    compaction_use_llm: bool = False  # False면 추출 요약 사용
+    
+    # Tool Loop (요청당 tool round 수와 시간 예산)
+    max_tool_rounds: int = 3
+    request_deadline_seconds: float = 90.0
+    answer_now_seconds: float = 15.0  # 남은 시간이 이보다 적으면 tool 없이 바로 답변
+    
+    # Hedged Requests (느린 모델 대기 중 다음 모델로 동시 요청)
+    hedge_enabled: bool = False
+    hedge_delay_seconds: float = 5.0  # p95 샘플이 부족할 때 사용하는 기본 지연
+    hedge_use_p95: bool = True  # 모델별 p95 latency를 hedge 지연으로 사용
+    hedge_min_samples: int = 20  # p95 계산에 필요한 최소 샘플 수
+    hedge_max_in_flight: int = 1  # 요청당 동시에 추가로 보낼 수 있는 hedge 수
+    
+    # Completion Cache
+    completion_cache_max_entries: int = 1000
+    completion_cache_ttl_seconds: int = 600
+    completion_cache_redis_enabled: bool = False  # Redis 2차 캐시 사용
+    completion_cache_allow_nondeterministic: bool = False  # temperature > 0 응답도 캐시
+    
+    # Tool Result Cache (TTL/크기 정책은 각 Tool 클래스에 선언)
+    tool_cache_enabled: bool = True
+    tool_cache_sqlite_path: Optional[str] = None  # 설정 시 재시작 후에도 캐시 유지
+    
+    # Circuit Breaker
+    circuit_failure_threshold: int = 3  # 연속 실패 시 circuit open
+    circuit_cooldown_seconds: float = 30.0  # open 후 시험 요청까지 대기 시간
+    circuit_rate_limit_cooldown_seconds: float = 60.0  # Retry-After가 없을 때 429 대기 시간
+    
+    # Rate Limiter (모델별 token bucket + AIMD 동시성 상한, X-RateLimit-* / Retry-After 헤더로 보정)
+    rate_limit_enabled: bool = True
+    rate_limit_requests_per_minute: float = 0.0  # 헤더로 한도를 알기 전 기본 한도 (0이면 제한 없음)
+    rate_limit_free_requests_per_minute: float = 20.0  # ":free" 모델의 기본 한도
+    rate_limit_burst: int = 5  # bucket 크기
+    rate_limit_max_concurrency: int = 8  # 모델별 동시 요청 상한 (AIMD 최대값)
+    rate_limit_decrease_factor: float = 0.5  # 429마다 속도/동시성에 곱하는 값
+    rate_limit_backoff_seconds: float = 5.0  # 헤더 없는 429의 대기 시간 (연속 429마다 2배)
+    
     @property
     def fallback_models_list(self) -> List[str]:
         """Fallback models as a list"""
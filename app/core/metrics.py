@@ -0,0 +1,166 @@
+"""
+Prometheus metrics
+모든 metric은 여기서 정의하고 각 모듈은 필요한 metric만 import해서 기록함.
+GET /metrics (main.py)에서 기본 registry를 text format으로 내보낸다.
+
+- LLM: 모델별 latency / time to first token, fallback 전환, 429, rate limiter skip, 실제로 응답한 모델
+- Tool: tool별 실행 시간과 에러
+- Streaming: SSE 응답의 초당 token 수
+- Admission: 대기 시간과 503 거절 수
+- Storage: 세션 저장소 / history writer 상태는 scrape 시점에 stats()를 읽는 gauge로 노출
+"""
+from typing import Callable, Dict, Any
+import logging
+
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# LLM 응답은 수 초 ~ 수십 초
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0, 120.0)
+TOOL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HTTP_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+# LLM
+llm_request_duration = Histogram(
+    "llm_request_duration_seconds",
+    "OpenRouter completion latency per model",
+    ["model", "outcome"],
+    buckets=LLM_BUCKETS
+)
+llm_time_to_first_token = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from streaming request to the first content token",
+    ["model"],
+    buckets=LLM_BUCKETS
+)
+llm_fallback_transitions = Counter(
+    "llm_fallback_transitions_total",
+    "Model chain moved on from one model to the next",
+    ["from_model", "to_model", "reason"]
+)
+llm_rate_limited = Counter(
+    "llm_rate_limited_total",
+    "Requests rejected with 429 / rate limit",
+    ["model"]
+)
+llm_rate_limit_skips = Counter(
+    "llm_rate_limit_skips_total",
+    "Model attempts skipped locally by the rate limiter",
+    ["model", "reason"]
+)
+llm_served = Counter(
+    "llm_served_total",
+    "Chat turns answered per model",
+    ["model", "mode"]
+)
+llm_tokens = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the provider",
+    ["model", "kind"]
+)
+
+# Chat
+chat_turn_duration = Histogram(
+    "chat_turn_duration_seconds",
+    "End-to-end chat turn latency in ChatAgent",
+    ["mode"],
+    buckets=LLM_BUCKETS
+)
+chat_stream_tokens_per_second = Histogram(
+    "chat_stream_tokens_per_second",
+    "SSE token events per second from first token to done",
+    ["model"],
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400)
+)
+
+# Admission control (대기열 길이 / 처리 중인 턴 수는 admission.stats() gauge)
+admission_wait = Histogram(
+    "admission_wait_seconds",
+    "Time a chat turn waited in the admission queue",
+    ["outcome"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+admission_rejected = Counter(
+    "admission_rejected_total",
+    "Chat turns rejected with 503 by admission control",
+    ["reason"]
+)
+
+# Tools
+tool_duration = Histogram(
+    "tool_duration_seconds",
+    "Tool execution time",
+    ["tool", "outcome"],
+    buckets=TOOL_BUCKETS
+)
+tool_errors = Counter(
+    "tool_errors_total",
+    "Tool executions that raised or returned an error",
+    ["tool"]
+)
+
+# HTTP
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency per route",
+    ["method", "route", "status"],
+    buckets=HTTP_BUCKETS
+)
+
+
+def record_fallback(from_model: str, to_model: str, reason: str):
+    llm_fallback_transitions.labels(from_model=from_model, to_model=to_model, reason=reason).inc()
+
+
+def record_usage(model: str, usage: Dict[str, Any]):
+    """Provider usage를 token counter에 반영"""
+    if not usage:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens") or 0
+        if tokens:
+            llm_tokens.labels(model=model, kind=kind).inc(tokens)
+
+
+class StatsCollector:
+    """stats() dict의 숫자 값을 scrape 시점에 <prefix>_<key> gauge로 노출"""
+
+    def __init__(self, prefix: str, stats: Callable[[], Dict[str, Any]], documentation: str):
+        self.prefix = prefix
+        self.stats = stats
+        self.documentation = documentation
+
+    def describe(self):
+        # 등록 시점에 stats()를 호출하지 않도록 (이름 중복 검사 생략)
+        return []
+
+    def collect(self):
+        try:
+            stats = self.stats()
+        except Exception as e:
+            logger.warning(f"Failed to collect {self.prefix} stats: {str(e)}")
+            return
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.documentation} ({key})", value=value)
+
+
+_stats_collectors: Dict[str, StatsCollector] = {}
+
+
+def register_stats(prefix: str, stats: Callable[[], Dict[str, Any]], documentation: str):
+    """stats() 제공 객체를 gauge로 등록 (같은 prefix는 한 번만)"""
+    if prefix in _stats_collectors:
+        return
+    collector = StatsCollector(prefix, stats, documentation)
+    REGISTRY.register(collector)
+    _stats_collectors[prefix] = collector
+
+
+def render_latest() -> bytes:
+    return generate_latest(REGISTRY)
+
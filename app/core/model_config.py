@@ -1,7 +1,7 @@
 """
 Model configuration with fallback support
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
 
@@ -14,6 +14,8 @@ class ModelConfig:
     is_free: bool
     context_length: int
     priority: int = 0  # 낮을수록 우선순위 높음
+    prompt_price: float = 0.0  # USD / 1M prompt tokens
+    completion_price: float = 0.0  # USD / 1M completion tokens
 
 
 # OpenRouter에서 사용 가능한 무료 모델들 (Tool 지원 여부 포함)
@@ -57,7 +59,9 @@ AVAILABLE_MODELS = [
         supports_tools=True,
         is_free=False,  # 유료
         context_length=16385,
-        priority=10
+        priority=10,
+        prompt_price=0.5,
+        completion_price=1.5
     ),
     
     # Tool Calling 미지원 모델들 (fallback용)
@@ -118,4 +122,14 @@ def get_model_by_id(model_id: str) -> ModelConfig:
     for model in AVAILABLE_MODELS:
         if model.id == model_id:
             return model
-    return None
\ No newline at end of file
+    return None
+
+
+def estimate_cost(model_id: str, usage: Optional[Dict[str, Any]]) -> Optional[float]:
+    """모델 가격표 기준 요청 비용 (USD, 모델이나 usage를 모르면 None)"""
+    model = get_model_by_id(model_id)
+    if model is None or not usage:
+        return None
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    return (prompt_tokens * model.prompt_price + completion_tokens * model.completion_price) / 1_000_000
@@ -0,0 +1,72 @@
+"""
+Serialization
+JSON 인코딩/디코딩을 한 곳에서 처리. orjson이 설치되어 있으면 사용하고,
+없거나 settings.json_backend = "json"이면 표준 라이브러리 json으로 동작한다.
+
+- dumps(): str (Redis, tool 메시지, 캐시 키)
+- dumps_bytes(): bytes (HTTP 응답, SSE frame)
+- loads(): str/bytes 모두 허용
+"""
+from typing import Any, Union
+import json
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson은 선택 의존성
+    orjson = None
+
+USE_ORJSON = orjson is not None and settings.json_backend in ("auto", "orjson")
+
+# 두 backend 모두 json.JSONDecodeError(ValueError) 계열을 발생시킴
+JSONDecodeError = json.JSONDecodeError
+
+
+if USE_ORJSON:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+    _SORTED_OPTIONS = _OPTIONS | orjson.OPT_SORT_KEYS
+
+    def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+        """객체를 UTF-8 JSON bytes로 직렬화"""
+        return orjson.dumps(obj, default=str, option=_SORTED_OPTIONS if sort_keys else _OPTIONS)
+
+    def dumps(obj: Any, sort_keys: bool = False) -> str:
+        """객체를 JSON 문자열로 직렬화"""
+        return dumps_bytes(obj, sort_keys).decode("utf-8")
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """JSON 문자열/bytes 역직렬화"""
+        return orjson.loads(data)
+
+else:
+    def dumps(obj: Any, sort_keys: bool = False) -> str:
+        """객체를 JSON 문자열로 직렬화"""
+        return json.dumps(obj, sort_keys=sort_keys, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+        """객체를 UTF-8 JSON bytes로 직렬화"""
+        return dumps(obj, sort_keys).encode("utf-8")
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """JSON 문자열/bytes 역직렬화"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+# SSE (Server-Sent Events) frame
+
+SSE_DONE = b"data: [DONE]\n\n"
+
+
+def sse_event(payload: Any) -> bytes:
+    """미리 인코딩된 SSE data frame"""
+    return b"data: " + dumps_bytes(payload) + b"\n\n"
+
+
+# FastAPI 기본 응답 클래스
+if USE_ORJSON:
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+else:
+    from fastapi.responses import JSONResponse as DefaultJSONResponse
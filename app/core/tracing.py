@@ -0,0 +1,126 @@
+"""
+Request tracing
+요청 하나의 단계별 소요 시간(session load, context build, LLM 호출, tool 실행 등)과
+모델 시도 내역을 contextvar에 모음. main.py middleware가 요청마다 trace를 시작하고
+Server-Timing 헤더와 structured log 한 줄로 내보낸다.
+
+    with span("context_build"):
+        chat_messages = self._build_chat_messages(session.data)
+
+- 같은 이름의 span은 합산 (예: tool round가 여러 번이면 "tools"는 합계와 횟수)
+- asyncio 태스크는 생성 시점의 context를 복사하므로 hedge/tool 태스크의 span도 같은 trace에 기록됨
+- trace가 없으면(비활성화 또는 요청 밖) span()은 공유 no-op 객체를 반환하여 contextvar 조회 한 번만 든다
+"""
+from typing import Dict, Any, List, Optional
+from contextvars import ContextVar
+import time
+
+_current: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """요청 하나의 단계별 시간과 모델 시도 기록"""
+    __slots__ = ("started", "stages", "attempts")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}  # name -> [total seconds, count]
+        self.attempts: List[Dict[str, Any]] = []
+
+    def add(self, name: str, seconds: float):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [seconds, 1]
+        else:
+            stage[0] += seconds
+            stage[1] += 1
+
+    def attempt(self, model: str, outcome: str, seconds: float = 0.0):
+        self.attempts.append({"model": model, "outcome": outcome, "ms": round(seconds * 1000, 1)})
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (ms)"""
+        parts = []
+        for name, (seconds, count) in self.stages.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def summary(self) -> Dict[str, Any]:
+        """Structured log용 요약"""
+        return {
+            "total_ms": round(self.elapsed() * 1000, 1),
+            "stages": {
+                name: {"ms": round(seconds * 1000, 1), "count": count}
+                for name, (seconds, count) in self.stages.items()
+            },
+            "attempts": self.attempts
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: RequestTrace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def start_trace() -> RequestTrace:
+    """현재 context에서 새 trace 시작"""
+    trace = RequestTrace()
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+def span(name: str):
+    """단계 시간 측정 context manager (trace가 없으면 no-op)"""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def add_stage(name: str, seconds: float):
+    """이미 측정한 시간을 단계로 기록 (스트리밍처럼 with 블록으로 감싸기 어려운 경우)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def record_attempt(model: str, outcome: str, seconds: float = 0.0):
+    """모델 시도 결과 기록 (success / error / cancelled / skipped_*)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.attempt(model, outcome, seconds)
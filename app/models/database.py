@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, JSON
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, JSON, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from datetime import datetime
@@ -9,9 +9,13 @@ Base = declarative_base()
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String(100), index=True, nullable=False)
+    __table_args__ = (
+        # get_chat_history: WHERE session_id = ? ORDER BY created_at (정렬용 임시 B-tree 없이 index 순서로 읽음)
+        Index("ix_chat_history_session_created", "session_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String(100), nullable=False)
     user_message = Column(Text, nullable=False)
     assistant_message = Column(Text, nullable=False)
     tools_used = Column(JSON, nullable=True)  # List of tools used
@@ -22,15 +26,99 @@ class ChatHistory(Base):
     extra_metadata = Column(JSON, nullable=True)  # Additional metadata
 
 
+# Usage rollups - history_writer가 ChatHistory insert 후 별도 트랜잭션에서 누적 갱신
+class UsageDaily(Base):
+    __tablename__ = "usage_daily"
+
+    day = Column(Date, primary_key=True)
+    model_used = Column(String(100), primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)
+
+
+class UsageTokenHistogram(Base):
+    """요청당 total_tokens 분포 (bucket = tokens.bit_length(), 즉 2배 간격)"""
+    __tablename__ = "usage_token_histogram"
+
+    day = Column(Date, primary_key=True)
+    model_used = Column(String(100), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
+
+
+class ToolUsageDaily(Base):
+    __tablename__ = "tool_usage_daily"
+
+    day = Column(Date, primary_key=True)
+    tool_name = Column(String(100), primary_key=True)
+    calls = Column(Integer, nullable=False, default=0)
+
+
 # Database setup
-engine = create_async_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}  # SQLite specific
-)
+IS_SQLITE = settings.database_url.startswith("sqlite")
+IN_MEMORY = ":memory:" in settings.database_url
+
+
+def _sqlite_pragmas(read_only: bool):
+    """SQLite performance mode - 연결마다 적용하는 PRAGMA"""
+    pragmas = [
+        "PRAGMA synchronous=NORMAL",  # WAL에서는 checkpoint 때만 fsync (commit마다 X)
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",  # 음수 = KiB 단위
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        # WAL은 DB 파일에 기록되어 유지됨 - reader가 writer를 기다리지 않음
+        pragmas.insert(0, "PRAGMA journal_mode=WAL")
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return on_connect
+
+
+def _create_engine(read_only: bool):
+    if not IS_SQLITE:
+        return create_async_engine(settings.database_url)
+
+    pool_options = {}
+    if not IN_MEMORY:
+        # SQLite는 writer가 하나뿐이므로 쓰기 엔진은 연결 1개, 읽기 엔진은 별도 pool
+        pool_size = settings.sqlite_read_pool_size if read_only else 1
+        pool_options = {"pool_size": pool_size, "max_overflow": pool_size if read_only else 0}
+    engine = create_async_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},  # SQLite specific
+        **pool_options
+    )
+    if settings.sqlite_performance_mode:
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas(read_only))
+    return engine
+
+
+engine = _create_engine(read_only=False)
+
+# 조회 전용 - history 조회가 write-behind writer의 commit 뒤에 줄 서지 않도록 분리
+read_engine = _create_engine(read_only=True) if IS_SQLITE and not IN_MEMORY else engine
 
 AsyncSessionLocal = async_sessionmaker(
-    engine, 
-    class_=AsyncSession, 
+    engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
     expire_on_commit=False
 )
 
@@ -39,6 +127,17 @@ async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all은 이미 있는 테이블에 새 index를 만들지 않으므로 따로 생성
+        await conn.run_sync(
+            lambda sync_conn: [index.create(sync_conn, checkfirst=True) for index in ChatHistory.__table__.indexes]
+        )
+
+
+async def close_db():
+    """Dispose connection pools"""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 
 async def get_db():
@@ -47,4 +146,4 @@ async def get_db():
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, HTTPException, Header, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Header, BackgroundTasks, Query, Response
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, AsyncGenerator
-import json
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, AsyncGenerator, Union
 import asyncio
+import time
+import zlib
 from app.agents.chat_agent import ChatAgent
 from app.services.session_manager import session_manager
+from app.services.admission import admission, AdmissionRejected
+from app.services.rate_limiter import RateLimited
+from app.services.chat_history import get_history_page, get_latest_id, iter_history, InvalidCursor
 from app.tools import get_all_tools
 from app.core.config import settings
+from app.core.serialization import sse_event, SSE_DONE, dumps_bytes
+from app.core.metrics import chat_stream_tokens_per_second
 from app.core.model_config import AVAILABLE_MODELS, get_fallback_models
 
 
@@ -19,6 +26,8 @@ class ChatRequest(BaseModel):
     message: str
     use_tools: bool = True
     session_id: Optional[str] = None
+    use_cache: bool = False  # 동일 요청 응답 재사용 (기본: temperature=0 요청만)
+    temperature: Optional[float] = Field(None, ge=0, le=2)  # None이면 settings.temperature
 
 
 class ChatResponse(BaseModel):
@@ -28,6 +37,7 @@ class ChatResponse(BaseModel):
     tools_used: List[Dict[str, Any]]
     session_id: str
     model_used: str
+    cached: bool = False
 
 
 class SessionResponse(BaseModel):
@@ -45,24 +55,25 @@ async def create_session() -> SessionResponse:
 async def send_message(request: ChatRequest, background_tasks: BackgroundTasks) -> ChatResponse:
     """Send a message to the chat agent"""
     
-    # Get or create session
-    session_id = request.session_id
-    if not session_id:
-        session_id = await session_manager.create_session()
-    else:
-        # Check if session exists
-        session_data = await session_manager.get_session(session_id)
-        if not session_data:
-            # Create new session if not found
-            session_id = await session_manager.create_session()
-    
     try:
-        # Process message with agent
-        result = await chat_agent.process_message(
-            session_id=session_id,
-            user_message=request.message,
-            use_tools=request.use_tools
-        )
+        # 동시 처리 수 제한 (과부하면 503 + Retry-After)
+        async with admission.slot():
+            # Get or create session - loaded once, changes are written once at the end
+            async with session_manager.unit_of_work(request.session_id) as session:
+                session_id = session.session_id
+                
+                # Process message with agent
+                result = await asyncio.wait_for(
+                    chat_agent.process_message(
+                        session_id=session_id,
+                        user_message=request.message,
+                        use_tools=request.use_tools,
+                        use_cache=request.use_cache,
+                        session=session,
+                        temperature=request.temperature
+                    ),
+                    timeout=settings.agent_timeout
+                )
         
         # Format tool usage information
         tools_used = []
@@ -77,30 +88,127 @@ async def send_message(request: ChatRequest, background_tasks: BackgroundTasks)
             response=result["content"],
             tools_used=tools_used,
             session_id=session_id,
-            model_used=result.get("model_used", "unknown")
+            model_used=result.get("model_used", "unknown"),
+            cached=result.get("cached", False)
         )
         
+    except (AdmissionRejected, RateLimited) as e:
+        raise _overloaded(e)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Agent timed out after {settings.agent_timeout}s")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _overloaded(error: Union[AdmissionRejected, RateLimited]) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def _with_deadline(stream: AsyncGenerator[Dict[str, Any], None], seconds: float) -> AsyncGenerator[Dict[str, Any], None]:
+    """스트림 전체에 timeout 적용 (yield로 클라이언트에 보내는 동안이 아니라 다음 chunk를 기다릴 때만 적용)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(anext(stream), max(0.0, deadline - loop.time()))
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        await stream.aclose()
+
+
 @router.get("/history/{session_id}")
 async def get_chat_history(
     session_id: str,
-    limit: int = 50
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_metadata: bool = True,
+    if_none_match: Optional[str] = Header(None)
 ) -> List[Dict[str, Any]]:
-    """Get chat history for a session"""
+    """
+    Get chat history for a session (chronological, newest page first)
+    
+    더 오래된 페이지는 X-Next-Cursor 헤더 값을 cursor로 전달해서 조회.
+    ETag가 같으면(새 기록이 없으면) 304를 반환.
+    """
     
     # Check if session exists
     session_data = await session_manager.get_session(session_id)
     if not session_data:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Get history from database
-    history = await chat_agent.get_chat_history(session_id, limit)
+    # 행 없이 마지막 id만 읽어서 revalidation
+    etag = _history_etag(await get_latest_id(session_id), limit, cursor, include_metadata)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    try:
+        history, next_cursor = await get_history_page(session_id, limit, cursor, include_metadata)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response.headers["ETag"] = etag
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return history
 
 
+@router.get("/history/{session_id}/export")
+async def export_chat_history(
+    session_id: str,
+    include_metadata: bool = True,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Export the full chat history as NDJSON (streamed in batches)
+    
+    ETag가 같으면(새 기록이 없으면) 304를 반환.
+    """
+    latest_id = await get_latest_id(session_id)
+    if latest_id is None:
+        raise HTTPException(status_code=404, detail="No chat history for session")
+    
+    etag = _history_etag(latest_id, "export", include_metadata)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    async def generate() -> AsyncGenerator[bytes, None]:
+        # ETag를 계산한 시점의 마지막 행까지만 내보냄
+        async for item in iter_history(session_id, include_metadata, up_to_id=latest_id):
+            yield dumps_bytes(item) + b"\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="chat-history-{session_id}.ndjson"',
+            "ETag": etag
+        }
+    )
+
+
+def _history_etag(latest_id: Optional[int], *params: Any) -> str:
+    """기록은 추가만 되므로 마지막 행 id + 요청 파라미터로 버전 표시"""
+    return f'"{latest_id or 0}-{zlib.crc32(repr(params).encode()):08x}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 비교 - entity-tag 목록과 "*"를 허용하고 W/ 접두사는 무시 (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
 @router.get("/tools")
 async def list_available_tools() -> Dict[str, List[Dict[str, Any]]]:
     """List all available tools"""
@@ -158,45 +266,70 @@ async def list_available_models() -> Dict[str, Any]:
 async def send_message_stream(request: ChatRequest):
     """Send a message to the chat agent with streaming response"""
     
-    # Get or create session
-    session_id = request.session_id
-    if not session_id:
-        session_id = await session_manager.create_session()
-    else:
-        # Check if session exists
-        session_data = await session_manager.get_session(session_id)
-        if not session_data:
-            session_id = await session_manager.create_session()
-    
-    async def generate() -> AsyncGenerator[str, None]:
+    # 동시 처리 수 제한 - 스트림이 끝날 때까지 슬롯 유지 (과부하면 스트림 시작 전에 503)
+    try:
+        ticket = await admission.acquire()
+    except AdmissionRejected as e:
+        raise _overloaded(e)
+    
+    # Get or create session - loaded once, changes are written once after the stream ends
+    session = session_manager.unit_of_work(request.session_id)
+    try:
+        await session.load()
+    except BaseException:
+        ticket.release()
+        raise
+    session_id = session.session_id
+    
+    async def generate() -> AsyncGenerator[bytes, None]:
         """Generate streaming response"""
         try:
             # Send initial metadata
-            yield f"data: {json.dumps({'type': 'metadata', 'session_id': session_id})}\n\n"
+            yield sse_event({'type': 'metadata', 'session_id': session_id})
             
             # Process message with streaming
-            async for chunk in chat_agent.process_message_stream(
+            tokens = 0
+            first_token_at = None
+            async for chunk in _with_deadline(chat_agent.process_message_stream(
                 session_id=session_id,
                 user_message=request.message,
-                use_tools=request.use_tools
-            ):
+                use_tools=request.use_tools,
+                session=session,
+                temperature=request.temperature
+            ), settings.agent_timeout):
                 if chunk["type"] == "token":
-                    yield f"data: {json.dumps({'type': 'token', 'content': chunk['content']})}\n\n"
+                    tokens += 1
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield sse_event({'type': 'token', 'content': chunk['content']})
                 elif chunk["type"] == "tool_call":
-                    yield f"data: {json.dumps({'type': 'tool_call', 'tool': chunk['tool'], 'args': chunk['args']})}\n\n"
+                    yield sse_event({'type': 'tool_call', 'tool': chunk['tool'], 'args': chunk['args']})
                 elif chunk["type"] == "tool_result":
-                    yield f"data: {json.dumps({'type': 'tool_result', 'tool': chunk['tool'], 'result': chunk['result']})}\n\n"
+                    yield sse_event({'type': 'tool_result', 'tool': chunk['tool'], 'result': chunk['result']})
                 elif chunk["type"] == "done":
-                    yield f"data: {json.dumps({'type': 'done', 'model_used': chunk.get('model_used', 'unknown')})}\n\n"
-                    
+                    elapsed = time.perf_counter() - first_token_at if first_token_at else 0.0
+                    if tokens > 1 and elapsed > 0:
+                        chat_stream_tokens_per_second.labels(model=chunk.get('model_used') or 'unknown').observe(tokens / elapsed)
+                    yield sse_event({'type': 'done', 'model_used': chunk.get('model_used', 'unknown')})
+                elif chunk["type"] == "error":
+                    # 스트림이 이미 시작됐으므로 503 대신 이벤트로 전달 (rate limit이면 retry_after 포함)
+                    yield sse_event(chunk)
+            
+            await session.commit()
+            
+        except asyncio.TimeoutError:
+            yield sse_event({'type': 'error', 'error': f'Agent timed out after {settings.agent_timeout}s'})
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'error': str(e)})
         finally:
-            yield "data: [DONE]\n\n"
+            ticket.release()
+            yield SSE_DONE
     
     return StreamingResponse(
         generate(),
         media_type="text/event-stream",
+        # 스트림이 시작되기 전에 연결이 끊기면 generate()가 실행되지 않으므로 여기서도 반환
+        background=BackgroundTask(ticket.release),
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
@@ -6,7 +6,10 @@ from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from datetime import datetime
+from app.core.config import settings
 from app.services.model_manager import model_manager, ModelStatus
+from app.services.circuit_breaker import circuit_breaker
+from app.services.rate_limiter import rate_limiter
 
 router = APIRouter(prefix="/api/models", tags=["models"])
 
@@ -147,6 +150,27 @@ async def update_model_status(update: ModelStatusUpdate) -> Dict[str, str]:
     return {"message": message, "status": model.status.value}
 
 
+@router.get("/circuits")
+async def list_circuits() -> Dict[str, Any]:
+    """모델별 circuit breaker 상태 조회"""
+    circuits = circuit_breaker.snapshot()
+    return {
+        "total": len(circuits),
+        "circuits": circuits
+    }
+
+
+@router.get("/rate-limits")
+async def list_rate_limits() -> Dict[str, Any]:
+    """모델별 rate limit 상태 조회 (학습한 한도, 남은 token, 동시 요청 수)"""
+    limits = rate_limiter.snapshot()
+    return {
+        "enabled": settings.rate_limit_enabled,
+        "total": len(limits),
+        "models": limits
+    }
+
+
 @router.get("/test-fallback")
 async def test_fallback_scenario() -> Dict[str, Any]:
     """Fallback 시나리오 테스트"""
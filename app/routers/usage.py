@@ -0,0 +1,146 @@
+"""
+Usage Analytics API endpoints
+사용량/비용 집계 조회 - rollup 테이블만 읽으며 chat_history는 스캔하지 않음
+"""
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, Optional
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import select
+
+from app.models.database import UsageDaily, UsageTokenHistogram, ToolUsageDaily, AsyncReadSessionLocal
+from app.services.usage_rollup import bucket_lower_bound, bucket_upper_bound
+
+router = APIRouter(prefix="/api/usage", tags=["usage"])
+
+PERCENTILES = (50, 90, 95, 99)
+DEFAULT_RANGE_DAYS = 30
+
+
+def _percentiles(values: np.ndarray) -> Dict[str, float]:
+    """일별 값 분포의 percentile"""
+    if values.size == 0:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": round(float(v), 6) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _histogram_percentiles(buckets: np.ndarray, counts: np.ndarray) -> Dict[str, int]:
+    """Token histogram의 percentile (bucket 안에서는 선형 보간)"""
+    total = counts.sum()
+    if total == 0:
+        return {f"p{p}": 0 for p in PERCENTILES}
+
+    # 같은 bucket(여러 날/모델)을 합친 뒤 누적 분포 계산
+    buckets, inverse = np.unique(buckets, return_inverse=True)
+    counts = np.bincount(inverse, weights=counts)
+    cdf = np.cumsum(counts)
+
+    targets = np.array(PERCENTILES) / 100 * total
+    indexes = np.minimum(np.searchsorted(cdf, targets), len(buckets) - 1)
+    lower = np.array([bucket_lower_bound(int(b)) for b in buckets[indexes]])
+    upper = np.array([bucket_upper_bound(int(b)) for b in buckets[indexes]])
+    before = cdf[indexes] - counts[indexes]
+    fraction = np.clip((targets - before) / counts[indexes], 0.0, 1.0)
+    values = lower + fraction * (upper - lower)
+    return {f"p{p}": int(round(v)) for p, v in zip(PERCENTILES, values)}
+
+
+def _totals(row: np.ndarray) -> Dict[str, Any]:
+    return {
+        "requests": int(row[0]),
+        "prompt_tokens": int(row[1]),
+        "completion_tokens": int(row[2]),
+        "total_tokens": int(row[3]),
+        "cost": round(float(row[4]), 6)
+    }
+
+
+@router.get("")
+async def get_usage(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    기간별 사용량/비용 집계
+
+    Args:
+        start: 시작일 (기본: 종료일 30일 전)
+        end: 종료일 (기본: 오늘, UTC)
+        model: 특정 모델만 집계
+    """
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    daily_query = select(UsageDaily).where(UsageDaily.day.between(start, end))
+    histogram_query = select(UsageTokenHistogram).where(UsageTokenHistogram.day.between(start, end))
+    if model:
+        daily_query = daily_query.where(UsageDaily.model_used == model)
+        histogram_query = histogram_query.where(UsageTokenHistogram.model_used == model)
+    tool_query = select(ToolUsageDaily).where(ToolUsageDaily.day.between(start, end))
+
+    async with AsyncReadSessionLocal() as db:
+        daily_rows = (await db.execute(daily_query)).scalars().all()
+        histogram_rows = (await db.execute(histogram_query)).scalars().all()
+        tool_rows = (await db.execute(tool_query)).scalars().all() if not model else []
+
+    # (day, model) 행을 numpy 배열로 - 컬럼: requests, prompt, completion, total, cost
+    days = np.array([row.day.toordinal() for row in daily_rows], dtype=np.int64)
+    models = np.array([row.model_used for row in daily_rows], dtype=object)
+    values = np.array(
+        [[row.requests, row.prompt_tokens, row.completion_tokens, row.total_tokens, row.cost] for row in daily_rows],
+        dtype=np.float64
+    ).reshape(-1, 5)
+
+    hist_models = np.array([row.model_used for row in histogram_rows], dtype=object)
+    hist_buckets = np.array([row.bucket for row in histogram_rows], dtype=np.int64)
+    hist_counts = np.array([row.requests for row in histogram_rows], dtype=np.int64)
+
+    # 일별 합계 (모델 합산) - 요청이 없는 날은 0으로 포함
+    day_range = np.arange(start.toordinal(), end.toordinal() + 1)
+    per_day = np.zeros((day_range.size, 5))
+    if days.size:
+        np.add.at(per_day, days - start.toordinal(), values)
+
+    by_model = []
+    for model_id in sorted(set(models.tolist())):
+        mask = models == model_id
+        totals = values[mask].sum(axis=0)
+        hist_mask = hist_models == model_id
+        by_model.append({
+            "model": model_id,
+            **_totals(totals),
+            "tokens_per_request": _histogram_percentiles(hist_buckets[hist_mask], hist_counts[hist_mask])
+        })
+    by_model.sort(key=lambda item: item["cost"], reverse=True)
+
+    tools: Dict[str, int] = {}
+    for row in tool_rows:
+        tools[row.tool_name] = tools.get(row.tool_name, 0) + row.calls
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "model": model,
+        "totals": {
+            **_totals(values.sum(axis=0)),
+            "tokens_per_request": _histogram_percentiles(hist_buckets, hist_counts)
+        },
+        "daily_percentiles": {
+            "requests": _percentiles(per_day[:, 0]),
+            "total_tokens": _percentiles(per_day[:, 3]),
+            "cost": _percentiles(per_day[:, 4])
+        },
+        "daily": [
+            {"day": date.fromordinal(int(day)).isoformat(), **_totals(row)}
+            for day, row in zip(day_range, per_day)
+            if row[0]
+        ],
+        "by_model": by_model,
+        "by_tool": [
+            {"tool": name, "calls": calls}
+            for name, calls in sorted(tools.items(), key=lambda item: item[1], reverse=True)
+        ]
+    }
@@ -0,0 +1,192 @@
+"""
+Admission Control
+ChatAgent 앞에서 동시에 처리하는 채팅 턴 수를 settings.max_agents로 제한한다.
+과부하 시 모든 요청이 같이 느려지다 timeout 나는 대신, 초과분은 짧게 기다리거나 즉시 503으로 거절한다.
+
+    async with admission.slot():
+        result = await asyncio.wait_for(chat_agent.process_message(...), settings.agent_timeout)
+
+- 슬롯이 없으면 FIFO 대기열에서 최대 admission_max_wait_seconds 대기 (초과 시 reason="timeout")
+- 대기열이 admission_queue_size만큼 차 있으면 기다리지 않고 바로 거절 (reason="queue_full")
+- Retry-After는 최근 턴 처리 시간(EWMA)과 대기열 길이로 추정
+- 슬롯은 release 시 다음 대기자에게 바로 넘김 (새로 온 요청이 대기자를 앞지르지 않음)
+"""
+from typing import Dict, Any, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import math
+import time
+
+from app.core.config import settings
+from app.core.metrics import admission_wait, admission_rejected
+from app.core.tracing import add_stage
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.2
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class AdmissionRejected(Exception):
+    """과부하로 요청을 받지 않음 (503 + Retry-After)"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """확보한 슬롯 - release()는 여러 번 호출해도 한 번만 반환"""
+    __slots__ = ("_controller", "_admitted", "_released")
+
+    def __init__(self, controller: "AdmissionController", counted: bool = True):
+        self._controller = controller
+        self._admitted = time.monotonic()
+        self._released = not counted
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(time.monotonic() - self._admitted)
+
+
+class AdmissionController:
+    """동시 처리 수 제한 + 길이 제한이 있는 FIFO 대기열"""
+
+    def __init__(self, max_concurrency: int, max_queue_size: int, max_wait_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self._active = 0
+        self._waiters: deque = deque()
+        self._service_seconds: Optional[float] = None  # 턴 처리 시간 EWMA
+
+        # Metrics
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.queue_high_watermark = 0
+
+    async def acquire(self) -> AdmissionTicket:
+        """
+        슬롯 확보 (필요하면 대기)
+
+        Raises:
+            AdmissionRejected: 대기열이 가득 찼거나 max_wait_seconds 안에 슬롯이 나지 않음
+        """
+        if not settings.admission_enabled:
+            return AdmissionTicket(self, counted=False)
+
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return self._admit(0.0)
+
+        if len(self._waiters) >= self.max_queue_size:
+            self.rejected_queue_full += 1
+            raise self._reject("queue_full", 0.0)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        self.queue_high_watermark = max(self.queue_high_watermark, len(self._waiters))
+        started = time.monotonic()
+        try:
+            # wait_for는 (3.12 미만에서) 이미 끝난 대기에 온 취소를 무시하므로 asyncio.wait 사용
+            await asyncio.wait((waiter,), timeout=self.max_wait_seconds)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self.rejected_timeout += 1
+            raise self._reject("timeout", time.monotonic() - started)
+
+        # _release()가 _active를 유지한 채 슬롯을 넘겨줌
+        return self._admit(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def slot(self):
+        """acquire() ~ release()"""
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _admit(self, waited: float) -> AdmissionTicket:
+        self.admitted += 1
+        admission_wait.labels(outcome="admitted").observe(waited)
+        if waited:
+            add_stage("admission_wait", waited)
+        return AdmissionTicket(self)
+
+    def _reject(self, reason: str, waited: float) -> AdmissionRejected:
+        admission_wait.labels(outcome="rejected").observe(waited)
+        admission_rejected.labels(reason=reason).inc()
+        retry_after = self.retry_after()
+        logger.warning(
+            f"Admission rejected ({reason}): active={self._active}, queued={len(self._waiters)}, "
+            f"retry_after={retry_after}s"
+        )
+        return AdmissionRejected(reason, retry_after)
+
+    def _abandon(self, waiter: asyncio.Future):
+        """대기 포기 (취소/timeout)"""
+        if waiter.done():
+            # 슬롯을 넘겨받은 직후 취소됨 - 다음 대기자에게 다시 넘김
+            self._release(None)
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self, service_seconds: Optional[float]):
+        if service_seconds is not None:
+            if self._service_seconds is None:
+                self._service_seconds = service_seconds
+            else:
+                self._service_seconds += EWMA_ALPHA * (service_seconds - self._service_seconds)
+
+        # 살아있는 다음 대기자에게 슬롯을 그대로 넘김
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def retry_after(self) -> int:
+        """대기열이 빠지는 데 걸릴 예상 시간 (초)"""
+        service_seconds = self._service_seconds or 1.0
+        rounds = (len(self._waiters) + 1) / max(1, self.max_concurrency)
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(service_seconds * rounds)))
+
+    def stats(self) -> Dict[str, Any]:
+        """처리 중 / 대기 중인 턴 수와 거절 지표"""
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queued": len(self._waiters),
+            "max_queue_size": self.max_queue_size,
+            "queue_high_watermark": self.queue_high_watermark,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_service_seconds": round(self._service_seconds or 0.0, 3)
+        }
+
+
+# Global instance
+admission = AdmissionController(
+    max_concurrency=settings.max_agents,
+    max_queue_size=settings.admission_queue_size,
+    max_wait_seconds=settings.admission_max_wait_seconds
+)
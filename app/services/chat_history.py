@@ -0,0 +1,136 @@
+"""
+Chat History 조회
+ChatHistory를 (created_at, id) 기준 keyset pagination으로 읽음. OFFSET 없이
+ix_chat_history_session_created index를 따라 읽으므로 페이지 위치와 관계없이 비용이 같다.
+
+- 페이지는 최신 행부터 과거 방향으로 이어지며, 각 페이지 안은 시간순으로 반환
+- cursor는 페이지의 가장 오래된 행 (created_at, id)를 담은 opaque 문자열
+- include_metadata=False면 extra_metadata 컬럼을 읽지 않음
+- ChatHistory 행은 추가만 되므로 세션의 마지막 행 id가 곧 세션 기록의 버전 (ETag)
+"""
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from datetime import datetime
+import base64
+import binascii
+
+from sqlalchemy import select, and_, or_
+
+from app.core.config import settings
+from app.models.database import ChatHistory, AsyncReadSessionLocal
+
+_BASE_COLUMNS = (
+    ChatHistory.id,
+    ChatHistory.user_message,
+    ChatHistory.assistant_message,
+    ChatHistory.tools_used,
+    ChatHistory.model_used,
+    ChatHistory.created_at,
+)
+
+
+class InvalidCursor(ValueError):
+    """잘못된 pagination cursor"""
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    raw = f"{created_at.isoformat() if created_at else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def _columns(include_metadata: bool):
+    return (*_BASE_COLUMNS, ChatHistory.extra_metadata) if include_metadata else _BASE_COLUMNS
+
+
+def _to_dict(row) -> Dict[str, Any]:
+    item = {
+        "id": row.id,
+        "user_message": row.user_message or "",
+        "assistant_message": row.assistant_message or "",
+        "tools_used": row.tools_used or [],
+        "model_used": row.model_used or "unknown",
+        "created_at": row.created_at.isoformat() if row.created_at else ""
+    }
+    if "extra_metadata" in row._fields:
+        item["metadata"] = row.extra_metadata or {}
+    return item
+
+
+async def get_history_page(
+    session_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_metadata: bool = True
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """cursor 이전(더 오래된) 행 최대 limit개를 시간순으로 반환 (다음 페이지가 없으면 cursor는 None)"""
+    query = select(*_columns(include_metadata)).where(ChatHistory.session_id == session_id)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(or_(
+            ChatHistory.created_at < created_at,
+            and_(ChatHistory.created_at == created_at, ChatHistory.id < row_id)
+        ))
+    query = query.order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc()).limit(limit + 1)
+
+    async with AsyncReadSessionLocal() as db:
+        rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [_to_dict(row) for row in reversed(rows)], next_cursor
+
+
+async def get_latest_id(session_id: str) -> Optional[int]:
+    """세션의 마지막 행 id (index에서 한 행만 읽음)"""
+    query = (
+        select(ChatHistory.id)
+        .where(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc())
+        .limit(1)
+    )
+    async with AsyncReadSessionLocal() as db:
+        return (await db.execute(query)).scalar()
+
+
+async def iter_history(
+    session_id: str,
+    include_metadata: bool = True,
+    batch_size: Optional[int] = None,
+    up_to_id: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    세션 전체 기록을 시간순으로 batch 단위로 읽음 (batch마다 짧은 read 트랜잭션)
+
+    up_to_id가 주어지면 그 id까지만 읽음 (export 중에 저장된 행이 ETag와 어긋나지 않도록)
+    """
+    batch_size = batch_size or settings.history_export_batch_size
+    last: Optional[Tuple[datetime, int]] = None
+    while True:
+        query = select(*_columns(include_metadata)).where(ChatHistory.session_id == session_id)
+        if up_to_id is not None:
+            query = query.where(ChatHistory.id <= up_to_id)
+        if last:
+            query = query.where(or_(
+                ChatHistory.created_at > last[0],
+                and_(ChatHistory.created_at == last[0], ChatHistory.id > last[1])
+            ))
+        query = query.order_by(ChatHistory.created_at, ChatHistory.id).limit(batch_size)
+
+        async with AsyncReadSessionLocal() as db:
+            rows = (await db.execute(query)).all()
+
+        for row in rows:
+            yield _to_dict(row)
+        if len(rows) < batch_size:
+            return
+        last = (rows[-1].created_at, rows[-1].id)
@@ -0,0 +1,158 @@
+"""
+Circuit Breaker
+모델별 장애 상태를 프로세스 전체에서 공유하여, 이미 다운된 것으로 알려진 모델에
+매 요청마다 타임아웃을 다시 지불하지 않도록 한다.
+
+상태 전이:
+    CLOSED    --(연속 실패 threshold 도달 / rate limit)--> OPEN
+    OPEN      --(cooldown 경과 후 첫 요청)-->              HALF_OPEN (시험 요청 1개만 허용)
+    HALF_OPEN --(시험 요청 성공)-->                        CLOSED
+    HALF_OPEN --(시험 요청 실패)-->                        OPEN
+"""
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+from enum import Enum
+import time
+import logging
+
+from app.core.config import settings
+from app.core.metrics import llm_rate_limited
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class ModelCircuit:
+    model_id: str
+    state: CircuitState = CircuitState.CLOSED
+    consecutive_failures: int = 0
+    open_until: float = 0.0  # time.monotonic() 기준
+    probe_in_flight: bool = False
+    last_error: Optional[str] = None
+
+
+def is_rate_limit_error(error_msg: str) -> bool:
+    """에러 메시지가 rate limit(429)인지 판단"""
+    error_msg = error_msg.lower()
+    return "429" in error_msg or ("rate" in error_msg and "limit" in error_msg)
+
+
+class CircuitBreaker:
+    """모든 OpenRouter 클라이언트가 공유하는 모델별 circuit breaker"""
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        cooldown_seconds: float,
+        rate_limit_cooldown_seconds: float
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.rate_limit_cooldown_seconds = rate_limit_cooldown_seconds
+        self._circuits: Dict[str, ModelCircuit] = {}
+
+    def _get(self, model_id: str) -> ModelCircuit:
+        circuit = self._circuits.get(model_id)
+        if circuit is None:
+            circuit = self._circuits[model_id] = ModelCircuit(model_id=model_id)
+        return circuit
+
+    def allow_request(self, model_id: str) -> bool:
+        """
+        모델에 요청을 보내도 되는지 확인
+
+        cooldown이 지난 OPEN circuit은 HALF_OPEN으로 전환되고 이 호출자에게만
+        시험 요청을 허용한다. 허용받은 호출자는 반드시 record_success, record_failure,
+        release 중 하나를 호출해야 한다.
+        """
+        circuit = self._get(model_id)
+
+        if circuit.state == CircuitState.CLOSED:
+            return True
+
+        if circuit.state == CircuitState.OPEN:
+            if time.monotonic() < circuit.open_until:
+                return False
+            circuit.state = CircuitState.HALF_OPEN
+            circuit.probe_in_flight = False
+            logger.info(f"Circuit for {model_id} half-open, allowing trial request")
+
+        # HALF_OPEN: 시험 요청은 한 번에 하나만
+        if circuit.probe_in_flight:
+            return False
+        circuit.probe_in_flight = True
+        return True
+
+    def is_available(self, model_id: str) -> bool:
+        """상태를 바꾸지 않고 요청 가능 여부만 조회 (목록 표시용)"""
+        circuit = self._circuits.get(model_id)
+        if circuit is None or circuit.state == CircuitState.CLOSED:
+            return True
+        if circuit.state == CircuitState.OPEN:
+            return time.monotonic() >= circuit.open_until
+        return not circuit.probe_in_flight
+
+    def record_success(self, model_id: str):
+        """요청 성공 기록 - circuit을 닫는다"""
+        circuit = self._get(model_id)
+        if circuit.state != CircuitState.CLOSED:
+            logger.info(f"Circuit for {model_id} closed")
+        circuit.state = CircuitState.CLOSED
+        circuit.consecutive_failures = 0
+        circuit.probe_in_flight = False
+        circuit.last_error = None
+
+    def record_failure(self, model_id: str, error: str, retry_after: Optional[float] = None):
+        """요청 실패 기록 - threshold를 넘거나 시험 요청이 실패하면 circuit을 연다"""
+        circuit = self._get(model_id)
+        circuit.consecutive_failures += 1
+        circuit.last_error = error
+        circuit.probe_in_flight = False
+
+        if is_rate_limit_error(error):
+            llm_rate_limited.labels(model=model_id).inc()
+            cooldown = retry_after if retry_after is not None else self.rate_limit_cooldown_seconds
+        elif circuit.state == CircuitState.HALF_OPEN or \
+                circuit.consecutive_failures >= self.failure_threshold:
+            cooldown = self.cooldown_seconds
+        else:
+            return
+
+        circuit.state = CircuitState.OPEN
+        circuit.open_until = time.monotonic() + cooldown
+        logger.warning(f"Circuit for {model_id} opened for {cooldown:.0f}s: {error}")
+
+    def release(self, model_id: str):
+        """결과 없이 끝난 요청(취소된 hedge 등)의 시험 요청 슬롯 반환"""
+        circuit = self._circuits.get(model_id)
+        if circuit is not None:
+            circuit.probe_in_flight = False
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """모든 circuit 상태 조회"""
+        now = time.monotonic()
+        return [
+            {
+                "model_id": circuit.model_id,
+                "state": circuit.state.value,
+                "consecutive_failures": circuit.consecutive_failures,
+                "retry_in_seconds": max(0.0, circuit.open_until - now)
+                if circuit.state == CircuitState.OPEN else 0.0,
+                "last_error": circuit.last_error
+            }
+            for circuit in self._circuits.values()
+        ]
+
+
+# 싱글톤 인스턴스
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.circuit_failure_threshold,
+    cooldown_seconds=settings.circuit_cooldown_seconds,
+    rate_limit_cooldown_seconds=settings.circuit_rate_limit_cooldown_seconds
+)
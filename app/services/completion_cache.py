@@ -0,0 +1,170 @@
+"""
+Completion Cache
+동일한 요청(메시지, 모델 체인, temperature, tool 스키마)에 대한 응답을 재사용하고,
+동시에 들어온 동일 요청은 하나의 upstream 호출을 공유(single-flight)하도록 함
+
+- 1차: 프로세스 내 LRU + TTL
+- 2차: (선택) Redis
+"""
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+from collections import OrderedDict
+import asyncio
+import hashlib
+import time
+import logging
+
+from app.core.config import settings
+from app.core.serialization import dumps_bytes, dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# 캐시 키에 포함할 메시지 필드
+_MESSAGE_KEYS = ("role", "content", "name", "tool_calls", "tool_call_id")
+_LEADER_CANCELLED = object()  # single-flight leader 취소 시 대기자에게 보내는 재시도 신호
+
+
+def is_deterministic(temperature: float) -> bool:
+    """기본 설정에서는 temperature=0 요청만 캐시"""
+    return settings.completion_cache_allow_nondeterministic or temperature == 0
+
+
+def make_cache_key(
+    messages: List[Dict[str, Any]],
+    models: List[str],
+    temperature: float,
+    max_tokens: int,
+    tools: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    """정규화한 요청 내용으로 캐시 키 생성"""
+    normalized_messages = []
+    for msg in messages:
+        normalized = {k: msg[k] for k in _MESSAGE_KEYS if msg.get(k) is not None}
+        if isinstance(normalized.get("content"), str):
+            normalized["content"] = normalized["content"].strip()
+        normalized_messages.append(normalized)
+
+    payload = {
+        "messages": normalized_messages,
+        "models": models,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "tools": tools or []
+    }
+    return hashlib.sha256(dumps_bytes(payload, sort_keys=True)).hexdigest()
+
+
+class CompletionCache:
+    """LRU+TTL 메모리 캐시, 선택적 Redis 캐시, single-flight 요청 병합"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, use_redis: bool = False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._redis = None
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_redis_client(self):
+        if self._redis is None:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(settings.redis_url, encoding="utf-8", decode_responses=True)
+        return self._redis
+
+    async def _get_remote(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.use_redis:
+            return None
+        try:
+            client = await self._get_redis_client()
+            data = await client.get(f"completion:{key}")
+            return loads(data) if data else None
+        except Exception as e:
+            logger.warning(f"Completion cache Redis read failed: {str(e)}")
+            return None
+
+    async def _set_remote(self, key: str, value: Dict[str, Any]):
+        if not self.use_redis:
+            return
+        try:
+            client = await self._get_redis_client()
+            await client.setex(f"completion:{key}", self.ttl_seconds, dumps(value))
+        except Exception as e:
+            logger.warning(f"Completion cache Redis write failed: {str(e)}")
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        should_store: Callable[[Dict[str, Any]], bool]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        캐시된 응답을 반환하거나 compute()를 한 번만 실행
+
+        Returns:
+            (응답, 캐시 사용 여부) - 다른 요청의 upstream 호출을 공유한 경우도 캐시로 간주
+        """
+        while True:
+            value = self._get_local(key)
+            if value is not None:
+                return value, True
+
+            # 같은 요청이 이미 진행 중이면 그 결과를 기다림
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            value = await asyncio.shield(in_flight)
+            if value is not _LEADER_CANCELLED:
+                return value, True
+            # leader 요청이 취소됨 - 처음부터 다시 (이 요청이 새 leader가 될 수 있음)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await self._get_remote(key)
+            if value is not None:
+                self._set_local(key, value)
+                future.set_result(value)
+                return value, True
+
+            value = await compute()
+            if should_store(value):
+                self._set_local(key, value)
+                await self._set_remote(key, value)
+            future.set_result(value)
+            return value, False
+
+        except asyncio.CancelledError:
+            # 공유 future를 취소하면 정상인 대기 요청까지 취소되므로 재시도 신호만 보냄
+            if not future.done():
+                future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 대기자가 없어도 경고가 남지 않도록 조회 처리
+            raise
+        finally:
+            del self._in_flight[key]
+
+
+# 싱글톤 인스턴스
+completion_cache = CompletionCache(
+    max_entries=settings.completion_cache_max_entries,
+    ttl_seconds=settings.completion_cache_ttl_seconds,
+    use_redis=settings.completion_cache_redis_enabled
+)
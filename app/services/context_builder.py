@@ -0,0 +1,90 @@
+"""
+Context builder
+모델별 context window(context_length - max_tokens)에 맞춰 대화 기록을 최대한 채워 넣음.
+필수 메시지(system 메시지, 마지막 사용자 메시지)조차 들어가지 않는 모델은 요청 전에 건너뛴다.
+"""
+from typing import List, Dict, Any, Optional
+from functools import lru_cache
+
+from app.core.config import settings
+from app.core.serialization import dumps
+
+# 메시지마다 붙는 role/구분자 토큰
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8192)
+def estimate_tokens(text: str) -> int:
+    """
+    빠른 로컬 토큰 수 추정
+
+    영문 등 ASCII는 약 4자당 1토큰, 한글 등 멀티바이트 문자는 약 1자당 1토큰으로 계산한다.
+    (UTF-8 인코딩 길이 차이로 멀티바이트 문자 수를 근사)
+    """
+    if not text:
+        return 0
+    multibyte = (len(text.encode("utf-8")) - len(text)) // 2
+    return (len(text) - multibyte) // 4 + multibyte + 1
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """메시지 하나의 토큰 수 추정"""
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += estimate_tokens(content)
+    if message.get("tool_calls"):
+        tokens += estimate_tokens(dumps(message["tool_calls"], sort_keys=True))
+    return tokens
+
+
+@lru_cache(maxsize=32)
+def _schema_tokens(schema: str) -> int:
+    return estimate_tokens(schema)
+
+
+def tools_tokens(tools: Optional[List[Dict[str, Any]]]) -> int:
+    """Tool 스키마가 차지하는 토큰 수 추정"""
+    if not tools:
+        return 0
+    return _schema_tokens(dumps(tools, sort_keys=True))
+
+
+def fit_messages(
+    messages: List[Dict[str, Any]],
+    context_length: int,
+    max_tokens: int,
+    tools: Optional[List[Dict[str, Any]]] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    모델의 context window에 들어가도록 메시지 목록을 구성
+
+    앞쪽 system 메시지와 마지막 메시지는 항상 포함하고, 그 사이의 대화 기록은
+    최신 메시지부터 예산이 허락하는 만큼 채운다.
+
+    Returns:
+        모델에 보낼 메시지 목록, 필수 메시지조차 들어가지 않으면 None
+    """
+    budget = context_length - max_tokens - tools_tokens(tools) - settings.context_safety_margin_tokens
+
+    head = 0
+    while head < len(messages) - 1 and messages[head].get("role") == "system":
+        head += 1
+    pinned = messages[:head] + messages[-1:]
+
+    budget -= sum(message_tokens(msg) for msg in pinned)
+    if budget < 0:
+        return None
+
+    history = messages[head:-1]
+    start = len(history)
+    while start > 0:
+        cost = message_tokens(history[start - 1])
+        if cost > budget:
+            break
+        budget -= cost
+        start -= 1
+
+    if start == 0:
+        return list(messages)
+    return messages[:head] + history[start:] + messages[-1:]
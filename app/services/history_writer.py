@@ -0,0 +1,199 @@
+"""
+History Writer
+ChatHistory 저장을 요청 경로에서 분리하는 write-behind 큐.
+요청마다 세션을 열고 commit하는 대신, 단일 writer 태스크가 큐에 쌓인 행을 모아
+settings.history_batch_size개 또는 settings.history_flush_interval_seconds마다 한 번에 commit한다.
+
+- 큐는 settings.history_queue_max_size로 제한되며, 가득 차면 submit()이 자리가 날 때까지 대기 (backpressure)
+- 실패한 batch는 backoff하며 history_write_retries번 재시도하고, 그래도 실패하면 한 행씩 저장해서
+  문제가 있는 행만 버림 (버린 행은 failed 지표와 에러 로그에 남음)
+- 사용량 rollup(usage_rollup)은 history insert와 별도 트랜잭션으로 갱신 - rollup 실패가 history 행을 잃게 하지 않음
+- close()는 lifespan 종료 시 큐에 남은 행을 모두 저장한 뒤 writer를 멈춤
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.models.database import ChatHistory, AsyncSessionLocal
+from app.services.usage_rollup import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """ChatHistory 행을 모아서 group commit하는 단일 writer"""
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        flush_interval_seconds: float,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 0.1
+    ):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Metrics
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.rollup_failed = 0
+        self.batches = 0
+        self.blocked = 0  # 큐가 가득 차서 대기한 submit 수
+        self.blocked_seconds = 0.0
+        self.queue_high_watermark = 0
+
+    def start(self):
+        """Writer 태스크 시작 (submit 시 자동으로 호출됨)"""
+        if self._writer is None:
+            self._closing = False
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._writer = asyncio.create_task(self._run())
+
+    async def close(self):
+        """큐에 남은 행을 모두 저장하고 writer 종료"""
+        if self._writer is None:
+            return
+        self._closing = True
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        logger.info(f"History writer flushed: {self.stats()}")
+
+    async def submit(self, **row: Any):
+        """ChatHistory 행 저장 예약 (큐가 가득 차면 대기)"""
+        self.start()
+        # 배치가 commit되는 시점이 아닌 요청 시점 기준으로 기록
+        row.setdefault("created_at", datetime.utcnow())
+        if self._queue.full():
+            self.blocked += 1
+            started = time.monotonic()
+            await self._queue.put(row)
+            self.blocked_seconds += time.monotonic() - started
+        else:
+            self._queue.put_nowait(row)
+        self.submitted += 1
+        self.queue_high_watermark = max(self.queue_high_watermark, self._queue.qsize())
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            # 종료 중에는 기다리지 않고 바로 저장
+            timeout = deadline - time.monotonic()
+            if self._closing or timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._save(batch)
+            except Exception as e:
+                logger.error(f"Unexpected error saving chat history batch: {str(e)}")
+            finally:
+                self.batches += 1
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _save(self, batch: List[Dict[str, Any]]):
+        """History 행 저장 후 rollup 반영 - batch 전체가 계속 실패하면 행 단위로 저장"""
+        saved = batch
+        try:
+            await self._retry(self._write, batch)
+        except Exception as e:
+            logger.error(f"Failed to save {len(batch)} chat history rows as a batch, saving row by row: {str(e)}")
+            saved = []
+            for row in batch:
+                try:
+                    await self._write([row])
+                    saved.append(row)
+                except Exception as row_error:
+                    self.failed += 1
+                    logger.error(
+                        f"Dropping chat history row for session {row.get('session_id')}: {str(row_error)}"
+                    )
+        self.written += len(saved)
+        if not saved:
+            return
+
+        try:
+            await self._retry(self._write_rollups, saved)
+        except Exception as e:
+            self.rollup_failed += len(saved)
+            logger.error(f"Failed to update usage rollups for {len(saved)} chat history rows: {str(e)}")
+
+    async def _retry(self, write, batch: List[Dict[str, Any]]):
+        """write(batch)를 max_retries번까지 exponential backoff으로 재시도"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await write(batch)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                delay = self.retry_backoff_seconds * (2 ** attempt)
+                logger.warning(f"Chat history write failed ({str(e)}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _write(batch: List[Dict[str, Any]]):
+        async with AsyncSessionLocal() as db:
+            db.add_all([ChatHistory(**row) for row in batch])
+            await db.commit()
+
+    @staticmethod
+    async def _write_rollups(batch: List[Dict[str, Any]]):
+        async with AsyncSessionLocal() as db:
+            await apply_rollups(db, batch)
+            await db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """큐 상태와 backpressure 지표"""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "queue_high_watermark": self.queue_high_watermark,
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rollup_failed": self.rollup_failed,
+            "batches": self.batches,
+            "avg_batch_size": self.written / self.batches if self.batches else 0.0,
+            "blocked": self.blocked,
+            "blocked_seconds": round(self.blocked_seconds, 3)
+        }
+
+
+# Global instance
+history_writer = HistoryWriter(
+    max_queue_size=settings.history_queue_max_size,
+    batch_size=settings.history_batch_size,
+    flush_interval_seconds=settings.history_flush_interval_seconds,
+    max_retries=settings.history_write_retries,
+    retry_backoff_seconds=settings.history_retry_backoff_seconds
+)
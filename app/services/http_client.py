@@ -0,0 +1,75 @@
+"""
+Shared HTTP transport
+모든 OpenRouter 트래픽(OpenAI SDK 클라이언트, LangChain ChatOpenAI, httpx 직접 호출)이
+하나의 커넥션 풀을 공유하도록 하여 요청마다 TCP+TLS handshake를 하지 않도록 함
+"""
+from typing import Optional
+import httpx
+from openai import AsyncOpenAI
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_http_client: Optional[httpx.AsyncClient] = None
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 사용에 필요한 h2 패키지 설치 여부"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """프로세스 전역 httpx 클라이언트 (HTTP/2 + keep-alive 커넥션 풀)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        http2 = settings.http2_enabled and _http2_available()
+        if settings.http2_enabled and not http2:
+            logger.warning("h2 package not installed, falling back to HTTP/1.1 (pip install 'httpx[http2]')")
+
+        _http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                settings.http_timeout_seconds,
+                connect=settings.http_connect_timeout_seconds
+            )
+        )
+    return _http_client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """공유 transport를 사용하는 OpenRouter용 AsyncOpenAI 클라이언트"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(
+            base_url=settings.openrouter_base_url,
+            api_key=settings.openrouter_api_key,
+            default_headers={
+                "HTTP-Referer": "http://localhost:8000",  # Fixed port
+                "X-Title": "Agent LLM POC"
+            },
+            timeout=settings.http_timeout_seconds,
+            max_retries=1,  # 재시도 1회
+            http_client=get_http_client()
+        )
+    return _openai_client
+
+
+async def close_http_client():
+    """공유 커넥션 풀 종료 (애플리케이션 shutdown 시 호출)"""
+    global _http_client, _openai_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+    _openai_client = None
@@ -5,10 +5,13 @@ Model Fallback System
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
-import httpx
 from datetime import datetime, timedelta
 import asyncio
 from app.core.config import settings
+from app.core.serialization import dumps_bytes, loads
+from app.services.circuit_breaker import circuit_breaker, is_rate_limit_error
+from app.services.rate_limiter import rate_limiter
+from app.services.http_client import get_http_client
 import structlog
 
 logger = structlog.get_logger()
@@ -106,6 +109,10 @@ class ModelManager:
             # 연속 에러가 5회 이상이면 일시적으로 제외
             if model.consecutive_errors >= 5:
                 continue
+            
+            # 공유 circuit breaker가 열려 있거나 rate limit에 걸렸으면 제외
+            if not circuit_breaker.is_available(model.id) or not rate_limiter.is_available(model.id):
+                continue
                 
             available_models.append(model)
             
@@ -135,13 +142,12 @@ class ModelManager:
         model = self.model_dict[model_id]
         model.consecutive_errors += 1
         
-        error_msg = str(error).lower()
-        
-        # Rate limit 에러 처리
-        if "rate" in error_msg and "limit" in error_msg:
+        # Rate limit 에러 처리 - 대기 시간은 rate limiter가 헤더(Retry-After 등)로 계산한 값
+        if is_rate_limit_error(str(error)):
+            retry_after = rate_limiter.blocked_for(model_id) or settings.rate_limit_backoff_seconds
             model.status = ModelStatus.RATE_LIMITED
-            model.rate_limit_retry_after = datetime.now() + timedelta(minutes=5)
-            logger.warning(f"Model {model_id} rate limited, retry after 5 minutes")
+            model.rate_limit_retry_after = datetime.now() + timedelta(seconds=retry_after)
+            logger.warning(f"Model {model_id} rate limited, retry after {retry_after:.0f} seconds")
             
         # 기타 에러
         elif model.consecutive_errors >= 5:
@@ -196,6 +202,16 @@ class OpenRouterClientWithFallback:
         
         # 각 모델로 시도
         for model in models:
+            if not circuit_breaker.allow_request(model.id):
+                logger.info(f"Skipping model {model.id}: circuit open")
+                last_error = last_error or Exception(f"Circuit open for {model.id}")
+                continue
+            if rate_limiter.try_acquire(model.id):
+                circuit_breaker.release(model.id)
+                logger.info(f"Skipping model {model.id}: rate limit reached")
+                last_error = last_error or Exception(f"Rate limit reached for {model.id}")
+                continue
+            
             try:
                 logger.info(f"Trying model: {model.id}")
                 
@@ -208,6 +224,7 @@ class OpenRouterClientWithFallback:
                 
                 # 성공 시 모델 상태 업데이트
                 self.model_manager.mark_model_success(model.id)
+                circuit_breaker.record_success(model.id)
                 
                 # 결과에 사용된 모델 정보 추가
                 result["model_used"] = model.id
@@ -220,15 +237,24 @@ class OpenRouterClientWithFallback:
                 
                 return result
                 
+            except asyncio.CancelledError:
+                # 요청이 취소됨 - 모델 상태는 알 수 없으므로 circuit breaker 시험 요청 슬롯만 반환
+                circuit_breaker.release(model.id)
+                raise
+                
             except Exception as e:
                 last_error = e
                 logger.error(f"Model {model.id} failed: {str(e)}")
                 
                 # 에러 기록
                 self.model_manager.mark_model_error(model.id, e)
+                circuit_breaker.record_failure(model.id, str(e), rate_limiter.blocked_for(model.id) or None)
                 
                 # 다음 모델로 시도
                 continue
+            
+            finally:
+                rate_limiter.release(model.id)
                 
         # 모든 모델 실패
         raise Exception(f"All models failed. Last error: {str(last_error)}")
@@ -258,17 +284,20 @@ class OpenRouterClientWithFallback:
         if tools:
             payload["tools"] = tools
             
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload
-            )
+        # 공유 커넥션 풀 사용 (요청마다 새 연결을 만들지 않음)
+        response = await get_http_client().post(
+            f"{self.base_url}/chat/completions",
+            headers=headers,
+            content=dumps_bytes(payload)
+        )
+        
+        if response.status_code == 429:
+            rate_limiter.record_rate_limited(model_id, response.headers)
+        if response.status_code != 200:
+            raise Exception(f"API Error: {response.status_code} - {response.text}")
+        rate_limiter.record_success(model_id, response.headers)
             
-            if response.status_code != 200:
-                raise Exception(f"API Error: {response.status_code} - {response.text}")
-                
-            return response.json()
+        return loads(response.content)
 
 
 # 싱글톤 인스턴스
@@ -1,36 +1,30 @@
-from openai import AsyncOpenAI
 from typing import List, Dict, Any, Optional
-import json
 import asyncio
+import logging
+import time
 
 from app.core.config import settings
-from app.tools import get_tools_for_openai, get_tool
+from app.core.metrics import llm_request_duration
+from app.core.tracing import span, record_attempt
+from app.services.circuit_breaker import circuit_breaker
+from app.services.rate_limiter import rate_limiter, rate_limit_delay, create_completion, RateLimited
+from app.core.model_config import get_model_by_id
+from app.services.context_builder import fit_messages
+from app.services.completion_cache import completion_cache, is_deterministic, make_cache_key
+from app.services.http_client import get_openai_client
+from app.services.tool_executor import Deadline, run_tool_loop
+from app.tools import get_tools_for_openai
+
+logger = logging.getLogger(__name__)
 
 
 class OpenRouterClient:
     def __init__(self):
-        # Connection pooling과 timeout 설정 추가
-        self.client = AsyncOpenAI(
-            base_url=settings.openrouter_base_url,
-            api_key=settings.openrouter_api_key,
-            default_headers={
-                "HTTP-Referer": "http://localhost:8000",  # Fixed port
-                "X-Title": "Agent LLM POC"  # Optional
-            },
-            timeout=30.0,  # 30초 타임아웃
-            max_retries=1  # 재시도 1회
-        )
+        # 프로세스 전역 커넥션 풀(HTTP/2 + keep-alive)을 공유
+        self.client = get_openai_client()
     
-    async def chat_completion_with_tools(
-        self,
-        messages: List[Dict[str, str]],
-        model: Optional[str] = None,
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
-    ) -> Dict[str, Any]:
-        """Chat completion with tool calling support"""
-        
-        # Determine models to try
+    def _get_models_to_try(self, model: Optional[str]) -> List[str]:
+        """Determine models to try (target model first, then fallbacks)"""
         target_model = model or settings.default_model
         models_to_try = [target_model]
         
@@ -42,215 +36,287 @@ class OpenRouterClient:
             fallback_list = [m for m in settings.fallback_models_list if m != target_model]
             models_to_try.extend(fallback_list)
         
+        return models_to_try
+    
+    def _fit_messages(
+        self,
+        model_id: str,
+        messages: List[Dict[str, str]],
+        tools: Optional[List[Dict[str, Any]]],
+        max_tokens: int
+    ) -> Optional[List[Dict[str, str]]]:
+        """Pack history into the model's context window (None if the prompt can never fit)"""
+        model_config = get_model_by_id(model_id)
+        if model_config is None:
+            return list(messages)  # Unknown window, send as-is
+        return fit_messages(messages, model_config.context_length, max_tokens, tools)
+    
+    async def chat_completion_with_tools(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Chat completion with multi-round tool calling support"""
+        
+        deadline = Deadline(settings.request_deadline_seconds)
+        models_to_try = self._get_models_to_try(model)
+        max_tokens = max_tokens or settings.max_tokens
+        # Get all available tools in OpenAI format
+        tools = get_tools_for_openai()
         last_error = None
+        response = None
+        requested = False
+        rate_limited_for: Optional[float] = None  # Soonest a rate-limited model frees up
         
         for attempt, current_model in enumerate(models_to_try):
+            # Skip models whose context window can never fit the prompt
+            model_messages = self._fit_messages(current_model, messages, tools, max_tokens)
+            if model_messages is None:
+                logger.debug(f"Skipping model {current_model}: prompt exceeds context window")
+                last_error = last_error or f"Prompt exceeds context window of {current_model}"
+                continue
+            
+            # Skip models whose circuit is open
+            if not circuit_breaker.allow_request(current_model):
+                logger.debug(f"Skipping model {current_model}: circuit open")
+                last_error = last_error or f"Circuit open for {current_model}"
+                continue
+            
+            # Skip models whose rate limit is reached (no round trip just to get a 429)
+            skip_reason = rate_limiter.try_acquire(current_model)
+            if skip_reason:
+                circuit_breaker.release(current_model)
+                logger.debug(f"Skipping model {current_model}: rate limit ({skip_reason})")
+                last_error = last_error or f"Rate limit reached for {current_model}"
+                record_attempt(current_model, f"skipped_{skip_reason}")
+                available_in = rate_limiter.available_in(current_model)
+                rate_limited_for = available_in if rate_limited_for is None else min(rate_limited_for, available_in)
+                continue
+            
+            requested = True
+            started = time.perf_counter()
             try:
-                # Get all available tools in OpenAI format
-                tools = get_tools_for_openai()
-                
                 # Debug logging
-                print(f"[DEBUG] Attempt {attempt + 1}: Using model: {current_model}")
+                logger.debug(f"Attempt {attempt + 1}: Using model: {current_model}")
                 if attempt > 0:
-                    print(f"[DEBUG] Fallback attempt after error: {last_error}")
+                    logger.debug(f"Fallback attempt after error: {last_error}")
                 
-                # Make the API call0
-                response = await self.client.chat.completions.create(
-                    model=current_model,
-                    messages=messages,
-                    tools=tools,
-                    tool_choice="auto",  # Let the model decide when to use tools
-                    temperature=temperature or settings.temperature,
-                    max_tokens=max_tokens or settings.max_tokens
-                )
+                # Make the API call
+                with span("llm"):
+                    response = await create_completion(
+                        self.client,
+                        model=current_model,
+                        messages=model_messages,
+                        tools=tools,
+                        tool_choice="auto",  # Let the model decide when to use tools
+                        temperature=settings.temperature if temperature is None else temperature,
+                        max_tokens=max_tokens
+                    )
                 
                 # If successful, break the loop
-                print(f"[DEBUG] Success with model: {current_model}")
+                circuit_breaker.record_success(current_model)
+                llm_request_duration.labels(model=current_model, outcome="success").observe(time.perf_counter() - started)
+                record_attempt(current_model, "success", time.perf_counter() - started)
+                logger.debug(f"Success with model: {current_model}")
                 break
                 
+            except asyncio.CancelledError:
+                # 요청이 취소됨 (클라이언트 종료, agent_timeout) - 모델 상태는 알 수 없으므로 시험 요청 슬롯만 반환
+                circuit_breaker.release(current_model)
+                llm_request_duration.labels(model=current_model, outcome="cancelled").observe(time.perf_counter() - started)
+                record_attempt(current_model, "cancelled", time.perf_counter() - started)
+                raise
+                
             except Exception as e:
                 last_error = str(e)
-                print(f"[DEBUG] Model {current_model} failed: {str(e)}")
-                
-                # If this is the last model to try, return error
-                if attempt == len(models_to_try) - 1:
-                    print(f"[ERROR] All models failed. Last error: {str(e)}")
-                    return {
-                        "content": f"Error: All models failed. Last error: {str(e)}",
-                        "tool_calls": [],
-                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-                    }
+                circuit_breaker.record_failure(current_model, last_error, rate_limit_delay(current_model, e))
+                llm_request_duration.labels(model=current_model, outcome="error").observe(time.perf_counter() - started)
+                record_attempt(current_model, "error", time.perf_counter() - started)
+                logger.warning(f"Model {current_model} failed: {str(e)}")
                 
                 # Continue to next model
                 continue
+            
+            finally:
+                rate_limiter.release(current_model)
         
-        # Extract the response
-        if not response.choices:
+        # Nothing was sent - local rate limits, not an upstream failure
+        if not requested and rate_limited_for is not None:
+            raise RateLimited(rate_limited_for)
+        
+        # All models failed (or were skipped by the circuit breaker)
+        if response is None:
+            logger.error(f"All models failed. Last error: {last_error}")
             return {
-                "content": "Error: No response from model",
+                "content": f"Error: All models failed. Last error: {last_error}",
                 "tool_calls": [],
                 "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
             }
         
-        message = response.choices[0].message
-        
-        # Check if the model wants to use any tools
-        if message.tool_calls:
-            tool_results = []
-            
-            # 병렬로 tool 실행을 위한 태스크 준비
-            async def execute_tool(tool_call):
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
-                
-                # Get and execute the tool
-                tool = get_tool(tool_name)
-                if tool is None:
-                    result = {"error": f"Tool '{tool_name}' not found"}
-                else:
-                    try:
-                        result = await tool.execute(**tool_args)
-                    except Exception as e:
-                        result = {"error": f"Tool execution failed: {str(e)}"}
-                
-                return {
-                    "tool_call_id": tool_call.id,
-                    "tool_name": tool_name,
-                    "tool_args": tool_args,
-                    "result": result
-                }
-            
-            # 모든 tool을 병렬로 실행
-            if len(message.tool_calls) > 1:
-                # 여러 tool이 있으면 병렬 실행
-                tool_results = await asyncio.gather(
-                    *[execute_tool(tool_call) for tool_call in message.tool_calls]
-                )
-            else:
-                # 단일 tool은 그냥 실행
-                tool_results = [await execute_tool(message.tool_calls[0])]
-            
-            # Add the assistant's message with tool calls to history
-            messages.append({
-                "role": "assistant",
-                "content": message.content or "",
-                "tool_calls": [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        }
-                    }
-                    for tc in message.tool_calls
-                ]
-            })
-            
-            # Add tool results to messages
-            for tool_result in tool_results:
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_result["tool_call_id"],
-                    "content": json.dumps(tool_result["result"])
-                })
-            
-            # Make another API call with the tool results
-            final_response = await self.client.chat.completions.create(
-                model=model or settings.default_model,
-                messages=messages,
-                temperature=temperature or settings.temperature,
-                max_tokens=max_tokens or settings.max_tokens
-            )
-            
-            return {
-                "content": final_response.choices[0].message.content,
-                "tool_calls": tool_results,
-                "usage": {
-                    "prompt_tokens": getattr(response.usage, 'prompt_tokens', 0) + getattr(final_response.usage, 'prompt_tokens', 0),
-                    "completion_tokens": getattr(response.usage, 'completion_tokens', 0) + getattr(final_response.usage, 'completion_tokens', 0),
-                    "total_tokens": getattr(response.usage, 'total_tokens', 0) + getattr(final_response.usage, 'total_tokens', 0)
-                }
-            }
-        else:
-            # No tool calls, return the response directly
+        # Extract the response
+        if not response.choices:
             return {
-                "content": message.content,
+                "content": "Error: No response from model",
                 "tool_calls": [],
-                "usage": {
-                    "prompt_tokens": getattr(response.usage, 'prompt_tokens', 0),
-                    "completion_tokens": getattr(response.usage, 'completion_tokens', 0),
-                    "total_tokens": getattr(response.usage, 'total_tokens', 0)
-                }
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
             }
+        
+        # Run tool rounds (bounded by settings.max_tool_rounds and the request deadline)
+        result = await run_tool_loop(
+            client=self.client,
+            model_id=current_model,
+            messages=model_messages,
+            response=response,
+            tools=tools,
+            temperature=settings.temperature if temperature is None else temperature,
+            max_tokens=max_tokens,
+            deadline=deadline
+        )
+        return {**result, "model_used": current_model}
     
     async def simple_chat_completion(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        use_cache: bool = False
     ) -> Dict[str, Any]:
-        """Simple chat completion without tools"""
+        """Simple chat completion without tools (use_cache=True enables the completion cache for deterministic requests)"""
         
-        # Determine models to try
-        target_model = model or settings.default_model
-        models_to_try = [target_model]
+        models_to_try = self._get_models_to_try(model)
+        temperature = settings.temperature if temperature is None else temperature
+        max_tokens = max_tokens or settings.max_tokens
         
-        # Add fallback models if enabled
-        if settings.fallback_enabled and target_model not in settings.fallback_models_list:
-            models_to_try.extend(settings.fallback_models_list)
-        elif settings.fallback_enabled:
-            # If target model is in fallback list, try others as backup
-            fallback_list = [m for m in settings.fallback_models_list if m != target_model]
-            models_to_try.extend(fallback_list)
+        async def complete() -> Dict[str, Any]:
+            return await self._simple_chat_completion(models_to_try, messages, temperature, max_tokens)
+        
+        if not (use_cache and is_deterministic(temperature)):
+            return {**await complete(), "cached": False}
         
+        key = make_cache_key(
+            messages=messages,
+            models=models_to_try,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        result, cached = await completion_cache.get_or_compute(
+            key,
+            complete,
+            should_store=lambda r: r.get("model_used") is not None
+        )
+        return {**result, "cached": cached}
+    
+    async def _simple_chat_completion(
+        self,
+        models_to_try: List[str],
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """Try each model in order without tools"""
         last_error = None
+        response = None
+        requested = False
+        rate_limited_for: Optional[float] = None  # Soonest a rate-limited model frees up
         
         for attempt, current_model in enumerate(models_to_try):
+            # Skip models whose context window can never fit the prompt
+            model_messages = self._fit_messages(current_model, messages, None, max_tokens)
+            if model_messages is None:
+                logger.debug(f"[Simple] Skipping model {current_model}: prompt exceeds context window")
+                last_error = last_error or f"Prompt exceeds context window of {current_model}"
+                continue
+            
+            # Skip models whose circuit is open
+            if not circuit_breaker.allow_request(current_model):
+                logger.debug(f"[Simple] Skipping model {current_model}: circuit open")
+                last_error = last_error or f"Circuit open for {current_model}"
+                continue
+            
+            # Skip models whose rate limit is reached (no round trip just to get a 429)
+            skip_reason = rate_limiter.try_acquire(current_model)
+            if skip_reason:
+                circuit_breaker.release(current_model)
+                logger.debug(f"[Simple] Skipping model {current_model}: rate limit ({skip_reason})")
+                last_error = last_error or f"Rate limit reached for {current_model}"
+                record_attempt(current_model, f"skipped_{skip_reason}")
+                available_in = rate_limiter.available_in(current_model)
+                rate_limited_for = available_in if rate_limited_for is None else min(rate_limited_for, available_in)
+                continue
+            
+            requested = True
+            started = time.perf_counter()
             try:
                 # Debug logging
-                print(f"[DEBUG Simple] Attempt {attempt + 1}: Using model: {current_model}")
+                logger.debug(f"[Simple] Attempt {attempt + 1}: Using model: {current_model}")
                 if attempt > 0:
-                    print(f"[DEBUG Simple] Fallback attempt after error: {last_error}")
+                    logger.debug(f"[Simple] Fallback attempt after error: {last_error}")
                 
-                response = await self.client.chat.completions.create(
-                    model=current_model,
-                    messages=messages,
-                    temperature=temperature or settings.temperature,
-                    max_tokens=max_tokens or settings.max_tokens
-                )
+                with span("llm"):
+                    response = await create_completion(
+                        self.client,
+                        model=current_model,
+                        messages=model_messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
                 
                 # If successful, break the loop
-                print(f"[DEBUG Simple] Success with model: {current_model}")
+                circuit_breaker.record_success(current_model)
+                llm_request_duration.labels(model=current_model, outcome="success").observe(time.perf_counter() - started)
+                record_attempt(current_model, "success", time.perf_counter() - started)
+                logger.debug(f"[Simple] Success with model: {current_model}")
                 break
                 
+            except asyncio.CancelledError:
+                # 요청이 취소됨 (클라이언트 종료, agent_timeout) - 모델 상태는 알 수 없으므로 시험 요청 슬롯만 반환
+                circuit_breaker.release(current_model)
+                llm_request_duration.labels(model=current_model, outcome="cancelled").observe(time.perf_counter() - started)
+                record_attempt(current_model, "cancelled", time.perf_counter() - started)
+                raise
+                
             except Exception as e:
                 last_error = str(e)
-                print(f"[DEBUG Simple] Model {current_model} failed: {str(e)}")
-                
-                # If this is the last model to try, return error
-                if attempt == len(models_to_try) - 1:
-                    print(f"[ERROR Simple] All models failed. Last error: {str(e)}")
-                    return {
-                        "content": f"Error: All models failed. Last error: {str(e)}",
-                        "tool_calls": [],
-                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-                    }
+                circuit_breaker.record_failure(current_model, last_error, rate_limit_delay(current_model, e))
+                llm_request_duration.labels(model=current_model, outcome="error").observe(time.perf_counter() - started)
+                record_attempt(current_model, "error", time.perf_counter() - started)
+                logger.warning(f"[Simple] Model {current_model} failed: {str(e)}")
                 
                 # Continue to next model
                 continue
+            
+            finally:
+                rate_limiter.release(current_model)
+        
+        # Nothing was sent - local rate limits, not an upstream failure
+        if not requested and rate_limited_for is not None:
+            raise RateLimited(rate_limited_for)
+        
+        # All models failed (or were skipped by the circuit breaker)
+        if response is None:
+            logger.error(f"[Simple] All models failed. Last error: {last_error}")
+            return {
+                "content": f"Error: All models failed. Last error: {last_error}",
+                "tool_calls": [],
+                "model_used": None,
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }
         
         if not response.choices:
             return {
                 "content": "Error: No response from model",
                 "tool_calls": [],
+                "model_used": None,
                 "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
             }
         
         return {
             "content": response.choices[0].message.content or "No response",
             "tool_calls": [],
+            "model_used": current_model,
             "usage": {
                 "prompt_tokens": getattr(response.usage, 'prompt_tokens', 0),
                 "completion_tokens": getattr(response.usage, 'completion_tokens', 0),
@@ -1,33 +1,61 @@
 """
 OpenRouter client with model fallback support
 """
-from openai import AsyncOpenAI
-from typing import List, Dict, Any, Optional, AsyncGenerator
-import json
+from typing import List, Dict, Any, Optional, AsyncGenerator, Deque, Tuple
+from collections import defaultdict, deque
+import time
 import asyncio
 from app.core.config import settings
-from app.core.model_config import get_fallback_models, get_model_by_id
-from app.tools import get_tools_for_openai, get_tool
+from app.core.serialization import dumps, loads, JSONDecodeError
+from app.core.model_config import ModelConfig, get_fallback_models, get_model_by_id
+from app.services.circuit_breaker import circuit_breaker
+from app.services.rate_limiter import rate_limiter, rate_limit_delay, create_completion, RateLimited
+from app.core.metrics import llm_request_duration, llm_time_to_first_token, record_fallback
+from app.core.tracing import span, add_stage, record_attempt
+from app.services.context_builder import fit_messages
+from app.services.completion_cache import completion_cache, is_deterministic, make_cache_key
+from app.services.tool_executor import Deadline, StreamingToolCallAssembler, acquire_followup_slot, run_tool_loop
+from app.services.http_client import get_openai_client
+from app.tools import get_tools_for_openai
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class ModelLatencyTracker:
+    """모델별 최근 응답 시간 기록 (hedge 지연 계산용)"""
+    
+    def __init__(self, window: int = 200):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+    
+    def record(self, model_id: str, seconds: float):
+        """성공한 요청의 latency 기록"""
+        self._samples[model_id].append(seconds)
+    
+    def p95(self, model_id: str, min_samples: int) -> Optional[float]:
+        """샘플이 충분하면 p95 latency 반환"""
+        samples = self._samples.get(model_id)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
 class OpenRouterFallbackClient:
     """Model fallback을 지원하는 OpenRouter 클라이언트"""
     
     def __init__(self):
-        # Connection pooling과 timeout 설정 추가
-        self.client = AsyncOpenAI(
-            base_url=settings.openrouter_base_url,
-            api_key=settings.openrouter_api_key,
-            default_headers={
-                "HTTP-Referer": "http://localhost:8000",  # Fixed port
-                "X-Title": "Agent LLM POC"
-            },
-            timeout=30.0,  # 30초 타임아웃
-            max_retries=1  # 재시도 1회
-        )
+        # 프로세스 전역 커넥션 풀(HTTP/2 + keep-alive)을 공유
+        self.client = get_openai_client()
+        self.latency_tracker = ModelLatencyTracker()
+        
+    def _hedge_delay(self, model_id: str) -> float:
+        """다음 모델로 hedge 요청을 보내기 전까지 기다릴 시간"""
+        if settings.hedge_use_p95:
+            p95 = self.latency_tracker.p95(model_id, settings.hedge_min_samples)
+            if p95 is not None:
+                return p95
+        return settings.hedge_delay_seconds
         
     async def _try_model(
         self,
@@ -38,13 +66,14 @@ class OpenRouterFallbackClient:
         max_tokens: Optional[int] = None
     ) -> Dict[str, Any]:
         """단일 모델로 시도"""
+        started = time.perf_counter()
         try:
             logger.info(f"Trying model: {model_id}")
             
             kwargs = {
                 "model": model_id,
                 "messages": messages,
-                "temperature": temperature or settings.temperature,
+                "temperature": settings.temperature if temperature is None else temperature,
                 "max_tokens": max_tokens or settings.max_tokens
             }
             
@@ -53,9 +82,15 @@ class OpenRouterFallbackClient:
                 kwargs["tools"] = tools
                 kwargs["tool_choice"] = "auto"
             
-            response = await self.client.chat.completions.create(**kwargs)
+            with span("llm"):
+                response = await create_completion(self.client, **kwargs)
             
             # 성공한 경우
+            elapsed = time.perf_counter() - started
+            self.latency_tracker.record(model_id, elapsed)
+            llm_request_duration.labels(model=model_id, outcome="success").observe(elapsed)
+            record_attempt(model_id, "success", elapsed)
+            circuit_breaker.record_success(model_id)
             logger.info(f"Model {model_id} succeeded")
             return {
                 "success": True,
@@ -63,34 +98,33 @@ class OpenRouterFallbackClient:
                 "model_used": model_id
             }
             
+        except asyncio.CancelledError:
+            # hedge에서 진 요청 - 모델 상태는 알 수 없으므로 시험 요청 슬롯만 반환
+            circuit_breaker.release(model_id)
+            llm_request_duration.labels(model=model_id, outcome="cancelled").observe(time.perf_counter() - started)
+            record_attempt(model_id, "cancelled", time.perf_counter() - started)
+            raise
+            
         except Exception as e:
             error_msg = str(e)
             logger.warning(f"Model {model_id} failed: {error_msg}")
+            llm_request_duration.labels(model=model_id, outcome="error").observe(time.perf_counter() - started)
+            record_attempt(model_id, "error", time.perf_counter() - started)
             
             # 특정 에러는 다른 모델로도 해결 안될 수 있음
             if "Invalid API key" in error_msg or "Unauthorized" in error_msg:
+                circuit_breaker.release(model_id)
                 raise  # API 키 문제는 fallback 해도 소용없음
-                
+            
+            circuit_breaker.record_failure(model_id, error_msg, rate_limit_delay(model_id, e))
             return {
                 "success": False,
                 "error": error_msg,
                 "model_used": model_id
             }
     
-    async def chat_completion_with_fallback(
-        self,
-        messages: List[Dict[str, str]],
-        use_tools: bool = True,
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None,
-        free_only: bool = True
-    ) -> Dict[str, Any]:
-        """Fallback을 지원하는 채팅 완성"""
-        
-        # Tool이 필요한 경우 OpenAI 형식으로 가져오기
-        tools = get_tools_for_openai() if use_tools else None
-        
-        # DEFAULT_MODEL을 먼저 시도할 모델 리스트 생성
+    def _get_models_to_try(self, use_tools: bool, free_only: bool) -> List[ModelConfig]:
+        """DEFAULT_MODEL을 먼저 시도하는 모델 체인 생성"""
         models_to_try = []
         
         # DEFAULT_MODEL 정보 가져오기
@@ -113,43 +147,249 @@ class OpenRouterFallbackClient:
             if model.id != settings.default_model:
                 models_to_try.append(model)
         
+        return models_to_try
+    
+    def _fit_messages(
+        self,
+        model_config: ModelConfig,
+        messages: List[Dict[str, str]],
+        tools: Optional[List[Dict]],
+        max_tokens: int
+    ) -> Optional[List[Dict[str, str]]]:
+        """모델의 context window에 맞춘 메시지 (들어가지 않으면 None)"""
+        return fit_messages(
+            messages,
+            context_length=model_config.context_length,
+            max_tokens=max_tokens,
+            tools=tools if model_config.supports_tools else None
+        )
+    
+    async def _race_models(
+        self,
+        models_to_try: List[ModelConfig],
+        messages: List[Dict[str, str]],
+        tools: Optional[List[Dict]],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        max_hedges: int
+    ) -> Tuple[Optional[ModelConfig], Optional[Dict[str, Any]], Optional[str]]:
+        """
+        모델 체인을 hedge 방식으로 실행
+        
+        진행 중인 요청이 hedge 지연 안에 끝나지 않으면 다음 모델에도 같은 요청을 보내고,
+        가장 먼저 성공한 응답을 사용하며 나머지 요청은 취소한다.
+        실패한 요청은 즉시 다음 모델로 넘어간다. max_hedges=0이면 순차 fallback과 같다.
+        
+        Context window에 프롬프트가 들어가지 않는 모델은 요청하지 않고 건너뛴다.
+        
+        Returns:
+            (성공한 모델, _try_model 결과 + 실제 보낸 "messages", 마지막 에러)
+        
+        Raises:
+            RateLimited: 요청을 하나도 보내지 않았고 로컬 rate limit으로 건너뛴 모델이 있음
+        """
+        queue = list(models_to_try)
+        pending: Dict[asyncio.Task, Tuple[ModelConfig, List[Dict[str, str]]]] = {}
+        last_error = None
+        handoff: Optional[Tuple[str, str]] = None  # (넘겨준 모델, 이유) - fallback metric용
+        requested = False
+        rate_limited_for: Optional[float] = None  # 한도로 건너뛴 모델 중 가장 빨리 풀리는 시간
+        
+        try:
+            while queue or pending:
+                if queue and len(pending) <= max_hedges:
+                    model_config = queue.pop(0)
+                    with span("context_fit"):
+                        model_messages = self._fit_messages(model_config, messages, tools, max_tokens)
+                    if model_messages is None:
+                        logger.info(f"Skipping model {model_config.id}: prompt exceeds context window")
+                        last_error = last_error or f"Prompt exceeds context window of {model_config.id}"
+                        handoff = (model_config.id, "context_window")
+                        record_attempt(model_config.id, "skipped_context_window")
+                        continue
+                    if not circuit_breaker.allow_request(model_config.id):
+                        logger.info(f"Skipping model {model_config.id}: circuit open")
+                        last_error = last_error or f"Circuit open for {model_config.id}"
+                        handoff = (model_config.id, "circuit_open")
+                        record_attempt(model_config.id, "skipped_circuit_open")
+                        continue
+                    skip_reason = rate_limiter.try_acquire(model_config.id)
+                    if skip_reason:
+                        # 한도에 걸린 모델은 요청을 보내지 않고 다음 모델로
+                        circuit_breaker.release(model_config.id)
+                        logger.info(f"Skipping model {model_config.id}: rate limit ({skip_reason})")
+                        last_error = last_error or f"Rate limit reached for {model_config.id}"
+                        handoff = (model_config.id, "rate_limit")
+                        record_attempt(model_config.id, f"skipped_{skip_reason}")
+                        available_in = rate_limiter.available_in(model_config.id)
+                        rate_limited_for = available_in if rate_limited_for is None else min(rate_limited_for, available_in)
+                        continue
+                    requested = True
+                    if pending:
+                        logger.info(f"Hedging request to model: {model_config.id}")
+                        record_fallback(list(pending.values())[-1][0].id, model_config.id, "hedge")
+                    elif handoff:
+                        record_fallback(handoff[0], model_config.id, handoff[1])
+                    handoff = None
+                    task = asyncio.create_task(self._try_model(
+                        model_id=model_config.id,
+                        messages=model_messages,
+                        tools=tools if model_config.supports_tools else None,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    ))
+                    # 시작 전에 취소된 태스크도 동시성 슬롯을 반환하도록 done callback에서 release
+                    task.add_done_callback(lambda _, model_id=model_config.id: rate_limiter.release(model_id))
+                    pending[task] = (model_config, model_messages)
+                
+                # 아직 hedge 여유가 있으면 가장 최근 모델의 hedge 지연까지만 대기
+                timeout = None
+                if queue and len(pending) <= max_hedges:
+                    timeout = self._hedge_delay(model_config.id)
+                
+                done, _ = await asyncio.wait(
+                    pending.keys(),
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                # 같은 batch에 끝난 요청을 모두 확인한 뒤 결정 (성공 응답이 API 키 에러보다 우선)
+                winner = None
+                fatal_error = None
+                for task in done:
+                    finished_model, model_messages = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        fatal_error = fatal_error or e
+                        continue
+                    if result["success"]:
+                        if winner is None:
+                            result["messages"] = model_messages
+                            winner = (finished_model, result)
+                        continue
+                    last_error = result["error"]
+                    handoff = (finished_model.id, "error")
+                if winner is not None:
+                    return winner[0], winner[1], None
+                if fatal_error is not None:
+                    raise fatal_error  # API 키 에러는 그대로 전파
+        finally:
+            # 진 요청들은 취소
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        
+        if not requested and rate_limited_for is not None:
+            # upstream 실패가 아니라 로컬 한도 - 잠시 후 재시도하면 됨
+            raise RateLimited(rate_limited_for)
+        return None, None, last_error
+    
+    async def chat_completion_with_fallback(
+        self,
+        messages: List[Dict[str, str]],
+        use_tools: bool = True,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        free_only: bool = True,
+        hedge: Optional[bool] = None,
+        use_cache: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Fallback을 지원하는 채팅 완성
+        
+        Args:
+            hedge: None이면 settings.hedge_enabled 사용
+            use_cache: True이면 deterministic 요청(기본: temperature=0)에 한해 completion cache 사용
+        """
+        
+        # Tool이 필요한 경우 OpenAI 형식으로 가져오기
+        tools = get_tools_for_openai() if use_tools else None
+        
+        models_to_try = self._get_models_to_try(use_tools, free_only)
+        
         if not models_to_try:
             return {
                 "content": "No available models found",
                 "tool_calls": [],
                 "model_used": None,
-                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                "cached": False
             }
         
-        # 각 모델로 순서대로 시도
-        last_error = None
-        for model_config in models_to_try:
-            try:
-                result = await self._try_model(
-                    model_id=model_config.id,
-                    messages=messages,
-                    tools=tools if model_config.supports_tools else None,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                
-                if result["success"]:
-                    # 성공한 경우 응답 처리
-                    response = result["response"]
-                    return await self._process_response(
-                        response=response,
-                        messages=messages,
-                        model_id=model_config.id,
-                        temperature=temperature,
-                        max_tokens=max_tokens
-                    )
-                else:
-                    last_error = result["error"]
-                    
-            except Exception as e:
-                last_error = str(e)
-                if "Invalid API key" in last_error:
-                    break  # API 키 문제는 더 시도해도 소용없음
+        temperature = settings.temperature if temperature is None else temperature
+        max_tokens = max_tokens or settings.max_tokens
+        
+        async def complete() -> Dict[str, Any]:
+            return await self._complete_with_models(
+                models_to_try=models_to_try,
+                messages=messages,
+                tools=tools,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                hedge=hedge
+            )
+        
+        if not (use_cache and is_deterministic(temperature)):
+            return {**await complete(), "cached": False}
+        
+        key = make_cache_key(
+            messages=messages,
+            models=[model.id for model in models_to_try],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=tools
+        )
+        result, cached = await completion_cache.get_or_compute(
+            key,
+            complete,
+            should_store=lambda r: r.get("model_used") is not None and "error" not in r
+        )
+        return {**result, "cached": cached}
+    
+    async def _complete_with_models(
+        self,
+        models_to_try: List[ModelConfig],
+        messages: List[Dict[str, str]],
+        tools: Optional[List[Dict]],
+        temperature: float,
+        max_tokens: int,
+        hedge: Optional[bool]
+    ) -> Dict[str, Any]:
+        """모델 체인으로 완성 요청 후 응답 처리"""
+        deadline = Deadline(settings.request_deadline_seconds)
+        
+        # Hedge가 꺼져 있으면 한 번에 한 모델씩 순서대로 시도
+        if hedge is None:
+            hedge = settings.hedge_enabled
+        max_hedges = max(0, settings.hedge_max_in_flight) if hedge else 0
+        
+        try:
+            model_config, result, last_error = await self._race_models(
+                models_to_try=models_to_try,
+                messages=messages,
+                tools=tools,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                max_hedges=max_hedges
+            )
+        except RateLimited:
+            raise
+        except Exception as e:
+            # API 키 문제는 더 시도해도 소용없음
+            model_config, result, last_error = None, None, str(e)
+        
+        if result is not None:
+            # 성공한 경우 응답 처리
+            return await self._process_response(
+                response=result["response"],
+                messages=result["messages"],
+                model_id=model_config.id,
+                tools=tools if model_config.supports_tools else None,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                deadline=deadline
+            )
         
         # 모든 모델이 실패한 경우
         return {
@@ -164,10 +404,12 @@ class OpenRouterFallbackClient:
         response,
         messages: List[Dict[str, str]],
         model_id: str,
-        temperature: Optional[float],
-        max_tokens: Optional[int]
+        tools: Optional[List[Dict]],
+        temperature: float,
+        max_tokens: int,
+        deadline: Deadline
     ) -> Dict[str, Any]:
-        """응답 처리 (tool calling 포함)"""
+        """응답 처리 (최대 settings.max_tool_rounds round의 tool calling 포함)"""
         
         if not response.choices:
             return {
@@ -177,97 +419,26 @@ class OpenRouterFallbackClient:
                 "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
             }
         
-        message = response.choices[0].message
-        
-        # Tool calls가 있는 경우
-        if hasattr(message, 'tool_calls') and message.tool_calls:
-            tool_results = []
-            
-            # 병렬로 tool 실행을 위한 태스크 준비
-            async def execute_tool(tool_call):
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
-                
-                tool = get_tool(tool_name)
-                if tool is None:
-                    result = {"error": f"Tool '{tool_name}' not found"}
-                else:
-                    try:
-                        result = await tool.execute(**tool_args)
-                    except Exception as e:
-                        result = {"error": f"Tool execution failed: {str(e)}"}
-                
-                return {
-                    "tool_call_id": tool_call.id,
-                    "tool_name": tool_name,
-                    "tool_args": tool_args,
-                    "result": result
-                }
-            
-            # 모든 tool을 병렬로 실행
-            if len(message.tool_calls) > 1:
-                # 여러 tool이 있으면 병렬 실행
-                tool_results = await asyncio.gather(
-                    *[execute_tool(tool_call) for tool_call in message.tool_calls]
-                )
-            else:
-                # 단일 tool은 그냥 실행
-                tool_results = [await execute_tool(message.tool_calls[0])]
-            
-            # Tool 결과를 메시지에 추가
-            messages.append({
-                "role": "assistant",
-                "content": message.content or "",
-                "tool_calls": [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        }
-                    }
-                    for tc in message.tool_calls
-                ]
-            })
-            
-            for tool_result in tool_results:
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_result["tool_call_id"],
-                    "content": json.dumps(tool_result["result"])
-                })
-            
-            # Tool 결과로 다시 API 호출
-            final_response = await self.client.chat.completions.create(
-                model=model_id,
-                messages=messages,
-                temperature=temperature or settings.temperature,
-                max_tokens=max_tokens or settings.max_tokens
-            )
-            
-            return {
-                "content": final_response.choices[0].message.content,
-                "tool_calls": tool_results,
-                "model_used": model_id,
-                "usage": {
-                    "prompt_tokens": getattr(response.usage, 'prompt_tokens', 0) + getattr(final_response.usage, 'prompt_tokens', 0),
-                    "completion_tokens": getattr(response.usage, 'completion_tokens', 0) + getattr(final_response.usage, 'completion_tokens', 0),
-                    "total_tokens": getattr(response.usage, 'total_tokens', 0) + getattr(final_response.usage, 'total_tokens', 0)
-                }
-            }
-        else:
-            # Tool calls가 없는 경우
-            return {
-                "content": message.content or "No response",
-                "tool_calls": [],
-                "model_used": model_id,
-                "usage": {
-                    "prompt_tokens": getattr(response.usage, 'prompt_tokens', 0),
-                    "completion_tokens": getattr(response.usage, 'completion_tokens', 0),
-                    "total_tokens": getattr(response.usage, 'total_tokens', 0)
-                }
-            }
+        result = await run_tool_loop(
+            client=self.client,
+            model_id=model_id,
+            messages=messages,
+            response=response,
+            tools=tools,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            deadline=deadline
+        )
+        return {**result, "model_used": model_id}
+    
+    @staticmethod
+    def _tool_call_event(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+        """실행을 시작한 tool call의 스트리밍 이벤트"""
+        try:
+            tool_args = loads(tool_call["arguments"]) if tool_call["arguments"] else {}
+        except JSONDecodeError:
+            tool_args = {}
+        return {"type": "tool_call", "tool": tool_call["name"], "args": tool_args}
     
     async def stream_chat_completion_with_fallback(
         self,
@@ -282,44 +453,61 @@ class OpenRouterFallbackClient:
         # Tool이 필요한 경우 OpenAI 형식으로 가져오기
         tools = get_tools_for_openai() if use_tools else None
         
-        # DEFAULT_MODEL을 먼저 시도할 모델 리스트 생성
-        models_to_try = []
-        
-        # DEFAULT_MODEL 정보 가져오기
-        default_model_config = get_model_by_id(settings.default_model)
-        if default_model_config:
-            # Tool 필요 여부와 무료 모델 여부 확인
-            if (not use_tools or default_model_config.supports_tools) and \
-               (not free_only or default_model_config.is_free):
-                models_to_try.append(default_model_config)
-                logger.info(f"Will try DEFAULT_MODEL first: {settings.default_model}")
-        
-        # Fallback 모델 리스트 가져오기
-        fallback_models = get_fallback_models(
-            require_tools=use_tools,
-            free_only=free_only
-        )
-        
-        # DEFAULT_MODEL이 이미 리스트에 있으면 제거 (중복 방지)
-        for model in fallback_models:
-            if model.id != settings.default_model:
-                models_to_try.append(model)
+        models_to_try = self._get_models_to_try(use_tools, free_only)
         
         if not models_to_try:
             yield {"type": "error", "error": "No available models found"}
             return
         
+        max_tokens = max_tokens or settings.max_tokens
+        deadline = Deadline(settings.request_deadline_seconds)
+        
         # 각 모델로 순서대로 시도
         last_error = None
+        handoff: Optional[Tuple[str, str]] = None
+        requested = False
+        rate_limited_for: Optional[float] = None
         for model_config in models_to_try:
+            with span("context_fit"):
+                model_messages = self._fit_messages(model_config, messages, tools, max_tokens)
+            if model_messages is None:
+                logger.info(f"Skipping model {model_config.id}: prompt exceeds context window")
+                last_error = last_error or f"Prompt exceeds context window of {model_config.id}"
+                handoff = (model_config.id, "context_window")
+                record_attempt(model_config.id, "skipped_context_window")
+                continue
+            if not circuit_breaker.allow_request(model_config.id):
+                logger.info(f"Skipping model {model_config.id}: circuit open")
+                last_error = last_error or f"Circuit open for {model_config.id}"
+                handoff = (model_config.id, "circuit_open")
+                record_attempt(model_config.id, "skipped_circuit_open")
+                continue
+            skip_reason = rate_limiter.try_acquire(model_config.id)
+            if skip_reason:
+                circuit_breaker.release(model_config.id)
+                logger.info(f"Skipping model {model_config.id}: rate limit ({skip_reason})")
+                last_error = last_error or f"Rate limit reached for {model_config.id}"
+                handoff = (model_config.id, "rate_limit")
+                record_attempt(model_config.id, f"skipped_{skip_reason}")
+                available_in = rate_limiter.available_in(model_config.id)
+                rate_limited_for = available_in if rate_limited_for is None else min(rate_limited_for, available_in)
+                continue
+            requested = True
+            if handoff:
+                record_fallback(handoff[0], model_config.id, handoff[1])
+                handoff = None
+            
+            stream_started = time.perf_counter()
+            first_token = True
+            holds_slot = True  # rate limiter 동시성 슬롯
             try:
                 logger.info(f"Trying streaming with model: {model_config.id}")
                 
                 kwargs = {
                     "model": model_config.id,
-                    "messages": messages,
-                    "temperature": temperature or settings.temperature,
-                    "max_tokens": max_tokens or settings.max_tokens,
+                    "messages": model_messages,
+                    "temperature": settings.temperature if temperature is None else temperature,
+                    "max_tokens": max_tokens,
                     "stream": True
                 }
                 
@@ -328,53 +516,50 @@ class OpenRouterFallbackClient:
                     kwargs["tools"] = tools
                     kwargs["tool_choice"] = "auto"
                 
-                stream = await self.client.chat.completions.create(**kwargs)
+                stream = await create_completion(self.client, **kwargs)
+                circuit_breaker.record_success(model_config.id)
                 
                 # 성공한 경우 스트림 처리
                 full_content = ""
-                tool_calls = []
-                
-                async for chunk in stream:
-                    if chunk.choices and chunk.choices[0].delta:
-                        delta = chunk.choices[0].delta
-                        
-                        # 컨텐츠 스트리밍
-                        if delta.content:
-                            full_content += delta.content
-                            yield {"type": "token", "content": delta.content}
-                        
-                        # Tool call 처리
-                        if hasattr(delta, 'tool_calls') and delta.tool_calls:
-                            for tool_call in delta.tool_calls:
-                                if tool_call.function.name:
-                                    tool_calls.append({
-                                        "id": tool_call.id,
-                                        "name": tool_call.function.name,
-                                        "arguments": ""
-                                    })
-                                if tool_call.function.arguments:
-                                    tool_calls[-1]["arguments"] += tool_call.function.arguments
+                assembler = StreamingToolCallAssembler()
                 
-                # Tool 실행 (있는 경우)
-                if tool_calls:
-                    for tool_call in tool_calls:
-                        try:
-                            tool_name = tool_call["name"]
-                            tool_args = json.loads(tool_call["arguments"])
+                try:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta:
+                            delta = chunk.choices[0].delta
                             
-                            yield {"type": "tool_call", "tool": tool_name, "args": tool_args}
+                            # 컨텐츠 스트리밍
+                            if delta.content:
+                                if first_token:
+                                    first_token = False
+                                    ttft = time.perf_counter() - stream_started
+                                    llm_time_to_first_token.labels(model=model_config.id).observe(ttft)
+                                    add_stage("llm_first_token", ttft)
+                                full_content += delta.content
+                                yield {"type": "token", "content": delta.content}
                             
-                            tool = get_tool(tool_name)
-                            if tool:
-                                result = await tool.execute(**tool_args)
-                                yield {"type": "tool_result", "tool": tool_name, "result": result}
-                            else:
-                                yield {"type": "tool_result", "tool": tool_name, "result": {"error": f"Tool '{tool_name}' not found"}}
-                        except Exception as e:
-                            yield {"type": "tool_result", "tool": tool_name, "result": {"error": str(e)}}
+                            # Tool call 조립 - 인자가 완성된 call은 스트리밍 중에 바로 실행 시작
+                            if getattr(delta, 'tool_calls', None):
+                                for tool_call in delta.tool_calls:
+                                    for started in assembler.add_delta(tool_call):
+                                        yield self._tool_call_event(started)
+                    
+                    for started in assembler.finish():
+                        yield self._tool_call_event(started)
                     
-                    # Tool 결과로 다시 스트리밍 (필요한 경우)
-                    messages.append({
+                    # Tool 실행 결과 (끝나는 순서대로) - 같은 결과를 후속 요청에도 사용
+                    tool_results = {}
+                    async for tool_result in assembler.as_completed():
+                        tool_results[tool_result["tool_call_id"]] = tool_result
+                        yield {"type": "tool_result", "tool": tool_result["tool_name"], "result": tool_result["result"]}
+                except BaseException:
+                    assembler.cancel()
+                    raise
+                
+                tool_calls = assembler.calls
+                if tool_calls:
+                    # Tool 결과로 다시 스트리밍
+                    model_messages.append({
                         "role": "assistant",
                         "content": full_content or "",
                         "tool_calls": [
@@ -390,24 +575,31 @@ class OpenRouterFallbackClient:
                         ]
                     })
                     
-                    for tool_call in tool_calls:
-                        tool_name = tool_call["name"]
-                        tool_args = json.loads(tool_call["arguments"])
-                        tool = get_tool(tool_name)
-                        if tool:
-                            result = await tool.execute(**tool_args)
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call["id"],
-                                "content": json.dumps(result)
-                            })
+                    for tc in tool_calls:
+                        model_messages.append({
+                            "role": "tool",
+                            "tool_call_id": tc["id"],
+                            "content": dumps(tool_results[tc["id"]]["result"])
+                        })
                     
-                    # Tool 결과로 다시 스트리밍
-                    final_stream = await self.client.chat.completions.create(
+                    # 첫 스트림은 끝났으므로 슬롯을 반환하고, 후속 요청은 token과 슬롯을 새로 확보
+                    rate_limiter.release(model_config.id)
+                    holds_slot = False
+                    skip_reason = await acquire_followup_slot(model_config.id, deadline)
+                    if skip_reason:
+                        logger.info(f"Skipping follow-up stream to {model_config.id}: rate limit ({skip_reason})")
+                        record_attempt(model_config.id, f"skipped_{skip_reason}")
+                        error = RateLimited(rate_limiter.available_in(model_config.id), model_config.id)
+                        yield {"type": "error", "error": str(error), "retry_after": error.retry_after}
+                        return
+                    holds_slot = True
+                    
+                    final_stream = await create_completion(
+                        self.client,
                         model=model_config.id,
-                        messages=messages,
-                        temperature=temperature or settings.temperature,
-                        max_tokens=max_tokens or settings.max_tokens,
+                        messages=model_messages,
+                        temperature=settings.temperature if temperature is None else temperature,
+                        max_tokens=max_tokens,
                         stream=True
                     )
                     
@@ -416,15 +608,36 @@ class OpenRouterFallbackClient:
                             yield {"type": "token", "content": chunk.choices[0].delta.content}
                 
                 # 완료 신호
+                elapsed = time.perf_counter() - stream_started
+                llm_request_duration.labels(model=model_config.id, outcome="success").observe(elapsed)
+                add_stage("llm_stream", elapsed)
+                record_attempt(model_config.id, "success", elapsed)
                 yield {"type": "done", "model_used": model_config.id}
                 return
                 
             except Exception as e:
                 last_error = str(e)
                 logger.warning(f"Streaming with model {model_config.id} failed: {last_error}")
+                elapsed = time.perf_counter() - stream_started
+                llm_request_duration.labels(model=model_config.id, outcome="error").observe(elapsed)
+                add_stage("llm_stream", elapsed)
+                record_attempt(model_config.id, "error", elapsed)
+                handoff = (model_config.id, "error")
                 
                 if "Invalid API key" in last_error:
                     break  # API 키 문제는 더 시도해도 소용없음
+                circuit_breaker.record_failure(model_config.id, last_error, rate_limit_delay(model_config.id, e))
+            
+            finally:
+                # 클라이언트 연결 종료 등으로 결과 없이 끝난 시험 요청 정리
+                circuit_breaker.release(model_config.id)
+                if holds_slot:
+                    rate_limiter.release(model_config.id)
+        
+        if not requested and rate_limited_for is not None:
+            error = RateLimited(rate_limited_for)
+            yield {"type": "error", "error": str(error), "retry_after": error.retry_after}
+            return
         
         # 모든 모델이 실패한 경우
         yield {"type": "error", "error": f"All models failed. Last error: {last_error}"}
\ No newline at end of file
@@ -0,0 +1,333 @@
+"""
+Rate Limiter
+모델별 token bucket과 동시 요청 상한으로 upstream 한도를 넘기 전에 요청을 조절한다.
+429를 받고 나서야 한도를 아는 대신, 응답 헤더(X-RateLimit-*, Retry-After)로 한도를 학습하고
+fallback 체인은 bucket이 빈 모델을 요청 없이 건너뛴다.
+
+- bucket: X-RateLimit-Limit(분당 요청 수)을 알기 전에는 settings 기본값 (무료 모델만 제한)
+- AIMD: 429마다 refill 속도와 동시성 상한을 decrease_factor배로 줄이고,
+        성공할 때마다 속도는 분당 1요청, 동시성은 1/상한씩 늘려 원래 한도까지 회복
+- 429의 대기 시간은 Retry-After > X-RateLimit-Reset > backoff_seconds (연속 429마다 2배) 순
+- try_acquire()가 허용한 요청은 반드시 release()로 동시성 슬롯을 반환해야 함
+- 모든 모델을 로컬 한도 때문에 건너뛰면 upstream 실패가 아니라 RateLimited (503 + Retry-After)
+"""
+from typing import Dict, Any, List, Optional, Mapping
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+import math
+import time
+import logging
+
+from app.core.config import settings
+from app.core.metrics import llm_rate_limit_skips
+from app.services.circuit_breaker import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60.0  # X-RateLimit-Limit / requests_per_minute 기준 구간
+MAX_BACKOFF_DOUBLINGS = 5
+
+
+@dataclass
+class ModelLimit:
+    model_id: str
+    max_rate: float  # 요청/초 상한 (0이면 bucket 미사용)
+    rate: float  # 현재 refill 속도 (AIMD)
+    capacity: float
+    tokens: float
+    updated: float  # time.monotonic()
+    concurrency: float  # 현재 동시 요청 상한 (AIMD)
+    in_flight: int = 0
+    blocked_until: float = 0.0
+    consecutive_rate_limits: int = 0
+    rate_limited: int = 0
+    skipped: int = 0
+
+
+class RateLimited(Exception):
+    """모든 모델이 로컬 한도에 걸려 요청을 보내지 않음 (503 + Retry-After)"""
+
+    def __init__(self, retry_after: float, model_id: Optional[str] = None):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Rate limit reached for {model_id or 'all models'}, retry after {self.retry_after}s")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After (초 또는 HTTP-date) → 남은 초"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """X-RateLimit-Reset → 남은 초 (epoch ms / epoch s / 남은 초 형식 모두 허용)"""
+    if not value:
+        return None
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+    if reset > 1e12:  # OpenRouter: epoch milliseconds
+        return max(0.0, reset / 1000 - time.time())
+    if reset > 1e9:
+        return max(0.0, reset - time.time())
+    return max(0.0, reset)
+
+
+def _header(headers: Optional[Mapping[str, str]], name: str) -> Optional[str]:
+    if not headers:
+        return None
+    return headers.get(name) or headers.get(name.lower())
+
+
+def _float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """모든 OpenRouter 클라이언트가 공유하는 모델별 rate limiter"""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        free_requests_per_minute: float,
+        burst: int,
+        max_concurrency: int,
+        decrease_factor: float,
+        backoff_seconds: float
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.free_requests_per_minute = free_requests_per_minute
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.backoff_seconds = backoff_seconds
+        self._limits: Dict[str, ModelLimit] = {}
+
+    def _get(self, model_id: str) -> ModelLimit:
+        limit = self._limits.get(model_id)
+        if limit is None:
+            per_minute = self.free_requests_per_minute if model_id.endswith(":free") else self.requests_per_minute
+            rate = per_minute / WINDOW_SECONDS
+            capacity = float(min(self.burst, per_minute)) if per_minute > 0 else float(self.burst)
+            limit = self._limits[model_id] = ModelLimit(
+                model_id=model_id,
+                max_rate=rate,
+                rate=rate,
+                capacity=capacity,
+                tokens=capacity,
+                updated=time.monotonic(),
+                concurrency=float(self.max_concurrency)
+            )
+        return limit
+
+    @staticmethod
+    def _refill(limit: ModelLimit, now: float):
+        if limit.rate > 0:
+            limit.tokens = min(limit.capacity, limit.tokens + (now - limit.updated) * limit.rate)
+        limit.updated = now
+
+    def try_acquire(self, model_id: str) -> Optional[str]:
+        """
+        요청 슬롯 확보 시도
+
+        Returns:
+            None이면 허용 (token 1개 사용, 동시성 슬롯 점유),
+            아니면 건너뛴 이유 ("blocked", "concurrency", "bucket_empty")
+        """
+        if not settings.rate_limit_enabled:
+            return None
+
+        now = time.monotonic()
+        limit = self._get(model_id)
+        self._refill(limit, now)
+
+        reason = None
+        if now < limit.blocked_until:
+            reason = "blocked"
+        elif limit.in_flight >= max(1, int(limit.concurrency)):
+            reason = "concurrency"
+        elif limit.max_rate > 0 and limit.tokens < 1:
+            reason = "bucket_empty"
+
+        if reason is not None:
+            limit.skipped += 1
+            llm_rate_limit_skips.labels(model=model_id, reason=reason).inc()
+            return reason
+
+        if limit.max_rate > 0:
+            limit.tokens -= 1
+        limit.in_flight += 1
+        return None
+
+    def release(self, model_id: str):
+        """try_acquire로 점유한 동시성 슬롯 반환"""
+        limit = self._limits.get(model_id)
+        if limit is not None and limit.in_flight > 0:
+            limit.in_flight -= 1
+
+    def is_available(self, model_id: str) -> bool:
+        """상태를 바꾸지 않고 지금 요청 가능한지 조회 (목록 표시용)"""
+        limit = self._limits.get(model_id)
+        if limit is None or not settings.rate_limit_enabled:
+            return True
+        now = time.monotonic()
+        if now < limit.blocked_until:
+            return False
+        if limit.max_rate > 0:
+            tokens = min(limit.capacity, limit.tokens + (now - limit.updated) * limit.rate)
+            return tokens >= 1
+        return True
+
+    def blocked_for(self, model_id: str) -> float:
+        """429 / 헤더로 막혀 있는 남은 시간 (초)"""
+        limit = self._limits.get(model_id)
+        if limit is None:
+            return 0.0
+        return max(0.0, limit.blocked_until - time.monotonic())
+
+    def available_in(self, model_id: str) -> float:
+        """다음 요청이 허용될 때까지 예상 시간 (초) - 429 대기 또는 bucket refill"""
+        limit = self._limits.get(model_id)
+        if limit is None:
+            return 0.0
+        now = time.monotonic()
+        wait = max(0.0, limit.blocked_until - now)
+        if limit.max_rate > 0:
+            tokens = min(limit.capacity, limit.tokens + (now - limit.updated) * limit.rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / limit.rate)
+        return wait
+
+    def record_success(self, model_id: str, headers: Optional[Mapping[str, str]] = None):
+        """성공 응답 - 헤더 반영 후 additive increase"""
+        limit = self._get(model_id)
+        limit.consecutive_rate_limits = 0
+        self._apply_headers(limit, headers)
+        limit.concurrency = min(float(self.max_concurrency), limit.concurrency + 1 / limit.concurrency)
+        if limit.max_rate > 0:
+            limit.rate = min(limit.max_rate, limit.rate + 1 / WINDOW_SECONDS)
+
+    def record_rate_limited(self, model_id: str, headers: Optional[Mapping[str, str]] = None) -> float:
+        """429 응답 - multiplicative decrease 후 대기 시간(초) 반환"""
+        now = time.monotonic()
+        limit = self._get(model_id)
+        limit.rate_limited += 1
+        limit.consecutive_rate_limits += 1
+        self._apply_headers(limit, headers)
+
+        limit.concurrency = max(1.0, limit.concurrency * self.decrease_factor)
+        if limit.max_rate > 0:
+            limit.rate = max(1 / WINDOW_SECONDS, limit.rate * self.decrease_factor)
+        limit.tokens = 0.0
+        limit.updated = now
+
+        delay = parse_retry_after(_header(headers, "Retry-After"))
+        if delay is None:
+            delay = parse_reset(_header(headers, "X-RateLimit-Reset"))
+        if delay is None:
+            doublings = min(limit.consecutive_rate_limits - 1, MAX_BACKOFF_DOUBLINGS)
+            delay = self.backoff_seconds * (2 ** doublings)
+
+        limit.blocked_until = max(limit.blocked_until, now + delay)
+        rate = f"{limit.rate * WINDOW_SECONDS:.1f}/min" if limit.max_rate > 0 else "unlimited"
+        logger.warning(
+            f"Model {model_id} rate limited: waiting {delay:.1f}s, "
+            f"rate={rate}, concurrency={limit.concurrency:.1f}"
+        )
+        return delay
+
+    def _apply_headers(self, limit: ModelLimit, headers: Optional[Mapping[str, str]]):
+        """X-RateLimit-Limit / Remaining / Reset으로 bucket 보정"""
+        per_minute = _float(_header(headers, "X-RateLimit-Limit"))
+        if per_minute is not None and per_minute > 0:
+            max_rate = per_minute / WINDOW_SECONDS
+            if max_rate != limit.max_rate:
+                if limit.max_rate <= 0:
+                    limit.rate = max_rate
+                limit.max_rate = max_rate
+                limit.rate = min(limit.rate, max_rate)
+                limit.capacity = float(min(self.burst, per_minute))
+                limit.tokens = min(limit.tokens, limit.capacity)
+
+        remaining = _float(_header(headers, "X-RateLimit-Remaining"))
+        if remaining is not None:
+            limit.tokens = min(limit.tokens, max(0.0, remaining))
+            if remaining <= 0:
+                reset = parse_reset(_header(headers, "X-RateLimit-Reset"))
+                if reset:
+                    limit.blocked_until = max(limit.blocked_until, time.monotonic() + reset)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """모든 모델의 현재 한도 조회"""
+        now = time.monotonic()
+        result = []
+        for limit in self._limits.values():
+            tokens = limit.tokens
+            if limit.rate > 0:
+                tokens = min(limit.capacity, tokens + (now - limit.updated) * limit.rate)
+            result.append({
+                "model_id": limit.model_id,
+                "requests_per_minute": round(limit.rate * WINDOW_SECONDS, 2) if limit.max_rate > 0 else None,
+                "max_requests_per_minute": round(limit.max_rate * WINDOW_SECONDS, 2) if limit.max_rate > 0 else None,
+                "tokens": round(tokens, 2) if limit.max_rate > 0 else None,
+                "concurrency_limit": int(limit.concurrency),
+                "in_flight": limit.in_flight,
+                "blocked_for_seconds": round(max(0.0, limit.blocked_until - now), 2),
+                "rate_limited": limit.rate_limited,
+                "skipped": limit.skipped
+            })
+        return result
+
+
+def response_headers(error: BaseException) -> Optional[Mapping[str, str]]:
+    """OpenAI SDK / httpx 에러의 응답 헤더"""
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None)
+
+
+def is_rate_limited_response(error: BaseException) -> bool:
+    """HTTP 429 응답으로 실패한 에러인지 (상태 코드 기준)"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+def rate_limit_delay(model_id: str, error: BaseException) -> Optional[float]:
+    """429 에러면 rate limiter에 반영하고 대기 시간 반환 (circuit_breaker.record_failure의 retry_after로 사용)"""
+    if not (is_rate_limited_response(error) or is_rate_limit_error(str(error))):
+        return None
+    return rate_limiter.record_rate_limited(model_id, response_headers(error))
+
+
+async def create_completion(client, **kwargs):
+    """
+    OpenAI SDK completion 요청 후 응답 헤더로 rate limiter 보정
+
+    stream=True면 AsyncStream을 반환 (헤더는 스트림 시작 시점에 반영)
+    """
+    raw = await client.chat.completions.with_raw_response.create(**kwargs)
+    rate_limiter.record_success(kwargs["model"], raw.headers)
+    return raw.parse()
+
+
+# 싱글톤 인스턴스
+rate_limiter = RateLimiter(
+    requests_per_minute=settings.rate_limit_requests_per_minute,
+    free_requests_per_minute=settings.rate_limit_free_requests_per_minute,
+    burst=settings.rate_limit_burst,
+    max_concurrency=settings.rate_limit_max_concurrency,
+    decrease_factor=settings.rate_limit_decrease_factor,
+    backoff_seconds=settings.rate_limit_backoff_seconds
+)
@@ -0,0 +1,210 @@
+"""
+Session Codec
+세션 메시지와 context 값을 압축된 바이너리로 인코딩함.
+
+형식 (v1): [version(1 byte)][compression(1 byte)][msgpack payload]
+- 메시지: [role, content, timestamp, metadata]
+  - role / model_used는 미리 정한 목록의 index로 저장 (목록에 없으면 문자열 그대로)
+  - timestamp는 ISO 문자열 대신 epoch 기준 microsecond 정수
+  - metadata: [tool_calls, usage, model_used, 나머지 key] (usage는 [prompt, completion, total])
+- payload가 settings.session_compress_min_bytes 이상이면 zstd 또는 lz4로 압축 (설치된 경우)
+- 첫 byte가 version이 아니면 이전 JSON 형식으로 읽음
+"""
+from typing import Dict, Any, Optional, Union
+from datetime import datetime, timedelta
+import logging
+
+import msgpack
+
+from app.core.config import settings
+from app.core.serialization import loads
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 선택 의존성
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - 선택 의존성
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+COMPRESSION_LZ4 = 2
+
+# Interned identifiers - 저장된 데이터가 index를 참조하므로 뒤에 추가만 할 것
+ROLES = ("user", "assistant", "system", "tool")
+MODEL_IDS = (
+    "moonshotai/kimi-k2:free",
+    "deepseek/deepseek-chat-v3-0324:free",
+    "google/gemini-flash-1.5-8b",
+    "google/gemini-2.0-flash-exp:free",
+    "openai/gpt-3.5-turbo",
+    "meta-llama/llama-3.3-70b-instruct:free",
+    "qwen/qwen3-235b-a22b-07-25:free",
+    "tngtech/deepseek-r1t2-chimera:free",
+)
+_ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+_MODEL_CODES = {model_id: code for code, model_id in enumerate(MODEL_IDS)}
+
+_USAGE_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens")
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _select_compression() -> int:
+    name = settings.session_compression
+    if name == "zstd" and zstandard is not None:
+        return COMPRESSION_ZSTD
+    if name in ("zstd", "lz4") and lz4_frame is not None:
+        return COMPRESSION_LZ4
+    if name != "none":
+        logger.warning(f"Session compression '{name}' is not available, storing sessions uncompressed")
+    return COMPRESSION_NONE
+
+
+_COMPRESSION = _select_compression()
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard is not None else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+
+# Framing
+
+def _pack(obj: Any) -> bytes:
+    payload = msgpack.packb(obj, use_bin_type=True, default=str)
+    compression = COMPRESSION_NONE
+    if _COMPRESSION and len(payload) >= settings.session_compress_min_bytes:
+        if _COMPRESSION == COMPRESSION_ZSTD:
+            compressed = _zstd_compressor.compress(payload)
+        else:
+            compressed = lz4_frame.compress(payload)
+        if len(compressed) < len(payload):
+            payload, compression = compressed, _COMPRESSION
+    return bytes((FORMAT_VERSION, compression)) + payload
+
+
+def _unpack(data: Union[bytes, str]) -> Any:
+    if isinstance(data, str) or not data or data[0] != FORMAT_VERSION:
+        # 이전 JSON 형식
+        return loads(data)
+
+    compression, payload = data[1], data[2:]
+    if compression == COMPRESSION_ZSTD:
+        if _zstd_decompressor is None:
+            raise RuntimeError("zstandard is required to read this session")
+        payload = _zstd_decompressor.decompress(payload)
+    elif compression == COMPRESSION_LZ4:
+        if lz4_frame is None:
+            raise RuntimeError("lz4 is required to read this session")
+        payload = lz4_frame.decompress(payload)
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+def is_legacy(data: Union[bytes, str]) -> bool:
+    """이전 JSON 형식인지 확인"""
+    return isinstance(data, str) or not data or data[0] != FORMAT_VERSION
+
+
+# Timestamps
+
+def _encode_timestamp(timestamp: Any) -> Any:
+    if not isinstance(timestamp, str):
+        return timestamp
+    try:
+        dt = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return timestamp
+    if dt.tzinfo is not None:
+        return timestamp
+    delta = dt - _EPOCH
+    value = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    # 원래 문자열로 정확히 복원되는 경우에만 정수로 저장
+    return value if _decode_timestamp(value) == timestamp else timestamp
+
+
+def _decode_timestamp(value: Any) -> Any:
+    if isinstance(value, int):
+        return (_EPOCH + timedelta(microseconds=value)).isoformat()
+    return value
+
+
+# Messages
+
+def _encode_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[list]:
+    if not metadata:
+        return None
+
+    extra = dict(metadata)
+    tool_calls = extra.pop("tool_calls", None)
+
+    usage = extra.pop("usage", None)
+    if isinstance(usage, dict) and usage and set(usage) == set(_USAGE_KEYS) and \
+            all(isinstance(usage[key], int) for key in _USAGE_KEYS):
+        usage = [usage[key] for key in _USAGE_KEYS]
+
+    model_used = extra.pop("model_used", None)
+    if model_used is not None:
+        model_used = _MODEL_CODES.get(model_used, model_used)
+
+    return [tool_calls, usage, model_used, extra or None]
+
+
+def _decode_metadata(encoded: Optional[list]) -> Dict[str, Any]:
+    if not encoded:
+        return {}
+
+    tool_calls, usage, model_used, extra = encoded
+    metadata = dict(extra) if extra else {}
+    if tool_calls is not None:
+        metadata["tool_calls"] = tool_calls
+    if isinstance(usage, list):
+        usage = dict(zip(_USAGE_KEYS, usage))
+    if usage is not None:
+        metadata["usage"] = usage
+    if isinstance(model_used, int):
+        model_used = MODEL_IDS[model_used]
+    if model_used is not None:
+        metadata["model_used"] = model_used
+    return metadata
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """세션 메시지 인코딩"""
+    role = message["role"]
+    return _pack([
+        _ROLE_CODES.get(role, role),
+        message["content"],
+        _encode_timestamp(message.get("timestamp")),
+        _encode_metadata(message.get("metadata"))
+    ])
+
+
+def decode_message(data: Union[bytes, str]) -> Dict[str, Any]:
+    """세션 메시지 디코딩 (이전 JSON 형식 포함)"""
+    decoded = _unpack(data)
+    if isinstance(decoded, dict):
+        return decoded
+
+    role, content, timestamp, metadata = decoded
+    return {
+        "role": ROLES[role] if isinstance(role, int) else role,
+        "content": content,
+        "timestamp": _decode_timestamp(timestamp),
+        "metadata": _decode_metadata(metadata)
+    }
+
+
+# Context values
+
+def encode_value(value: Any) -> bytes:
+    """Context 값 인코딩"""
+    return _pack(value)
+
+
+def decode_value(data: Union[bytes, str]) -> Any:
+    """Context 값 디코딩 (이전 JSON 형식 포함)"""
+    return _unpack(data)
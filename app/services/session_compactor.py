@@ -0,0 +1,142 @@
+"""
+Session compaction
+세션의 대화 기록이 토큰 임계값을 넘으면 오래된 메시지를 running summary로 대체하여
+세션 context에 저장함. 요청 경로가 아닌 백그라운드 태스크에서만 실행된다.
+
+세션 저장소는 session_max_messages를 넘는 오래된 메시지를 요약 없이 잘라내므로,
+토큰이 적더라도 다음 턴에서 잘릴 만큼 메시지가 쌓이면 먼저 요약한다.
+"""
+from typing import List, Dict, Any, Set
+import asyncio
+import logging
+import re
+
+from app.core.config import settings
+from app.services.context_builder import message_tokens
+from app.services.openrouter_fallback_client import OpenRouterFallbackClient
+from app.services.session_manager import session_manager
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_PER_TURN = 2  # user + assistant
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an AI assistant. "
+    "Keep facts the user shared about themselves, decisions, open questions and important "
+    "tool results. Be concise and write plain sentences without headings.\n\n"
+    "Current summary:\n{summary}\n\nNew messages:\n{transcript}"
+)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?。])\s")
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    sentence = _SENTENCE_END.split(text, maxsplit=1)[0]
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rstrip() + "…"
+    return sentence
+
+
+def extractive_summary(previous: str, messages: List[Dict[str, Any]]) -> str:
+    """LLM 없이 각 메시지의 첫 문장으로 요약 (최대 길이를 넘으면 오래된 줄부터 제거)"""
+    lines = previous.splitlines() if previous else []
+    for msg in messages:
+        if msg.get("role") not in ("user", "assistant") or not msg.get("content"):
+            continue
+        speaker = "User" if msg["role"] == "user" else "Assistant"
+        lines.append(f"{speaker}: {_first_sentence(msg['content'], 200)}")
+
+    while lines and sum(len(line) + 1 for line in lines) > settings.compaction_summary_max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def needs_compaction(messages: List[Dict[str, Any]]) -> bool:
+    """토큰 임계값을 넘었거나, 다음 턴에서 session_max_messages 때문에 메시지가 잘리게 되면 True"""
+    if len(messages) <= settings.compaction_keep_messages:
+        return False
+    if len(messages) + MESSAGES_PER_TURN > settings.session_max_messages:
+        return True
+    return sum(message_tokens(msg) for msg in messages) >= settings.compaction_trigger_tokens
+
+
+class SessionCompactor:
+    """임계값을 넘은 세션을 백그라운드에서 요약"""
+
+    def __init__(self):
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._client = None
+
+    def schedule(self, session_id: str):
+        """요청 경로에서 호출 - 실제 작업은 백그라운드 태스크로 실행"""
+        if not settings.compaction_enabled or session_id in self._running:
+            return
+        self._running.add(session_id)
+        task = asyncio.create_task(self._run(session_id))
+        # 태스크가 GC되지 않도록 참조 유지
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, session_id: str):
+        try:
+            await self.compact(session_id)
+        except Exception as e:
+            logger.warning(f"Session compaction failed for {session_id}: {str(e)}")
+        finally:
+            self._running.discard(session_id)
+
+    async def compact(self, session_id: str) -> bool:
+        """요약이 필요하면(needs_compaction) 최근 메시지만 남기고 나머지를 요약으로 대체"""
+        session_data = await session_manager.get_session(session_id)
+        if not session_data:
+            return False
+
+        messages = session_data.get("messages", [])
+        if not needs_compaction(messages):
+            return False
+
+        older = messages[:-settings.compaction_keep_messages] if settings.compaction_keep_messages else messages
+        if not older:
+            return False
+
+        previous = session_data.get("context", {}).get("summary", "")
+        summary = await self._summarize(previous, older)
+
+        # 요약하는 동안 추가된 메시지는 유지되도록 timestamp 기준으로 제거
+        await session_manager.compact_messages(
+            session_id,
+            up_to_timestamp=older[-1]["timestamp"],
+            summary=summary
+        )
+        logger.info(f"Compacted {len(older)} messages for session {session_id}")
+        return True
+
+    async def _summarize(self, previous: str, messages: List[Dict[str, Any]]) -> str:
+        if not settings.compaction_use_llm:
+            return extractive_summary(previous, messages)
+
+        transcript = "\n".join(
+            f"{msg['role']}: {msg['content']}" for msg in messages
+            if msg.get("role") in ("user", "assistant") and msg.get("content")
+        )
+        if self._client is None:
+            self._client = OpenRouterFallbackClient()
+        response = await self._client.chat_completion_with_fallback(
+            messages=[{
+                "role": "user",
+                "content": SUMMARY_PROMPT.format(summary=previous or "(none)", transcript=transcript)
+            }],
+            use_tools=False,
+            temperature=0,
+            max_tokens=settings.compaction_summary_max_chars // 3
+        )
+        if not response.get("model_used"):
+            # LLM 요약 실패 시 추출 요약으로 대체
+            return extractive_summary(previous, messages)
+        return response["content"].strip()[:settings.compaction_summary_max_chars]
+
+
+# Global instance
+session_compactor = SessionCompactor()
@@ -1,104 +1,260 @@
 import redis.asyncio as redis
-import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from app.core.config import settings
+from app.services.session_codec import encode_message, decode_message, encode_value, decode_value
+from app.services.session_unit_of_work import SessionUnitOfWork, make_message
 import uuid
 
+# Context 필드는 meta hash 안에서 접두사로 구분
+CONTEXT_PREFIX = "ctx:"
+
+# Redis layout
+#   session:{id}:meta      hash - created_at, rev(변경마다 증가), ctx:<key> (session_codec 값)
+#   session:{id}:messages  list - session_codec 메시지 (RPUSH + LTRIM, 최근 settings.session_max_messages개)
+#
+# 모든 변경은 이 스크립트 하나로 원자적으로 실행되고, 실행할 때마다 두 key의 TTL을 갱신한다.
+# KEYS[1] = meta, KEYS[2] = messages / ARGV[1] = op, ARGV[2] = ttl
+SESSION_SCRIPT = """
+local meta, messages = KEYS[1], KEYS[2]
+local op, ttl = ARGV[1], tonumber(ARGV[2])
+
+if op == 'create' then
+    redis.call('DEL', meta, messages)
+    redis.call('HSET', meta, 'created_at', ARGV[3], 'rev', 1)
+    redis.call('EXPIRE', meta, ttl)
+    return 1
+end
+
+if op == 'apply' and ARGV[3] ~= '' then
+    -- Unit of work로 만든 새 세션은 변경 사항과 함께 생성
+    redis.call('HSETNX', meta, 'created_at', ARGV[3])
+end
+
+if redis.call('EXISTS', meta) == 0 then
+    return false
+end
+
+local result = 1
+if op == 'get' then
+    local limit = tonumber(ARGV[3])
+    local start = 0
+    if limit > 0 then start = -limit end
+    result = {redis.call('HGETALL', meta), redis.call('LRANGE', messages, start, -1)}
+
+elseif op == 'messages' then
+    local limit = tonumber(ARGV[3])
+    local start = 0
+    if limit > 0 then start = -limit end
+    result = redis.call('LRANGE', messages, start, -1)
+
+elseif op == 'append' then
+    redis.call('RPUSH', messages, ARGV[4])
+    redis.call('LTRIM', messages, -tonumber(ARGV[3]), -1)
+
+elseif op == 'apply' then
+    -- ARGV[3] = created_at(새 세션일 때), ARGV[4] = 최대 메시지 수, ARGV[5] = 메시지 수,
+    -- 이어서 메시지들, 나머지는 context field/value
+    local count = tonumber(ARGV[5])
+    if count > 0 then
+        redis.call('RPUSH', messages, unpack(ARGV, 6, 5 + count))
+        redis.call('LTRIM', messages, -tonumber(ARGV[4]), -1)
+    end
+    if #ARGV > 5 + count then
+        redis.call('HSET', meta, unpack(ARGV, 6 + count))
+    end
+
+elseif op == 'context' then
+    redis.call('HSET', meta, unpack(ARGV, 3))
+
+elseif op == 'compact' then
+    -- ARGV[3] = 요약된 마지막 메시지, 그 메시지까지 제거 (요약 중 추가된 메시지는 유지)
+    if ARGV[3] ~= '' then
+        local index = redis.call('LPOS', messages, ARGV[3])
+        if index then redis.call('LTRIM', messages, index + 1, -1) end
+    end
+    redis.call('HSET', meta, ARGV[4], ARGV[5])
+
+elseif op == 'replace' then
+    -- ARGV[3] = created_at, ARGV[4] = 메시지 수, 이어서 메시지들, 나머지는 context field/value
+    local count = tonumber(ARGV[4])
+    local rev = redis.call('HGET', meta, 'rev') or 0
+    redis.call('DEL', meta, messages)
+    redis.call('HSET', meta, 'created_at', ARGV[3], 'rev', rev)
+    if count > 0 then
+        redis.call('RPUSH', messages, unpack(ARGV, 5, 4 + count))
+    end
+    if #ARGV > 4 + count then
+        redis.call('HSET', meta, unpack(ARGV, 5 + count))
+    end
+end
+
+if op == 'append' or op == 'context' or op == 'compact' or op == 'replace' or op == 'apply' then
+    -- 변경 연산은 새 revision 반환
+    result = redis.call('HINCRBY', meta, 'rev', 1)
+end
+
+redis.call('EXPIRE', meta, ttl)
+redis.call('EXPIRE', messages, ttl)
+return result
+"""
+
 
 class SessionManager:
     def __init__(self):
         self.redis_client = None
-        
+        self._script = None
+
     async def connect(self):
         """Connect to Redis"""
-        self.redis_client = await redis.from_url(
-            settings.redis_url,
-            encoding="utf-8",
-            decode_responses=True
-        )
-        
+        # 메시지는 바이너리(session_codec)로 저장하므로 응답을 디코딩하지 않음
+        self.redis_client = await redis.from_url(settings.redis_url)
+        self._script = self.redis_client.register_script(SESSION_SCRIPT)
+
     async def disconnect(self):
         """Disconnect from Redis"""
         if self.redis_client:
             await self.redis_client.close()
-    
+
+    @staticmethod
+    def _keys(session_id: str) -> List[str]:
+        return [f"session:{session_id}:meta", f"session:{session_id}:messages"]
+
+    async def _run(self, session_id: str, op: str, *args):
+        """세션 스크립트 실행 (세션이 없으면 None)"""
+        return await self._script(
+            keys=self._keys(session_id),
+            args=[op, settings.redis_session_ttl, *args]
+        )
+
+    @staticmethod
+    def _context_args(context: Dict[str, Any]) -> List[Any]:
+        args = []
+        for key, value in context.items():
+            args.extend((CONTEXT_PREFIX + key, encode_value(value)))
+        return args
+
     async def create_session(self) -> str:
         """Create a new session and return session ID"""
         session_id = str(uuid.uuid4())
-        session_data = {
-            "created_at": datetime.utcnow().isoformat(),
-            "messages": [],
-            "context": {}
-        }
-        await self.redis_client.setex(
-            f"session:{session_id}",
-            settings.redis_session_ttl,
-            json.dumps(session_data)
-        )
+        await self._run(session_id, "create", datetime.utcnow().isoformat())
         return session_id
-    
+
     async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get session data"""
-        data = await self.redis_client.get(f"session:{session_id}")
-        if data:
-            # Refresh TTL on access
-            await self.redis_client.expire(f"session:{session_id}", settings.redis_session_ttl)
-            return json.loads(data)
-        return None
-    
+        """Get session data (refreshes TTL on access)"""
+        result = await self._run(session_id, "get", settings.session_max_messages)
+        if not result:
+            return None
+
+        fields, messages = result
+        return self._decode(self._meta(fields), messages)
+
+    @staticmethod
+    def _meta(fields: List[bytes]) -> Dict[str, bytes]:
+        """HGETALL 결과를 field 이름(str) -> 값(bytes) dict로 변환"""
+        return {field.decode(): value for field, value in zip(fields[::2], fields[1::2])}
+
+    @staticmethod
+    def _decode(meta: Dict[str, bytes], messages: List[bytes]) -> Dict[str, Any]:
+        created_at = meta.get("created_at")
+        return {
+            "created_at": created_at.decode() if created_at else None,
+            "messages": [decode_message(msg) for msg in messages],
+            "context": {
+                key[len(CONTEXT_PREFIX):]: decode_value(value)
+                for key, value in meta.items()
+                if key.startswith(CONTEXT_PREFIX)
+            }
+        }
+
     async def update_session(self, session_id: str, session_data: Dict[str, Any]):
-        """Update session data"""
-        await self.redis_client.setex(
-            f"session:{session_id}",
-            settings.redis_session_ttl,
-            json.dumps(session_data)
+        """Replace the whole session data"""
+        messages = session_data.get("messages", [])[-settings.session_max_messages:]
+        await self._run(
+            session_id,
+            "replace",
+            session_data.get("created_at") or datetime.utcnow().isoformat(),
+            len(messages),
+            *[encode_message(msg) for msg in messages],
+            *self._context_args(session_data.get("context", {}))
         )
-    
+
     async def add_message(self, session_id: str, role: str, content: str, metadata: Optional[Dict] = None):
-        """Add a message to session history"""
-        session_data = await self.get_session(session_id)
-        if not session_data:
-            return False
-            
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat(),
-            "metadata": metadata or {}
-        }
-        
-        session_data["messages"].append(message)
-        
-        # Keep only last 20 messages in Redis (full history is in SQLite)
-        if len(session_data["messages"]) > 20:
-            session_data["messages"] = session_data["messages"][-20:]
-            
-        await self.update_session(session_id, session_data)
-        return True
-    
+        """Add a message to session history (atomic RPUSH + LTRIM)"""
+        message = make_message(role, content, metadata)
+        result = await self._run(session_id, "append", settings.session_max_messages, encode_message(message))
+        return bool(result)
+
     async def get_messages(self, session_id: str, limit: int = 10):
         """Get recent messages from session"""
-        session_data = await self.get_session(session_id)
-        if not session_data:
+        messages = await self._run(session_id, "messages", limit or 0)
+        if not messages:
             return []
-        
-        messages = session_data.get("messages", [])
-        return messages[-limit:] if limit else messages
-    
+        return [decode_message(msg) for msg in messages]
+
     async def update_context(self, session_id: str, context: Dict[str, Any]):
         """Update session context (for maintaining state between requests)"""
-        session_data = await self.get_session(session_id)
-        if not session_data:
-            return False
-            
-        session_data["context"].update(context)
-        await self.update_session(session_id, session_data)
-        return True
+        if not context:
+            return bool(await self._run(session_id, "touch"))
+        result = await self._run(session_id, "context", *self._context_args(context))
+        return bool(result)
 
+    async def compact_messages(self, session_id: str, up_to_timestamp: str, summary: str):
+        """Replace messages up to the given timestamp with a running summary"""
+        # 메시지는 바이너리이므로 제거할 마지막 메시지를 여기서 찾아 스크립트에 전달
+        last_summarized = b""
+        for item in await self.redis_client.lrange(self._keys(session_id)[1], 0, -1):
+            if decode_message(item)["timestamp"] > up_to_timestamp:
+                break
+            last_summarized = item
 
-# Global instance
-# session_manager = SessionManager()
+        result = await self._run(
+            session_id,
+            "compact",
+            last_summarized,
+            CONTEXT_PREFIX + "summary",
+            encode_value(summary)
+        )
+        return bool(result)
+
+    def unit_of_work(self, session_id: Optional[str] = None, create: bool = True) -> SessionUnitOfWork:
+        """요청 단위 세션 작업 (읽기 1회, 쓰기 1회)"""
+        return SessionUnitOfWork(self, session_id, create)
 
-# Redis가 없을 때 Mock 사용
-from app.services.session_manager_mock import session_manager
\ No newline at end of file
+    async def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self.get_session(session_id)
+
+    async def _apply(
+        self,
+        session_id: str,
+        created_at: Optional[str],
+        messages: List[Dict[str, Any]],
+        context: Dict[str, Any]
+    ) -> Optional[int]:
+        """Unit of work 변경 사항을 스크립트 한 번으로 반영 (새 revision, 세션이 없으면 None)"""
+        result = await self._run(
+            session_id,
+            "apply",
+            created_at or "",
+            settings.session_max_messages,
+            len(messages),
+            *[encode_message(msg) for msg in messages],
+            *self._context_args(context)
+        )
+        return result or None
+
+
+# Global instance
+if settings.session_backend == "redis":
+    session_manager = SessionManager()
+elif settings.session_backend == "redis_cached":
+    from app.services.session_manager_cached import CachedSessionManager
+    session_manager = CachedSessionManager(
+        max_entries=settings.session_cache_max_entries,
+        max_connections=settings.session_cache_max_connections
+    )
+elif settings.session_backend == "mock":
+    from app.services.session_manager_mock import session_manager
+else:
+    # Redis가 없을 때 프로세스 내 메모리 저장소 사용
+    from app.services.session_manager_memory import session_manager
@@ -0,0 +1,321 @@
+"""
+Cached Session Manager
+Redis SessionManager 앞에 디코딩된 세션 객체의 프로세스 내 LRU를 둔다.
+다른 worker가 세션을 바꾸면 Redis client tracking(BCAST) 무효화 메시지로 로컬 캐시 항목을 표시한다.
+
+- 무효화 메시지는 __redis__:invalidate 채널을 구독하는 전용 listener 연결로 REDIRECT 받는다
+- 명령은 연결 pool(session_cache_max_connections)로 보내고, pool의 모든 연결에 tracking(NOLOOP)을 켠다.
+  BCAST는 연결마다 무효화를 보내므로 listener는 같은 무효화를 연결 수만큼 받을 수 있음 (중복은 무시됨)
+- 무효화된 항목은 바로 버리지 않고, 다음 조회 때 세션의 rev만 HGET으로 확인한다.
+  rev가 같으면(이 worker가 쓴 변경이거나 TTL 갱신뿐이면) 다시 읽고 파싱하지 않는다.
+  (Redis 6은 Lua 스크립트 안의 변경에 NOLOOP을 적용하지 않으므로 자신의 쓰기도 무효화로 돌아온다)
+- listener가 끊기거나 이미 쓰던 pool 연결이 다시 연결되면 그 사이의 무효화를 놓쳤을 수 있으므로 캐시를 비운다
+"""
+from typing import Dict, Any, List, Optional, Set
+from collections import OrderedDict
+from dataclasses import dataclass
+import asyncio
+import time
+import logging
+import weakref
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.services.session_manager import SessionManager, SESSION_SCRIPT
+from app.services.session_unit_of_work import make_message
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+KEY_PREFIX = "session:"
+
+# 캐시 hit에서도 TTL 갱신이 필요하지만 매번 보내지 않도록 TTL의 이 비율마다 한 번만 갱신
+TOUCH_INTERVAL_RATIO = 0.1
+
+# listener 연결 상태 확인 주기 (초)
+LISTENER_PING_SECONDS = 30.0
+
+
+@dataclass
+class CachedSession:
+    """로컬 캐시 항목"""
+    data: Dict[str, Any]
+    rev: int
+    touched_at: float
+    suspect: int = 0  # 0이 아니면 마지막 무효화 번호 (다음 조회 때 rev 확인)
+
+
+def _copy(session_data: Dict[str, Any]) -> Dict[str, Any]:
+    """호출자가 캐시된 객체를 직접 바꾸지 않도록 얕은 복사"""
+    return {
+        "created_at": session_data["created_at"],
+        "messages": list(session_data["messages"]),
+        "context": dict(session_data["context"])
+    }
+
+
+class CachedSessionManager(SessionManager):
+    """프로세스 내 LRU + Redis client tracking 무효화 (SessionManager와 같은 API)"""
+
+    def __init__(self, max_entries: int, max_connections: int):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_connections = max_connections
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.revalidations = 0
+        self._cache: "OrderedDict[str, CachedSession]" = OrderedDict()
+        self._invalidation_seq = 0
+        # Redis에서 읽는 중에 무효화된 세션은 suspect 상태로 캐시
+        self._reading: Dict[str, int] = {}
+        self._stale: Set[str] = set()
+        self._listener = None
+        self._listener_id: Optional[int] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # tracking을 켠 적이 있는 pool 연결 (다시 연결되면 캐시를 비움)
+        self._tracked_connections: "weakref.WeakSet" = weakref.WeakSet()
+
+    async def connect(self):
+        """Connect listener first, then the tracked command connection pool"""
+        await self._connect_listener()
+        self._listener_task = asyncio.create_task(self._listen())
+
+        self.redis_client = redis.from_url(
+            settings.redis_url,
+            max_connections=self.max_connections,
+            redis_connect_func=self._enable_tracking
+        )
+        self._script = self.redis_client.register_script(SESSION_SCRIPT)
+        await self.redis_client.ping()
+
+    async def disconnect(self):
+        """Disconnect from Redis"""
+        if self._listener_task:
+            self._listener_task.cancel()
+        if self._listener is not None:
+            await self._listener.disconnect()
+        await super().disconnect()
+
+    # Invalidation
+
+    async def _connect_listener(self):
+        # REDIRECT 무효화는 RESP2 pub/sub 메시지로 받음 (클라이언트 기본 프로토콜과 무관하게 고정)
+        pool = redis.ConnectionPool.from_url(settings.redis_url, decode_responses=True, protocol=2)
+        connection = pool.make_connection()
+        await connection.connect()
+        await connection.send_command("CLIENT", "ID")
+        self._listener_id = int(await connection.read_response())
+        await connection.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+        await connection.read_response()
+        self._listener = connection
+
+    async def _enable_tracking(self, connection):
+        """Pool 연결이 (재)연결될 때마다 호출"""
+        await connection.on_connect()
+        await connection.send_command(
+            "CLIENT", "TRACKING", "ON",
+            "REDIRECT", self._listener_id,
+            "BCAST", "PREFIX", KEY_PREFIX,
+            "NOLOOP"
+        )
+        await connection.read_response()
+        # pool이 늘어날 때는 다른 연결이 계속 추적 중이므로 비우지 않음
+        if connection in self._tracked_connections:
+            self.clear()
+        self._tracked_connections.add(connection)
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self._listener.read_response(timeout=LISTENER_PING_SECONDS)
+                if message is None:
+                    await self._listener.send_command("PING")
+                    continue
+                if message[0] == "message" and message[1] == INVALIDATE_CHANNEL:
+                    self._invalidate(message[2])
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Session invalidation listener failed: {str(e)}")
+                self.clear()
+                await asyncio.sleep(1.0)
+                try:
+                    await self._listener.disconnect()
+                    await self._connect_listener()
+                    # 새 listener로 REDIRECT 하도록 pool 연결을 모두 다시 맺음
+                    if self.redis_client is not None:
+                        await self.redis_client.connection_pool.disconnect()
+                except Exception as reconnect_error:
+                    logger.warning(f"Session invalidation listener reconnect failed: {str(reconnect_error)}")
+
+    def _invalidate(self, keys: Optional[List[str]]):
+        if keys is None:
+            # FLUSHDB/FLUSHALL
+            self.clear()
+            return
+        self._invalidation_seq += 1
+        for key in keys:
+            session_id = key[len(KEY_PREFIX):].rsplit(":", 1)[0]
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                # 같은 무효화가 pool 연결 수만큼 올 수 있으므로 처음 표시될 때만 집계
+                if not entry.suspect:
+                    self.invalidations += 1
+                entry.suspect = self._invalidation_seq
+            if session_id in self._reading:
+                self._stale.add(session_id)
+
+    def clear(self):
+        """로컬 캐시 비우기"""
+        self._cache.clear()
+        self._stale.update(self._reading)
+
+    # Local cache
+
+    async def _get_cached(self, session_id: str) -> Optional[CachedSession]:
+        entry = self._cache.get(session_id)
+        if entry is None:
+            return None
+
+        if entry.suspect:
+            suspect = entry.suspect
+            rev = await self.redis_client.hget(self._keys(session_id)[0], "rev")
+            if rev is None or int(rev) != entry.rev:
+                if self._cache.get(session_id) is entry:
+                    del self._cache[session_id]
+                return None
+            self.revalidations += 1
+            # 확인하는 동안 새 무효화가 오지 않았으면 정상 항목으로 되돌림
+            if entry.suspect == suspect:
+                entry.suspect = 0
+
+        if session_id in self._cache:
+            self._cache.move_to_end(session_id)
+
+        now = time.monotonic()
+        if now - entry.touched_at > settings.redis_session_ttl * TOUCH_INTERVAL_RATIO:
+            entry.touched_at = now
+            task = asyncio.create_task(self._run(session_id, "touch"))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return entry
+
+    def _put(self, session_id: str, entry: CachedSession):
+        self._cache[session_id] = entry
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 상태와 hit/miss 카운터"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "revalidations": self.revalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    # SessionManager API
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get session data (local cache first)"""
+        entry = await self._get_cached(session_id)
+        if entry is not None:
+            self.hits += 1
+            return _copy(entry.data)
+
+        self.misses += 1
+        self._reading[session_id] = self._reading.get(session_id, 0) + 1
+        try:
+            result = await self._run(session_id, "get", settings.session_max_messages)
+        finally:
+            self._reading[session_id] -= 1
+            stale = session_id in self._stale
+            if not self._reading[session_id]:
+                del self._reading[session_id]
+                self._stale.discard(session_id)
+
+        if not result:
+            self._cache.pop(session_id, None)
+            return None
+
+        fields, messages = result
+        meta = self._meta(fields)
+        session_data = self._decode(meta, messages)
+        self._put(session_id, CachedSession(
+            data=_copy(session_data),
+            rev=int(meta.get("rev", 0)),
+            touched_at=time.monotonic(),
+            suspect=self._invalidation_seq if stale else 0
+        ))
+        return session_data
+
+    async def get_messages(self, session_id: str, limit: int = 10):
+        """Get recent messages from session"""
+        session_data = await self.get_session(session_id)
+        if not session_data:
+            return []
+        messages = session_data["messages"]
+        return messages[-limit:] if limit else messages
+
+    async def add_message(self, session_id: str, role: str, content: str, metadata: Optional[Dict] = None):
+        """Add a message to session history"""
+        return bool(await self._apply(session_id, None, [make_message(role, content, metadata)], {}))
+
+    async def update_context(self, session_id: str, context: Dict[str, Any]):
+        """Update session context"""
+        if not context:
+            return await super().update_context(session_id, context)
+        return bool(await self._apply(session_id, None, [], context))
+
+    async def update_session(self, session_id: str, session_data: Dict[str, Any]):
+        """Replace the whole session data"""
+        await super().update_session(session_id, session_data)
+        self._cache.pop(session_id, None)
+
+    async def compact_messages(self, session_id: str, up_to_timestamp: str, summary: str):
+        """Replace messages up to the given timestamp with a running summary"""
+        result = await super().compact_messages(session_id, up_to_timestamp, summary)
+        self._cache.pop(session_id, None)
+        return result
+
+    async def _apply(
+        self,
+        session_id: str,
+        created_at: Optional[str],
+        messages: List[Dict[str, Any]],
+        context: Dict[str, Any]
+    ) -> Optional[int]:
+        """변경 사항을 Redis에 반영하고 로컬 캐시에도 같은 변경을 적용"""
+        rev = await super()._apply(session_id, created_at, messages, context)
+        entry = self._cache.get(session_id)
+
+        if rev is None:
+            self._cache.pop(session_id, None)
+            return None
+
+        if entry is not None and entry.rev == rev - 1:
+            session_data = entry.data
+        elif entry is None and created_at and rev == 1:
+            session_data = {"created_at": created_at, "messages": [], "context": {}}
+            entry = CachedSession(data=session_data, rev=0, touched_at=time.monotonic())
+        else:
+            # 캐시된 뒤 다른 worker가 바꾼 세션 - 다음 조회 때 다시 읽음
+            self._cache.pop(session_id, None)
+            return rev
+
+        session_data["messages"].extend(messages)
+        if len(session_data["messages"]) > settings.session_max_messages:
+            del session_data["messages"][:-settings.session_max_messages]
+        session_data["context"].update(context)
+        entry.rev = rev
+        self._put(session_id, entry)
+        return rev
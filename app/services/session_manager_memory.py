@@ -0,0 +1,292 @@
+"""
+In-Memory Session Manager - Redis 없이 단일 프로세스에서 운영용으로 사용
+- settings.redis_session_ttl 기준으로 세션 만료 (접근 시 갱신)
+- 세션 수 / 대략적인 메모리 사용량 상한을 넘으면 가장 오래 사용하지 않은 세션부터 제거
+- 백그라운드 sweeper가 만료된 세션을 주기적으로 정리
+- 메시지는 dict 대신 session_codec으로 인코딩한 __slots__ 레코드로 보관
+"""
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from datetime import datetime
+import asyncio
+import sys
+import time
+import uuid
+import logging
+
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.services.session_codec import encode_message, decode_message
+from app.services.session_unit_of_work import SessionUnitOfWork, make_message
+
+logger = logging.getLogger(__name__)
+
+# 레코드/컨테이너 자체의 대략적인 오버헤드 (bytes)
+MESSAGE_OVERHEAD_BYTES = 120
+SESSION_OVERHEAD_BYTES = 400
+
+
+def _size_of(value: Any) -> int:
+    """값이 차지하는 메모리의 대략적인 크기"""
+    if not value:
+        return 0
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    return len(dumps(value))
+
+
+class StoredMessage:
+    """세션 메시지 레코드 (timestamp는 compaction 비교용으로 따로 보관)"""
+    __slots__ = ("timestamp", "data", "size")
+
+    def __init__(self, message: Dict[str, Any]):
+        self.timestamp = message.get("timestamp") or datetime.utcnow().isoformat()
+        self.data = encode_message({**message, "timestamp": self.timestamp})
+        self.size = MESSAGE_OVERHEAD_BYTES + len(self.data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return decode_message(self.data)
+
+
+class StoredSession:
+    """세션 레코드"""
+    __slots__ = ("created_at", "messages", "context", "expires_at", "size")
+
+    def __init__(self, created_at: str):
+        self.created_at = created_at
+        self.messages: List[StoredMessage] = []
+        self.context: Dict[str, Any] = {}
+        self.expires_at = 0.0
+        self.size = SESSION_OVERHEAD_BYTES
+
+    def recompute_size(self):
+        self.size = SESSION_OVERHEAD_BYTES + sum(msg.size for msg in self.messages) + _size_of(self.context)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "created_at": self.created_at,
+            "messages": [msg.to_dict() for msg in self.messages],
+            "context": dict(self.context)
+        }
+
+
+class InMemorySessionManager:
+    def __init__(
+        self,
+        ttl_seconds: int,
+        max_sessions: int,
+        max_bytes: int,
+        sweep_interval_seconds: float
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.sessions: "OrderedDict[str, StoredSession]" = OrderedDict()
+        self.total_bytes = 0
+        self.expired = 0
+        self.evicted = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        """Start background sweeper"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def disconnect(self):
+        """Stop background sweeper"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    # Storage
+
+    def _touch(self, session_id: str, session: StoredSession):
+        session.expires_at = time.monotonic() + self.ttl_seconds
+        self.sessions.move_to_end(session_id)
+
+    def _lookup(self, session_id: str) -> Optional[StoredSession]:
+        """만료되지 않은 세션 조회 (TTL 갱신)"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        if session.expires_at < time.monotonic():
+            self._remove(session_id)
+            self.expired += 1
+            return None
+        self._touch(session_id, session)
+        return session
+
+    def _remove(self, session_id: str):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self.total_bytes -= session.size
+
+    def _resize(self, session: StoredSession, size: int):
+        self.total_bytes += size - session.size
+        session.size = size
+
+    def _append(self, session: StoredSession, messages: List[StoredMessage]):
+        session.messages.extend(messages)
+        size = session.size + sum(msg.size for msg in messages)
+        overflow = len(session.messages) - settings.session_max_messages
+        if overflow > 0:
+            size -= sum(msg.size for msg in session.messages[:overflow])
+            del session.messages[:overflow]
+        self._resize(session, size)
+
+    def _update_context(self, session: StoredSession, context: Dict[str, Any]):
+        old_size = _size_of(session.context)
+        session.context.update(context)
+        self._resize(session, session.size - old_size + _size_of(session.context))
+
+    def _evict(self, keep: Optional[str] = None):
+        """상한을 넘으면 가장 오래 사용하지 않은 세션부터 제거"""
+        while self.sessions and (len(self.sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+            session_id = next(iter(self.sessions))
+            if session_id == keep:
+                if len(self.sessions) == 1:
+                    break
+                self.sessions.move_to_end(session_id)
+                continue
+            self._remove(session_id)
+            self.evicted += 1
+
+    def sweep(self) -> int:
+        """만료된 세션 정리"""
+        now = time.monotonic()
+        expired = [session_id for session_id, session in self.sessions.items() if session.expires_at < now]
+        for session_id in expired:
+            self._remove(session_id)
+        self.expired += len(expired)
+        return len(expired)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"Expired {removed} in-memory sessions")
+            except Exception as e:
+                logger.warning(f"Session sweep failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """세션 수와 메모리 사용량"""
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+    # SessionManager API
+
+    async def create_session(self) -> str:
+        """Create a new session and return session ID"""
+        session_id = str(uuid.uuid4())
+        session = StoredSession(datetime.utcnow().isoformat())
+        self.sessions[session_id] = session
+        self.total_bytes += session.size
+        self._touch(session_id, session)
+        self._evict(keep=session_id)
+        return session_id
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get session data"""
+        session = self._lookup(session_id)
+        return session.to_dict() if session else None
+
+    async def update_session(self, session_id: str, session_data: Dict[str, Any]):
+        """Update session data"""
+        self._remove(session_id)
+        session = StoredSession(session_data.get("created_at") or datetime.utcnow().isoformat())
+        session.messages = [
+            StoredMessage(msg)
+            for msg in session_data.get("messages", [])[-settings.session_max_messages:]
+        ]
+        session.context = dict(session_data.get("context", {}))
+        session.recompute_size()
+        self.sessions[session_id] = session
+        self.total_bytes += session.size
+        self._touch(session_id, session)
+        self._evict(keep=session_id)
+
+    async def add_message(self, session_id: str, role: str, content: str, metadata: Optional[Dict] = None):
+        """Add a message to session history"""
+        session = self._lookup(session_id)
+        if session is None:
+            return False
+        self._append(session, [StoredMessage(make_message(role, content, metadata))])
+        self._evict(keep=session_id)
+        return True
+
+    async def get_messages(self, session_id: str, limit: int = 10):
+        """Get recent messages from session"""
+        session = self._lookup(session_id)
+        if session is None:
+            return []
+        messages = session.messages[-limit:] if limit else session.messages
+        return [msg.to_dict() for msg in messages]
+
+    async def update_context(self, session_id: str, context: Dict[str, Any]):
+        """Update session context"""
+        session = self._lookup(session_id)
+        if session is None:
+            return False
+        self._update_context(session, context)
+        self._evict(keep=session_id)
+        return True
+
+    async def compact_messages(self, session_id: str, up_to_timestamp: str, summary: str):
+        """Replace messages up to the given timestamp with a running summary"""
+        session = self._lookup(session_id)
+        if session is None:
+            return False
+        session.messages = [msg for msg in session.messages if msg.timestamp > up_to_timestamp]
+        session.context["summary"] = summary
+        size = session.size
+        session.recompute_size()
+        self.total_bytes += session.size - size
+        return True
+
+    def unit_of_work(self, session_id: Optional[str] = None, create: bool = True) -> SessionUnitOfWork:
+        """요청 단위 세션 작업"""
+        return SessionUnitOfWork(self, session_id, create)
+
+    async def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self.get_session(session_id)
+
+    async def _apply(
+        self,
+        session_id: str,
+        created_at: Optional[str],
+        messages: List[Dict[str, Any]],
+        context: Dict[str, Any]
+    ) -> bool:
+        session = self._lookup(session_id)
+        if session is None:
+            if not created_at:
+                return False
+            session = StoredSession(created_at)
+            self.sessions[session_id] = session
+            self.total_bytes += session.size
+            self._touch(session_id, session)
+
+        if messages:
+            self._append(session, [StoredMessage(msg) for msg in messages])
+        if context:
+            self._update_context(session, context)
+        self._evict(keep=session_id)
+        return True
+
+
+# Global instance
+session_manager = InMemorySessionManager(
+    ttl_seconds=settings.redis_session_ttl,
+    max_sessions=settings.session_max_sessions,
+    max_bytes=settings.session_max_bytes,
+    sweep_interval_seconds=settings.session_sweep_interval_seconds
+)
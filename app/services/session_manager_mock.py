@@ -1,10 +1,11 @@
 """
 Mock Session Manager - Redis 없이 메모리에서 동작
 """
-import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import uuid
+from app.core.config import settings
+from app.services.session_unit_of_work import SessionUnitOfWork, make_message
 
 
 class MockSessionManager:
@@ -44,18 +45,11 @@ class MockSessionManager:
         if not session_data:
             return False
             
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat(),
-            "metadata": metadata or {}
-        }
-        
-        session_data["messages"].append(message)
+        session_data["messages"].append(make_message(role, content, metadata))
         
-        # Keep only last 20 messages
-        if len(session_data["messages"]) > 20:
-            session_data["messages"] = session_data["messages"][-20:]
+        # Keep only last N messages
+        if len(session_data["messages"]) > settings.session_max_messages:
+            session_data["messages"] = session_data["messages"][-settings.session_max_messages:]
             
         await self.update_session(session_id, session_data)
         return True
@@ -78,6 +72,55 @@ class MockSessionManager:
         session_data["context"].update(context)
         await self.update_session(session_id, session_data)
         return True
+    
+    async def compact_messages(self, session_id: str, up_to_timestamp: str, summary: str):
+        """Replace messages up to the given timestamp with a running summary"""
+        session_data = await self.get_session(session_id)
+        if not session_data:
+            return False
+        
+        session_data["messages"] = [
+            msg for msg in session_data["messages"]
+            if msg["timestamp"] > up_to_timestamp
+        ]
+        session_data["context"]["summary"] = summary
+        await self.update_session(session_id, session_data)
+        return True
+    
+    def unit_of_work(self, session_id: Optional[str] = None, create: bool = True) -> SessionUnitOfWork:
+        """요청 단위 세션 작업"""
+        return SessionUnitOfWork(self, session_id, create)
+    
+    async def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session_data = self.sessions.get(session_id)
+        if session_data is None:
+            return None
+        # Unit of work의 버퍼가 저장된 세션을 직접 바꾸지 않도록 복사
+        return {
+            "created_at": session_data["created_at"],
+            "messages": list(session_data["messages"]),
+            "context": dict(session_data["context"])
+        }
+    
+    async def _apply(
+        self,
+        session_id: str,
+        created_at: Optional[str],
+        messages: List[Dict[str, Any]],
+        context: Dict[str, Any]
+    ) -> bool:
+        session_data = self.sessions.get(session_id)
+        if session_data is None:
+            if not created_at:
+                return False
+            session_data = {"created_at": created_at, "messages": [], "context": {}}
+            self.sessions[session_id] = session_data
+        
+        session_data["messages"].extend(messages)
+        if len(session_data["messages"]) > settings.session_max_messages:
+            session_data["messages"] = session_data["messages"][-settings.session_max_messages:]
+        session_data["context"].update(context)
+        return True
 
 
 # Global instance
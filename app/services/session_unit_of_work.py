@@ -0,0 +1,129 @@
+"""
+Session Unit of Work
+요청 하나 동안 세션을 한 번만 읽고, 변경 사항(메시지 추가, context 갱신)은 메모리에 모아 두었다가
+요청이 끝날 때 한 번에 반영함. Redis 기준으로 요청당 round trip이 읽기 1회 + 쓰기 1회가 되고,
+TTL 갱신도 그 두 번에 합쳐진다.
+
+    async with session_manager.unit_of_work(session_id) as session:
+        session.add_message("user", "hello")
+        history = session.get_messages(limit=10)
+"""
+from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime
+import logging
+import uuid
+
+from app.core.config import settings
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def make_message(role: str, content: str, metadata: Optional[Dict] = None) -> Dict[str, Any]:
+    """세션에 저장하는 메시지 형식"""
+    return {
+        "role": role,
+        "content": content,
+        "timestamp": datetime.utcnow().isoformat(),
+        "metadata": metadata or {}
+    }
+
+
+class SessionUnitOfWork:
+    """
+    요청 단위 세션 작업
+
+    session_id가 없거나 세션이 만료된 경우 create=True이면 새 세션으로 시작하며,
+    새 세션은 commit 시점에 변경 사항과 함께 생성된다. 블록 안에서 예외가 발생하면
+    변경 사항은 반영하지 않는다.
+
+    Manager는 _load(session_id)와 _apply(session_id, created_at, messages, context)를 제공해야 한다.
+    """
+
+    def __init__(self, manager, session_id: Optional[str] = None, create: bool = True):
+        self.manager = manager
+        self.session_id = session_id
+        self.create = create
+        self.data: Optional[Dict[str, Any]] = None
+        self.is_new = False
+        self._new_messages: List[Dict[str, Any]] = []
+        self._context_updates: Dict[str, Any] = {}
+        self._on_commit: List[Callable[[], Any]] = []
+
+    async def __aenter__(self) -> "SessionUnitOfWork":
+        await self.load()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.commit()
+
+    async def load(self):
+        """세션을 한 번 읽음 (TTL 갱신 포함)"""
+        if self.session_id:
+            with span("session_load"):
+                self.data = await self.manager._load(self.session_id)
+
+        if self.data is None and self.create:
+            self.session_id = str(uuid.uuid4())
+            self.is_new = True
+            self.data = {
+                "created_at": datetime.utcnow().isoformat(),
+                "messages": [],
+                "context": {}
+            }
+
+    @property
+    def exists(self) -> bool:
+        return self.data is not None
+
+    def add_message(self, role: str, content: str, metadata: Optional[Dict] = None) -> bool:
+        """메시지 추가 (commit 시 반영)"""
+        if self.data is None:
+            return False
+        message = make_message(role, content, metadata)
+        self._new_messages.append(message)
+        messages = self.data["messages"]
+        messages.append(message)
+        if len(messages) > settings.session_max_messages:
+            del messages[:-settings.session_max_messages]
+        return True
+
+    def get_messages(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """버퍼에 추가된 메시지를 포함한 최근 메시지"""
+        if self.data is None:
+            return []
+        messages = self.data["messages"]
+        return messages[-limit:] if limit else list(messages)
+
+    def update_context(self, context: Dict[str, Any]) -> bool:
+        """Context 갱신 (commit 시 반영)"""
+        if self.data is None:
+            return False
+        self.data["context"].update(context)
+        self._context_updates.update(context)
+        return True
+
+    def on_commit(self, callback: Callable[[], Any]):
+        """변경 사항이 반영된 뒤 실행할 callback 등록 (예: 백그라운드 작업 예약)"""
+        self._on_commit.append(callback)
+
+    async def commit(self):
+        """모아 둔 변경 사항을 한 번에 반영"""
+        if self.data is not None and (self.is_new or self._new_messages or self._context_updates):
+            with span("session_commit"):
+                applied = await self.manager._apply(
+                    self.session_id,
+                    self.data["created_at"] if self.is_new else None,
+                    self._new_messages,
+                    self._context_updates
+                )
+            if not applied:
+                logger.warning(f"Session {self.session_id} expired before commit")
+            self.is_new = False
+            self._new_messages = []
+            self._context_updates = {}
+
+        callbacks, self._on_commit = self._on_commit, []
+        for callback in callbacks:
+            callback()
@@ -0,0 +1,349 @@
+"""
+Tool execution helpers
+모델이 요청한 tool call을 실행하고, 스트리밍 응답에서는 인자가 완성되는 즉시 실행을 시작함.
+비스트리밍 응답은 요청별 시간 예산 안에서 여러 tool round를 반복하는 agent loop로 처리함.
+"""
+from typing import List, Dict, Any, Optional, Union, AsyncGenerator
+import asyncio
+import time
+import logging
+
+from app.core.config import settings
+from app.core.serialization import dumps, loads, JSONDecodeError
+from app.core.tracing import span, record_attempt
+from app.services.circuit_breaker import circuit_breaker
+from app.services.rate_limiter import rate_limiter, create_completion, rate_limit_delay
+from app.tools import get_tool
+
+logger = logging.getLogger(__name__)
+
+ANSWER_NOW_PROMPT = (
+    "The tool budget for this request is exhausted. "
+    "Answer the user now using only the tool results above."
+)
+
+FOLLOWUP_FAILED_MESSAGE = "The tools ran, but the model failed to write an answer. Please try again."
+FOLLOWUP_POLL_SECONDS = 0.1  # 동시성 슬롯을 기다릴 때 재시도 간격
+
+
+class Deadline:
+    """요청 단위 wall-clock 예산"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """남은 시간 (초, 음수 없음)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+async def execute_tool_call(
+    tool_call_id: Optional[str],
+    tool_name: str,
+    arguments: Union[str, Dict[str, Any], None]
+) -> Dict[str, Any]:
+    """
+    Tool call 하나를 실행 (에러는 결과로 반환)
+
+    Returns:
+        {"tool_call_id", "tool_name", "tool_args", "result"}
+    """
+    with span(f"tool.{tool_name}"):
+        return await _execute_tool_call(tool_call_id, tool_name, arguments)
+
+
+async def _execute_tool_call(
+    tool_call_id: Optional[str],
+    tool_name: str,
+    arguments: Union[str, Dict[str, Any], None]
+) -> Dict[str, Any]:
+    tool_args: Dict[str, Any] = {}
+    try:
+        if isinstance(arguments, dict):
+            tool_args = arguments
+        elif arguments:
+            tool_args = loads(arguments)
+    except JSONDecodeError as e:
+        result = {"error": f"Invalid tool arguments: {str(e)}"}
+    else:
+        try:
+            tool = get_tool(tool_name)
+        except ValueError:
+            result = {"error": f"Tool '{tool_name}' not found"}
+        else:
+            try:
+                result = await tool.execute(**tool_args)
+            except Exception as e:
+                result = {"error": f"Tool execution failed: {str(e)}"}
+
+    return {
+        "tool_call_id": tool_call_id,
+        "tool_name": tool_name,
+        "tool_args": tool_args,
+        "result": result
+    }
+
+
+class StreamingToolCallAssembler:
+    """
+    스트리밍 delta로 들어오는 tool call 조각을 index별로 조립
+
+    각 tool call은 JSON 인자가 완성되는 순간(또는 다음 index가 시작되는 순간) 바로 실행을
+    시작하므로, 모델이 나머지 tool call을 스트리밍하는 동안 앞선 tool들이 동시에 실행된다.
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, Dict[str, Any]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def add_delta(self, tool_call_delta) -> List[Dict[str, Any]]:
+        """
+        Delta 하나를 반영하고, 이번에 실행을 시작한 tool call 목록 반환
+        """
+        index = getattr(tool_call_delta, "index", None)
+        if index is None:
+            # index를 주지 않는 provider: id가 오면 새 call, 아니면 마지막 call의 조각
+            if tool_call_delta.id or not self._calls:
+                index = len(self._calls)
+            else:
+                index = max(self._calls)
+
+        started = []
+        if index not in self._calls:
+            # 새 call이 시작되면 이전 call들의 인자는 모두 도착한 것
+            for previous in list(self._calls):
+                if self._start(previous, force=True):
+                    started.append(self._calls[previous])
+            self._calls[index] = {"id": None, "name": "", "arguments": ""}
+
+        call = self._calls[index]
+        if tool_call_delta.id:
+            call["id"] = tool_call_delta.id
+        function = tool_call_delta.function
+        if function is not None:
+            if function.name and not call["name"]:
+                call["name"] = function.name
+            if function.arguments:
+                call["arguments"] += function.arguments
+
+        if self._start(index):
+            started.append(call)
+        return started
+
+    def _start(self, index: int, force: bool = False) -> bool:
+        if index in self._tasks:
+            return False
+        call = self._calls[index]
+        if not call["name"]:
+            return False
+
+        if not force:
+            # 인자 JSON이 완성됐는지 확인
+            try:
+                parsed = loads(call["arguments"])
+            except JSONDecodeError:
+                return False
+            if not isinstance(parsed, dict):
+                return False
+
+        if not call["id"]:
+            call["id"] = f"call_{index}"
+        self._tasks[index] = asyncio.create_task(
+            execute_tool_call(call["id"], call["name"], call["arguments"])
+        )
+        return True
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """스트림 종료 - 아직 시작하지 않은 call을 모두 실행하고 그 목록 반환"""
+        return [self._calls[index] for index in sorted(self._calls) if self._start(index, force=True)]
+
+    @property
+    def calls(self) -> List[Dict[str, Any]]:
+        """실행을 시작한 tool call (index 순서)"""
+        return [self._calls[index] for index in sorted(self._tasks)]
+
+    async def as_completed(self) -> AsyncGenerator[Dict[str, Any], None]:
+        """끝나는 순서대로 실행 결과 반환"""
+        for future in asyncio.as_completed(list(self._tasks.values())):
+            yield await future
+
+    async def results(self) -> List[Dict[str, Any]]:
+        """모든 실행 결과 (index 순서)"""
+        return [await self._tasks[index] for index in sorted(self._tasks)]
+
+    def cancel(self):
+        """진행 중인 tool 실행 취소 (스트림이 중간에 끊긴 경우)"""
+        for task in self._tasks.values():
+            task.cancel()
+
+
+async def acquire_followup_slot(model_id: str, deadline: Deadline) -> Optional[str]:
+    """
+    Tool round 후속 요청의 token과 동시성 슬롯 확보
+
+    tool은 이미 실행됐으므로, 한도가 answer_now_seconds를 남기고 풀리면 기다렸다가 확보한다.
+
+    Returns:
+        None이면 확보 (rate_limiter.release 필요), 아니면 건너뛴 이유
+    """
+    while True:
+        skip_reason = rate_limiter.try_acquire(model_id)
+        if skip_reason is None:
+            return None
+        wait = max(rate_limiter.available_in(model_id), FOLLOWUP_POLL_SECONDS)
+        if wait > deadline.remaining() - settings.answer_now_seconds:
+            return skip_reason
+        await asyncio.sleep(wait)
+
+
+def _usage_of(response) -> Dict[str, int]:
+    usage = getattr(response, "usage", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "total_tokens": getattr(usage, "total_tokens", 0) or 0
+    }
+
+
+async def _execute_round(tool_calls, timeout: float) -> List[Dict[str, Any]]:
+    """한 round의 tool call을 병렬 실행 (시간 안에 끝나지 않은 tool은 에러 결과로 대체)"""
+    tasks = [
+        asyncio.create_task(execute_tool_call(tc.id, tc.function.name, tc.function.arguments))
+        for tc in tool_calls
+    ]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    results = []
+    for tc, task in zip(tool_calls, tasks):
+        if task in done:
+            results.append(task.result())
+        else:
+            results.append({
+                "tool_call_id": tc.id,
+                "tool_name": tc.function.name,
+                "tool_args": {},
+                "result": {"error": "Tool execution timed out"}
+            })
+    return results
+
+
+def _partial_result(message, all_results: List[Dict[str, Any]], usage: Dict[str, int], error: str) -> Dict[str, Any]:
+    """후속 요청 없이 끝난 tool loop 결과"""
+    return {
+        "content": message.content or FOLLOWUP_FAILED_MESSAGE,
+        "tool_calls": all_results,
+        "usage": usage,
+        "error": error
+    }
+
+
+async def run_tool_loop(
+    client,
+    model_id: str,
+    messages: List[Dict[str, Any]],
+    response,
+    tools: Optional[List[Dict[str, Any]]],
+    temperature: float,
+    max_tokens: int,
+    deadline: Deadline
+) -> Dict[str, Any]:
+    """
+    Bounded agent loop
+
+    모델이 tool을 요청하는 동안 최대 settings.max_tool_rounds round까지 tool을 병렬 실행하고
+    결과와 함께 다시 요청한다. 마지막 round이거나 남은 시간이 settings.answer_now_seconds
+    이하이면 tool 없이 바로 답하도록 요청한다(answer-now 모드).
+
+    후속 요청도 rate limiter의 token과 동시성 슬롯을 사용한다(곧 풀리는 한도는 기다림). 한도에 걸리거나 요청이 실패하면
+    (tool은 이미 실행됐으므로) 예외를 올리지 않고 지금까지의 결과와 "error"를 반환하며,
+    실패는 모델에 기록한다.
+
+    Returns:
+        {"content", "tool_calls", "usage"[, "error"]} - tool_calls는 모든 round의 실행 결과
+    """
+    usage = _usage_of(response)
+    all_results: List[Dict[str, Any]] = []
+    message = response.choices[0].message
+    rounds = 0
+
+    while getattr(message, "tool_calls", None):
+        rounds += 1
+        with span("tools"):
+            results = await _execute_round(
+                message.tool_calls,
+                timeout=max(0.0, deadline.remaining() - settings.answer_now_seconds)
+            )
+        all_results.extend(results)
+
+        # Tool 결과를 메시지에 추가
+        messages.append({
+            "role": "assistant",
+            "content": message.content or "",
+            "tool_calls": [
+                {
+                    "id": tc.id,
+                    "type": "function",
+                    "function": {
+                        "name": tc.function.name,
+                        "arguments": tc.function.arguments
+                    }
+                }
+                for tc in message.tool_calls
+            ]
+        })
+        for tool_result in results:
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_result["tool_call_id"],
+                "content": dumps(tool_result["result"])
+            })
+
+        kwargs = {
+            "model": model_id,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            # 예산이 바닥나도 최종 답변을 받을 시간은 보장
+            "timeout": max(deadline.remaining(), settings.answer_now_seconds)
+        }
+        answer_now = rounds >= settings.max_tool_rounds or \
+            deadline.remaining() <= settings.answer_now_seconds
+        if answer_now:
+            logger.info(f"Tool loop answering now after {rounds} round(s)")
+            kwargs["messages"] = messages + [{"role": "system", "content": ANSWER_NOW_PROMPT}]
+        elif tools:
+            kwargs["tools"] = tools
+            kwargs["tool_choice"] = "auto"
+
+        skip_reason = await acquire_followup_slot(model_id, deadline)
+        if skip_reason:
+            logger.info(f"Skipping follow-up request to {model_id} after {rounds} tool round(s): rate limit ({skip_reason})")
+            record_attempt(model_id, f"skipped_{skip_reason}")
+            return _partial_result(message, all_results, usage, f"Rate limit reached for {model_id}")
+        try:
+            with span("llm_followup"):
+                response = await create_completion(client, **kwargs)
+        except Exception as e:
+            error_msg = str(e)
+            logger.warning(f"Follow-up request to {model_id} failed after {rounds} tool round(s): {error_msg}")
+            circuit_breaker.record_failure(model_id, error_msg, rate_limit_delay(model_id, e))
+            return _partial_result(message, all_results, usage, error_msg)
+        finally:
+            rate_limiter.release(model_id)
+        for key, value in _usage_of(response).items():
+            usage[key] += value
+
+        if not response.choices:
+            message = None
+            break
+        message = response.choices[0].message
+        if answer_now:
+            break
+
+    return {
+        "content": (message.content if message is not None else None) or "No response",
+        "tool_calls": all_results,
+        "usage": usage
+    }
@@ -0,0 +1,180 @@
+"""
+Usage Rollups
+ChatHistory 행을 일별/모델별, 일별/tool별로 미리 집계해 두어
+사용량/비용 조회가 chat_history 전체를 스캔하지 않도록 함.
+
+- history_writer가 batch를 insert한 뒤 별도 트랜잭션에서 apply_rollups() 호출
+- 집계는 Python에서 batch 단위로 합친 뒤 테이블마다 UPSERT 한 번 (col = col + excluded.col)
+- UPSERT(ON CONFLICT DO UPDATE)는 SQLite / PostgreSQL만 지원 - 다른 DB는 시작 시 backfill_rollups()에서 에러
+- 기존 DB는 시작 시 rollup 테이블이 비어 있으면 backfill_rollups()로 한 번 채움
+"""
+from typing import Dict, Any, List, Tuple, Iterable
+from collections import defaultdict
+from datetime import datetime, date
+import logging
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.model_config import estimate_cost
+from app.models.database import (
+    ChatHistory, UsageDaily, UsageTokenHistogram, ToolUsageDaily, AsyncSessionLocal, engine
+)
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+# dialect별 ON CONFLICT DO UPDATE를 지원하는 insert
+_UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert
+}
+
+
+def token_bucket(tokens: int) -> int:
+    """bucket b는 [2^(b-1), 2^b) 구간 (0 토큰은 bucket 0)"""
+    return max(int(tokens), 0).bit_length()
+
+
+def bucket_lower_bound(bucket: int) -> int:
+    return 1 << (bucket - 1) if bucket else 0
+
+
+def bucket_upper_bound(bucket: int) -> int:
+    return (1 << bucket) - 1
+
+
+def row_usage(row: Dict[str, Any]) -> Dict[str, int]:
+    usage = (row.get("extra_metadata") or {}).get("usage") or {}
+    total = usage.get("total_tokens") or row.get("tokens_used") or 0
+    return {
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+        "total_tokens": total
+    }
+
+
+def aggregate(rows: Iterable[Dict[str, Any]]) -> Tuple[Dict, Dict, Dict]:
+    """행들을 (day, model), (day, model, bucket), (day, tool) 기준으로 합산"""
+    daily: Dict[Tuple[date, str], List[float]] = defaultdict(lambda: [0, 0, 0, 0, 0.0])
+    histogram: Dict[Tuple[date, str, int], int] = defaultdict(int)
+    tools: Dict[Tuple[date, str], int] = defaultdict(int)
+
+    for row in rows:
+        day = (row.get("created_at") or datetime.utcnow()).date()
+        model = row.get("model_used") or "unknown"
+        usage = row_usage(row)
+        cost = row.get("cost")
+        if cost is None:
+            cost = estimate_cost(model, usage) or 0.0
+
+        totals = daily[(day, model)]
+        totals[0] += 1
+        totals[1] += usage["prompt_tokens"]
+        totals[2] += usage["completion_tokens"]
+        totals[3] += usage["total_tokens"]
+        totals[4] += cost
+
+        # usage가 없는 요청(streaming 등)은 분포에서 제외
+        if row.get("tokens_used") is not None or usage["total_tokens"]:
+            histogram[(day, model, token_bucket(usage["total_tokens"]))] += 1
+
+        for tool_name in row.get("tools_used") or []:
+            if tool_name:
+                tools[(day, tool_name)] += 1
+
+    return daily, histogram, tools
+
+
+def upsert_insert(dialect_name: str):
+    """Rollup UPSERT에 쓸 insert 함수 (지원하지 않는 DB면 RuntimeError)"""
+    insert = _UPSERT_INSERTS.get(dialect_name)
+    if insert is None:
+        raise RuntimeError(
+            f"Usage rollups need ON CONFLICT DO UPDATE support, which is not implemented for "
+            f"'{dialect_name}' (supported: {', '.join(_UPSERT_INSERTS)})"
+        )
+    return insert
+
+
+def _upsert(dialect_name: str, model, values: List[Dict[str, Any]], keys: List[str], counters: List[str]):
+    stmt = upsert_insert(dialect_name)(model).values(values)
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: getattr(model, name) + stmt.excluded[name] for name in counters}
+    )
+
+
+async def apply_rollups(db: AsyncSession, rows: List[Dict[str, Any]]):
+    """Batch 집계를 rollup 테이블에 누적 (commit은 호출자가)"""
+    daily, histogram, tools = aggregate(rows)
+    dialect_name = db.get_bind().dialect.name
+
+    if daily:
+        await db.execute(_upsert(
+            dialect_name,
+            UsageDaily,
+            [
+                {
+                    "day": day, "model_used": model, "requests": totals[0],
+                    "prompt_tokens": totals[1], "completion_tokens": totals[2],
+                    "total_tokens": totals[3], "cost": totals[4]
+                }
+                for (day, model), totals in daily.items()
+            ],
+            ["day", "model_used"],
+            ["requests", "prompt_tokens", "completion_tokens", "total_tokens", "cost"]
+        ))
+    if histogram:
+        await db.execute(_upsert(
+            dialect_name,
+            UsageTokenHistogram,
+            [
+                {"day": day, "model_used": model, "bucket": bucket, "requests": count}
+                for (day, model, bucket), count in histogram.items()
+            ],
+            ["day", "model_used", "bucket"],
+            ["requests"]
+        ))
+    if tools:
+        await db.execute(_upsert(
+            dialect_name,
+            ToolUsageDaily,
+            [{"day": day, "tool_name": tool_name, "calls": count} for (day, tool_name), count in tools.items()],
+            ["day", "tool_name"],
+            ["calls"]
+        ))
+
+
+async def backfill_rollups() -> int:
+    """Rollup 테이블이 비어 있으면 기존 chat_history로 한 번 채움 (처리한 행 수 반환)"""
+    # 지원하지 않는 DB면 첫 batch 저장 때가 아니라 시작 시 실패
+    upsert_insert(engine.dialect.name)
+
+    async with AsyncSessionLocal() as db:
+        if (await db.execute(select(func.count()).select_from(UsageDaily))).scalar():
+            return 0
+
+        columns = (
+            ChatHistory.id, ChatHistory.model_used, ChatHistory.tokens_used, ChatHistory.cost,
+            ChatHistory.tools_used, ChatHistory.created_at, ChatHistory.extra_metadata
+        )
+        last_id, processed = 0, 0
+        while True:
+            result = await db.execute(
+                select(*columns).where(ChatHistory.id > last_id).order_by(ChatHistory.id).limit(BACKFILL_BATCH_SIZE)
+            )
+            rows = [dict(row) for row in result.mappings()]
+            if not rows:
+                break
+            await apply_rollups(db, rows)
+            processed += len(rows)
+            last_id = rows[-1]["id"]
+
+        await db.commit()
+
+    if processed:
+        logger.info(f"Backfilled usage rollups from {processed} chat history rows")
+    return processed
@@ -1,6 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
+import functools
+import time
+
+from app.core.config import settings
+from app.core.metrics import tool_duration, tool_errors
+from app.tools.tool_cache import tool_result_cache
 
 
 class ToolParameter(BaseModel):
@@ -16,9 +22,58 @@ class ToolDefinition(BaseModel):
     parameters: List[ToolParameter]
 
 
+def _with_result_cache(execute):
+    """Wrap a tool's execute() with the shared result cache"""
+    
+    @functools.wraps(execute)
+    async def cached_execute(self, *args, **kwargs):
+        if self.cache_ttl is None or args or not settings.tool_cache_enabled:
+            return await execute(self, *args, **kwargs)
+        
+        return await tool_result_cache.get_or_execute(
+            tool_name=self.name,
+            ttl=self.cache_ttl,
+            max_size=self.cache_max_size,
+            kwargs=kwargs,
+            execute=lambda: execute(self, **kwargs)
+        )
+    
+    return cached_execute
+
+
+def _with_metrics(execute):
+    """Record tool duration and errors (cache hits included)"""
+    
+    @functools.wraps(execute)
+    async def timed_execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await execute(self, *args, **kwargs)
+            if not (isinstance(result, dict) and (result.get("error") or result.get("success") is False)):
+                outcome = "success"
+            return result
+        finally:
+            tool_duration.labels(tool=self.name, outcome=outcome).observe(time.perf_counter() - started)
+            if outcome == "error":
+                tool_errors.labels(tool=self.name).inc()
+    
+    return timed_execute
+
+
 class BaseTool(ABC):
     """Base class for all tools"""
     
+    # Result cache policy (cache_ttl=None disables caching for the tool)
+    cache_ttl: Optional[float] = None
+    cache_max_size: int = 256
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        execute = cls.__dict__.get("execute")
+        if execute is not None and not getattr(execute, "__isabstractmethod__", False):
+            cls.execute = _with_metrics(_with_result_cache(execute))
+    
     @property
     @abstractmethod
     def name(self) -> str:
@@ -6,6 +6,10 @@ from app.tools.base_tool import BaseTool, ToolParameter
 class SearchTool(BaseTool):
     """Web search tool (mock implementation for POC)"""
     
+    # Result cache policy
+    cache_ttl = 3600
+    cache_max_size = 256
+    
     @property
     def name(self) -> str:
         return "search"
@@ -0,0 +1,167 @@
+"""
+Tool result cache
+Tool 클래스에 선언된 정책(cache_ttl, cache_max_size)에 따라 실행 결과를 재사용하고,
+동시에 들어온 동일 호출은 한 번만 실행되도록 함. 선택적으로 SQLite에 저장하여
+재시작 후에도 캐시를 유지한다.
+"""
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+from collections import OrderedDict
+import asyncio
+import sqlite3
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.core.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+_LEADER_CANCELLED = object()  # single-flight leader 취소 시 대기자에게 보내는 재시도 신호
+
+
+class ToolResultCache:
+    """Tool별 LRU+TTL 결과 캐시 (in-flight 중복 제거, 선택적 SQLite 저장)"""
+
+    def __init__(self, sqlite_path: Optional[str] = None):
+        self.sqlite_path = sqlite_path
+        self._entries: Dict[str, "OrderedDict[str, Tuple[float, Dict[str, Any]]]"] = {}
+        self._in_flight: Dict[Tuple[int, str, str], asyncio.Future] = {}
+        # BaseTool.run()은 별도 스레드의 event loop에서 실행될 수 있음
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kwargs: Dict[str, Any]) -> str:
+        """호출 인자로 캐시 키 생성"""
+        return dumps(kwargs, sort_keys=True)
+
+    def _get_local(self, tool_name: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.get(tool_name)
+            entry = entries.get(key) if entries else None
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at < time.time():
+                del entries[key]
+                return None
+            entries.move_to_end(key)
+            return result
+
+    def _set_local(self, tool_name: str, key: str, result: Dict[str, Any], expires_at: float, max_size: int):
+        with self._lock:
+            entries = self._entries.setdefault(tool_name, OrderedDict())
+            entries[key] = (expires_at, result)
+            entries.move_to_end(key)
+            while len(entries) > max_size:
+                entries.popitem(last=False)
+
+    # SQLite 저장소 (스레드에서 실행)
+
+    def _get_db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache ("
+                "tool TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, result TEXT NOT NULL, "
+                "PRIMARY KEY (tool, key))"
+            )
+            self._db.execute("DELETE FROM tool_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+        return self._db
+
+    def _load_persisted(self, tool_name: str, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._db_lock:
+            row = self._get_db().execute(
+                "SELECT expires_at, result FROM tool_cache WHERE tool = ? AND key = ? AND expires_at >= ?",
+                (tool_name, key, time.time())
+            ).fetchone()
+        return (row[0], loads(row[1])) if row else None
+
+    def _persist(self, tool_name: str, key: str, result: Dict[str, Any], expires_at: float):
+        with self._db_lock:
+            db = self._get_db()
+            db.execute(
+                "INSERT OR REPLACE INTO tool_cache (tool, key, expires_at, result) VALUES (?, ?, ?, ?)",
+                (tool_name, key, expires_at, dumps(result))
+            )
+            db.commit()
+
+    async def get_or_execute(
+        self,
+        tool_name: str,
+        ttl: float,
+        max_size: int,
+        kwargs: Dict[str, Any],
+        execute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """캐시된 결과를 반환하거나 execute()를 한 번만 실행"""
+        key = self.make_key(kwargs)
+
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), tool_name, key)
+        while True:
+            result = self._get_local(tool_name, key)
+            if result is not None:
+                return dict(result)
+
+            # 같은 event loop에서 진행 중인 동일 호출이 있으면 결과 공유
+            in_flight = self._in_flight.get(flight_key)
+            if in_flight is None:
+                break
+            result = await asyncio.shield(in_flight)
+            if result is not _LEADER_CANCELLED:
+                return dict(result)
+            # leader 호출이 취소됨 - 처음부터 다시 (이 호출이 새 leader가 될 수 있음)
+
+        future = loop.create_future()
+        self._in_flight[flight_key] = future
+        try:
+            if self.sqlite_path:
+                persisted = await asyncio.to_thread(self._load_persisted, tool_name, key)
+                if persisted is not None:
+                    expires_at, result = persisted
+                    self._set_local(tool_name, key, result, expires_at, max_size)
+                    future.set_result(result)
+                    return dict(result)
+
+            result = await execute()
+
+            # 실패한 결과는 캐시하지 않음
+            if isinstance(result, dict) and result.get("success", True):
+                expires_at = time.time() + ttl
+                self._set_local(tool_name, key, result, expires_at, max_size)
+                if self.sqlite_path:
+                    try:
+                        await asyncio.to_thread(self._persist, tool_name, key, result, expires_at)
+                    except Exception as e:
+                        logger.warning(f"Tool cache persist failed: {str(e)}")
+
+            future.set_result(result)
+            return dict(result) if isinstance(result, dict) else result
+
+        except asyncio.CancelledError:
+            # 공유 future를 취소하면 정상인 대기 호출까지 취소되므로 재시도 신호만 보냄
+            if not future.done():
+                future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 대기자가 없어도 경고가 남지 않도록 조회 처리
+            raise
+        finally:
+            del self._in_flight[flight_key]
+
+    def clear(self, tool_name: Optional[str] = None):
+        """메모리 캐시 비우기"""
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(tool_name, None)
+
+
+# 싱글톤 인스턴스
+tool_result_cache = ToolResultCache(sqlite_path=settings.tool_cache_sqlite_path)
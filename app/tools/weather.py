@@ -6,6 +6,10 @@ from app.tools.base_tool import BaseTool, ToolParameter
 class WeatherTool(BaseTool):
     """Weather information tool (mock implementation for POC)"""
     
+    # Result cache policy
+    cache_ttl = 600
+    cache_max_size = 128
+    
     @property
     def name(self) -> str:
         return "weather"
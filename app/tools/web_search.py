@@ -14,6 +14,10 @@ logger = logging.getLogger(__name__)
 class WebSearchTool(BaseTool):
     """Real web search tool using DuckDuckGo"""
     
+    # Result cache policy
+    cache_ttl = 300
+    cache_max_size = 512
+    
     def __init__(self):
         self.ddgs = DDGS()
     
@@ -0,0 +1,224 @@
+"""
+End-to-end load benchmark
+고정 동시성으로 /api/chat/message, /api/chat/message/stream을 호출하고
+RPS, latency p50/p95/p99, TTFT, 에러율을 JSON으로 출력 (회귀 추적용).
+
+    python -m benchmarks.stub_upstream --port 9100 &
+    OPENROUTER_API_KEY=stub OPENROUTER_BASE_URL=http://127.0.0.1:9100/api/v1 python main.py &
+    python -m benchmarks.load_test --concurrency 32 --duration 30 --stream-ratio 0.5 --output result.json
+
+- worker마다 세션 하나를 만들어 재사용 (--new-session-per-request로 매번 새 세션)
+- 스트리밍 TTFT는 요청 시작부터 첫 token 이벤트까지, 에러는 non-200 또는 SSE error 이벤트
+"""
+from typing import Any, Dict, List, Optional
+from collections import Counter, defaultdict
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+
+import httpx
+import numpy as np
+
+PROMPTS = (
+    "Hello! Summarize what you can do in two sentences.",
+    "Calculate 12 * 7 and explain the result.",
+    "What's the weather in Seoul today?",
+    "Give me three tips for writing fast Python code.",
+    "Explain the difference between latency and throughput.",
+)
+PERCENTILES = (50, 95, 99)
+
+
+class EndpointStats:
+    """엔드포인트별 측정값"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.tokens_per_second: List[float] = []
+        self.errors: Counter = Counter()
+        self.models: Counter = Counter()
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + sum(self.errors.values())
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        requests = self.requests
+        result = {
+            "requests": requests,
+            "ok": len(self.latencies),
+            "rps": round(len(self.latencies) / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(sum(self.errors.values()) / requests, 4) if requests else 0.0,
+            "errors": dict(self.errors),
+            "latency_ms": _percentiles(self.latencies),
+            "models": dict(self.models)
+        }
+        if self.ttfts:
+            result["ttft_ms"] = _percentiles(self.ttfts)
+            result["tokens_per_second"] = _percentiles(self.tokens_per_second, scale=1)
+        return result
+
+
+def _percentiles(values: List[float], scale: float = 1000) -> Dict[str, float]:
+    if not values:
+        return {f"p{p}": 0.0 for p in PERCENTILES} | {"mean": 0.0}
+    array = np.asarray(values) * scale
+    result = {f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, np.percentile(array, PERCENTILES))}
+    result["mean"] = round(float(array.mean()), 1)
+    return result
+
+
+async def _create_session(client: httpx.AsyncClient) -> Optional[str]:
+    response = await client.post("/api/chat/session")
+    response.raise_for_status()
+    return response.json()["session_id"]
+
+
+async def _send_message(client: httpx.AsyncClient, payload: Dict[str, Any], stats: EndpointStats):
+    started = time.perf_counter()
+    try:
+        response = await client.post("/api/chat/message", json=payload)
+    except httpx.HTTPError as e:
+        stats.errors[type(e).__name__] += 1
+        return
+    if response.status_code != 200:
+        stats.errors[str(response.status_code)] += 1
+        return
+    stats.latencies.append(time.perf_counter() - started)
+    stats.models[response.json().get("model_used", "unknown")] += 1
+
+
+async def _send_stream(client: httpx.AsyncClient, payload: Dict[str, Any], stats: EndpointStats):
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    tokens = 0
+    model = None
+    try:
+        async with client.stream("POST", "/api/chat/message/stream", json=payload) as response:
+            if response.status_code != 200:
+                stats.errors[str(response.status_code)] += 1
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                event = json.loads(line[6:])
+                if event.get("type") == "token":
+                    tokens += 1
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                elif event.get("type") == "done":
+                    model = event.get("model_used", "unknown")
+                elif event.get("type") == "error":
+                    stats.errors["stream_error"] += 1
+                    return
+    except httpx.HTTPError as e:
+        stats.errors[type(e).__name__] += 1
+        return
+
+    if model is None:
+        # done 이벤트 없이 끝난 스트림
+        stats.errors["incomplete_stream"] += 1
+        return
+
+    finished = time.perf_counter()
+    stats.latencies.append(finished - started)
+    stats.models[model] += 1
+    if first_token is not None:
+        stats.ttfts.append(first_token - started)
+        if tokens > 1 and finished > first_token:
+            stats.tokens_per_second.append(tokens / (finished - first_token))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+        deadline = time.perf_counter() + args.warmup + args.duration
+        measure_from = time.perf_counter() + args.warmup
+        remaining = [args.requests] if args.requests else None
+
+        async def worker(worker_rng: random.Random):
+            session_id = None if args.new_session_per_request else await _create_session(client)
+            while time.perf_counter() < deadline:
+                if remaining is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                payload = {
+                    "message": worker_rng.choice(PROMPTS),
+                    "session_id": session_id,
+                    "use_tools": not args.no_tools
+                }
+                # warmup 중 결과는 버림
+                target = stats if time.perf_counter() >= measure_from else defaultdict(EndpointStats)
+                if worker_rng.random() < args.stream_ratio:
+                    await _send_stream(client, payload, target["stream"])
+                else:
+                    await _send_message(client, payload, target["message"])
+
+        await asyncio.gather(*(worker(random.Random(rng.random())) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - measure_from
+
+    total = EndpointStats()
+    for endpoint in stats.values():
+        total.latencies += endpoint.latencies
+        total.errors.update(endpoint.errors)
+        total.models.update(endpoint.models)
+
+    return {
+        "config": {
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "requests": args.requests,
+            "stream_ratio": args.stream_ratio,
+            "use_tools": not args.no_tools,
+            "seed": args.seed
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "elapsed_seconds": round(elapsed, 3),
+        "total": total.summary(elapsed),
+        "endpoints": {name: endpoint.summary(elapsed) for name, endpoint in sorted(stats.items())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-concurrency load test for the chat API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="측정 시간 (초)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="결과에서 제외할 초기 시간 (초)")
+    parser.add_argument("--requests", type=int, default=0, help="총 요청 수로 제한 (0이면 duration 기준, warmup 없음)")
+    parser.add_argument("--stream-ratio", type=float, default=0.5, help="스트리밍 요청 비율 (0~1)")
+    parser.add_argument("--no-tools", action="store_true")
+    parser.add_argument("--new-session-per-request", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="결과 JSON 파일 경로 (기본: stdout)")
+    args = parser.parse_args()
+    if args.requests:
+        args.warmup = 0.0
+        args.duration = float("inf")
+
+    result = asyncio.run(run(args))
+    if args.duration == float("inf"):
+        result["config"]["duration"] = None
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Hot-path microbenchmarks
+매 턴마다 실행되는 코드 경로를 개별로 측정하고 저장된 baseline과 비교.
+fakeredis와 임시 SQLite만 사용하므로 Redis / OpenRouter 없이 실행됨.
+
+    python -m benchmarks.micro                      # baseline과 비교 (회귀가 있으면 exit code 1)
+    python -m benchmarks.micro --update-baseline    # 현재 결과를 baseline으로 저장
+    python -m benchmarks.micro -k session --threshold 0.5
+
+- 각 case는 반복 횟수를 --min-time 이상 걸리도록 맞춘 뒤 --repeat번 측정하고,
+  노이즈(다른 프로세스, CPU 클럭)에 덜 민감한 최솟값(min_us)을 baseline과 비교
+- threshold를 넘은 case는 --confirm번까지 다시 측정해서 일시적인 노이즈는 걸러냄
+- baseline은 비교할 머신에서 만드는 것이 원칙. 다른 머신의 baseline과 비교할 때는 --normalize로
+  reference case(순수 Python loop) 비율만큼 보정 (보정값 자체도 노이즈가 있어 기본은 끔)
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import argparse
+import asyncio
+import functools
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# app 모듈이 settings를 만들기 전에 오프라인 환경 구성
+_TEMP_DIR = tempfile.mkdtemp(prefix="agent-bench-")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_TEMP_DIR}/bench.db"
+os.environ["METRICS_ENABLED"] = "true"
+
+import fakeredis  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.serialization import sse_event  # noqa: E402
+from app.agents.chat_agent import ChatAgent  # noqa: E402
+from app.models.database import init_db, close_db  # noqa: E402
+from app.services.history_writer import HistoryWriter  # noqa: E402
+from app.services.session_manager import SessionManager, SESSION_SCRIPT  # noqa: E402
+from app.services.session_manager_mock import MockSessionManager  # noqa: E402
+from app.tools import get_tool, get_tools_for_openai  # noqa: E402
+from app.tools.calculator import CalculatorTool  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+REFERENCE_CASE = "reference.python_loop"
+HISTORY_SIZES = (10, 100, 1000)
+MESSAGE_TEXT = "Explain the difference between latency and throughput in two sentences, please."
+
+# (name, setup) - setup은 측정할 operation(sync 또는 async 함수)을 반환
+CASES: List[Tuple[str, Callable[[], Awaitable[Callable[[], Any]]]]] = []
+
+
+def case(name: str):
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+# Reference (머신 속도 정규화용)
+@case(REFERENCE_CASE)
+async def _reference():
+    def loop():
+        total = 0
+        for i in range(1000):
+            total += i * i
+        return total
+    return loop
+
+
+# Session managers
+async def _redis_manager() -> SessionManager:
+    manager = SessionManager()
+    manager.redis_client = fakeredis.FakeAsyncRedis()
+    manager._script = manager.redis_client.register_script(SESSION_SCRIPT)
+    return manager
+
+
+async def _mock_manager() -> MockSessionManager:
+    return MockSessionManager()
+
+
+async def _session_with_history(manager, size: int) -> str:
+    # 보관 메시지 수를 size로 맞춰 append 후에도 history 크기가 유지되도록 함
+    settings.session_max_messages = size
+    session_id = await manager.create_session()
+    async with manager.unit_of_work(session_id) as session:
+        for i in range(size):
+            session.add_message("user" if i % 2 == 0 else "assistant", f"{MESSAGE_TEXT} #{i}")
+    return session_id
+
+
+async def _session_append(make_manager, size: int):
+    manager = await make_manager()
+    session_id = await _session_with_history(manager, size)
+    return functools.partial(manager.add_message, session_id, "user", MESSAGE_TEXT)
+
+
+async def _session_read(make_manager, size: int):
+    manager = await make_manager()
+    session_id = await _session_with_history(manager, size)
+    return functools.partial(manager.get_session, session_id)
+
+
+async def _session_turn(make_manager, size: int):
+    """Unit of work 한 턴: load → user/assistant 메시지 추가 → commit"""
+    manager = await make_manager()
+    session_id = await _session_with_history(manager, size)
+
+    async def turn():
+        async with manager.unit_of_work(session_id) as session:
+            session.add_message("user", MESSAGE_TEXT)
+            session.add_message("assistant", MESSAGE_TEXT, {"model": "benchmark"})
+    return turn
+
+
+for _label, _make_manager in (("redis", _redis_manager), ("mock", _mock_manager)):
+    for _size in HISTORY_SIZES:
+        case(f"session.{_label}.append[{_size}]")(functools.partial(_session_append, _make_manager, _size))
+        case(f"session.{_label}.read[{_size}]")(functools.partial(_session_read, _make_manager, _size))
+        case(f"session.{_label}.turn[{_size}]")(functools.partial(_session_turn, _make_manager, _size))
+
+
+# Chat message assembly
+async def _build_messages(size: int):
+    settings.session_max_messages = size
+    manager = MockSessionManager()
+    session_id = await _session_with_history(manager, size)
+    session_data = await manager.get_session(session_id)
+    session_data["context"]["summary"] = MESSAGE_TEXT * 5
+    agent = ChatAgent(use_fallback=True)
+    return functools.partial(agent._build_chat_messages, session_data)
+
+
+for _size in HISTORY_SIZES:
+    case(f"agent.build_chat_messages[{_size}]")(functools.partial(_build_messages, _size))
+
+
+# Tools
+@case("tools.get_tools_for_openai")
+async def _tools_for_openai():
+    return get_tools_for_openai
+
+
+@case("tools.get_tool")
+async def _get_tool():
+    return functools.partial(get_tool, "calculator")
+
+
+@case("tools.calculator.execute")
+async def _calculator():
+    tool = CalculatorTool()
+    return functools.partial(tool.execute, expression="sqrt(16) + pow(2, 3) * 7")
+
+
+# SSE frames (chat router)
+@case("sse.token_frame")
+async def _sse_token():
+    return functools.partial(sse_event, {"type": "token", "content": "throughput "})
+
+
+@case("sse.tool_result_frame")
+async def _sse_tool_result():
+    payload = {
+        "type": "tool_result",
+        "tool": "weather",
+        "result": {"success": True, "city": "Seoul", "temperature": 25, "condition": "Partly cloudy", "humidity": 60}
+    }
+    return functools.partial(sse_event, payload)
+
+
+# ChatHistory inserts (history writer batch + usage rollups)
+def _history_row(i: int) -> Dict[str, Any]:
+    return {
+        "session_id": f"bench-{i % 8}",
+        "user_message": MESSAGE_TEXT,
+        "assistant_message": MESSAGE_TEXT * 4,
+        "model_used": "openai/gpt-3.5-turbo",
+        "tools_used": ["calculator"] if i % 3 == 0 else [],
+        "tokens_used": 180,
+        "extra_metadata": {"usage": {"prompt_tokens": 120, "completion_tokens": 60, "total_tokens": 180}},
+        "cost": None
+    }
+
+
+async def _history_insert(batch_size: int):
+    await init_db()
+    writer = HistoryWriter(max_queue_size=batch_size, batch_size=batch_size, flush_interval_seconds=0)
+    batch = [_history_row(i) for i in range(batch_size)]
+
+    async def write():
+        now = datetime.utcnow()
+        await writer._save([{**row, "created_at": now} for row in batch])
+    return write
+
+
+case("history.insert_batch[1]")(functools.partial(_history_insert, 1))
+case("history.insert_batch[200]")(functools.partial(_history_insert, 200))
+
+
+# Runner
+async def _time(op: Callable[[], Any], number: int) -> float:
+    # timeit처럼 측정 중에는 GC를 끔
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if asyncio.iscoroutinefunction(op):
+            started = time.perf_counter()
+            for _ in range(number):
+                await op()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(number):
+            op()
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+async def measure(op: Callable[[], Any], min_time: float, repeat: int) -> Dict[str, Any]:
+    """반복 횟수를 min_time 이상으로 맞춘 뒤 repeat번 측정 (op당 μs)"""
+    number = 1
+    while True:
+        elapsed = await _time(op, number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = number * 10 if elapsed < min_time / 10 else number * 2
+
+    samples = [await _time(op, number) / number * 1e6 for _ in range(repeat)]
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "min_us": round(min(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "number": number
+    }
+
+
+async def run(cases: List[Tuple[str, Callable]], min_time: float, repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    saved_max_messages = settings.session_max_messages
+    try:
+        for name, setup in cases:
+            op = await setup()
+            results[name] = await measure(op, min_time, repeat)
+            settings.session_max_messages = saved_max_messages
+            print(f"{name:40s} {results[name]['min_us']:>12.3f} us", file=sys.stderr)
+    finally:
+        settings.session_max_messages = saved_max_messages
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+    normalize: bool
+) -> Dict[str, Any]:
+    """Baseline 대비 min_us 비율 (normalize면 reference 비율로 나눔)"""
+    scale = 1.0
+    if normalize and REFERENCE_CASE in baseline:
+        scale = results[REFERENCE_CASE]["min_us"] / baseline[REFERENCE_CASE]["min_us"]
+
+    cases, regressions = {}, []
+    for name, result in results.items():
+        if name == REFERENCE_CASE or name not in baseline:
+            continue
+        ratio = result["min_us"] / baseline[name]["min_us"] / scale
+        cases[name] = {
+            "baseline_us": baseline[name]["min_us"],
+            "current_us": result["min_us"],
+            "ratio": round(ratio, 3)
+        }
+        if ratio > 1 + threshold:
+            regressions.append(name)
+
+    return {
+        "machine_scale": round(scale, 3),
+        "threshold": threshold,
+        "cases": cases,
+        "new_cases": sorted(name for name in results if name not in baseline),
+        "regressions": regressions
+    }
+
+
+async def benchmark(args: argparse.Namespace, baseline: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    selected = [
+        (name, setup) for name, setup in CASES
+        if name == REFERENCE_CASE or not args.filter or re.search(args.filter, name)
+    ]
+    report: Dict[str, Any] = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+    try:
+        results = await run(selected, args.min_time, args.repeat)
+        if baseline is not None:
+            comparison = compare(results, baseline, args.threshold, args.normalize)
+            # 회귀로 보이는 case만 다시 측정해서 더 빠른 값을 채택 (일시적인 노이즈 제거)
+            for _ in range(args.confirm):
+                if not comparison["regressions"]:
+                    break
+                print(f"Re-measuring {len(comparison['regressions'])} regressed case(s)", file=sys.stderr)
+                rerun = await run(
+                    [(name, setup) for name, setup in CASES if name in comparison["regressions"]],
+                    args.min_time, args.repeat
+                )
+                for name, result in rerun.items():
+                    if result["min_us"] < results[name]["min_us"]:
+                        results[name] = result
+                comparison = compare(results, baseline, args.threshold, args.normalize)
+            report["comparison"] = comparison
+        report["results"] = results
+    finally:
+        await close_db()
+        shutil.rmtree(_TEMP_DIR, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    parser.add_argument("-k", "--filter", help="실행할 case 이름 정규식")
+    parser.add_argument("--min-time", type=float, default=0.05, help="측정 1회의 최소 시간 (초)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--threshold", type=float, default=0.25, help="허용하는 min_us 증가 비율")
+    parser.add_argument("--confirm", type=int, default=2, help="회귀로 보이는 case를 다시 측정할 횟수")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--normalize", action="store_true", help="reference case 비율로 머신 속도 보정")
+    parser.add_argument("--output", help="결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    if args.update_baseline:
+        report = asyncio.run(benchmark(args, None))
+        # 일부 case만 실행한 경우 나머지 baseline은 유지
+        report["results"] = {**(baseline or {}), **report["results"]}
+        with open(args.baseline, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return
+
+    if baseline is None:
+        print(f"No baseline at {args.baseline} (run with --update-baseline)", file=sys.stderr)
+    report = asyncio.run(benchmark(args, baseline))
+
+    exit_code = 0
+    if "comparison" in report:
+        for name in report["comparison"]["regressions"]:
+            case_result = report["comparison"]["cases"][name]
+            print(
+                f"REGRESSION {name}: {case_result['baseline_us']} us -> {case_result['current_us']} us "
+                f"(x{case_result['ratio']})",
+                file=sys.stderr
+            )
+        exit_code = 1 if report["comparison"]["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Stub upstream
+OpenRouter 대신 붙일 수 있는 로컬 OpenAI 호환 /chat/completions 서버.
+OpenRouter quota를 쓰지 않고 이 서버 자체의 처리량을 측정하기 위한 용도.
+
+    python -m benchmarks.stub_upstream --port 9100 --latency lognormal:0.4,0.5 --tokens-per-second 80
+    OPENROUTER_BASE_URL=http://127.0.0.1:9100/api/v1 python main.py
+
+- 비스트리밍 / 스트리밍(SSE chunk) / tool call 응답 지원
+- latency, 첫 token 시간은 분포로 지정 (fixed:S, uniform:LO,HI, normal:MEAN,STD, lognormal:MEDIAN,SIGMA)
+- 429 (Retry-After 포함) / 5xx 주입, 특정 모델만 항상 실패시키기 (fallback 경로 측정)
+- 요청마다 seed와 도착 순번으로 RNG를 만들어 같은 seed면 같은 순서의 응답/에러가 나옴
+"""
+from typing import Any, Callable, Dict, List, Optional, AsyncGenerator
+from dataclasses import dataclass, field
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog while agent servers stream tokens "
+    "through fallback chains and tools return results to the model"
+).split()
+
+# Tool 인자 예시 (benchmark에서 외부 네트워크를 타지 않는 tool 위주)
+SAMPLE_ARGUMENTS = {
+    "expression": "12 * 7",
+    "city": "Seoul",
+    "query": "benchmark",
+    "location": "Seoul",
+}
+PREFERRED_TOOLS = ("calculator", "weather")
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """'lognormal:0.4,0.5' 같은 지정을 초 단위 sampler로 변환"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        # median과 sigma로 지정 (mu = ln(median))
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Invalid distribution: {spec!r}")
+
+
+@dataclass
+class StubConfig:
+    seed: int = 42
+    latency: str = "lognormal:0.4,0.5"  # 비스트리밍 응답 전체 시간
+    first_token: str = "lognormal:0.25,0.4"  # 스트리밍 첫 token까지 시간
+    tokens_per_second: float = 80.0
+    completion_tokens: str = "uniform:40,160"
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: float = 2.0
+    tool_call_rate: float = 0.3
+    fail_models: List[str] = field(default_factory=list)
+
+
+class StubUpstream:
+    """요청별 응답을 결정하는 상태 (seed, 순번, 통계)"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.latency = parse_distribution(config.latency)
+        self.first_token = parse_distribution(config.first_token)
+        self.completion_tokens = parse_distribution(config.completion_tokens)
+        self._sequence = itertools.count()
+        self.stats: Dict[str, int] = {"requests": 0, "streams": 0, "tool_calls": 0, "429": 0, "5xx": 0}
+
+    def rng(self) -> random.Random:
+        # 도착 순번 기준 - 동시성과 상관없이 n번째 요청의 결정은 항상 같음
+        return random.Random(f"{self.config.seed}:{next(self._sequence)}")
+
+    def injected_error(self, rng: random.Random, model: str) -> Optional[JSONResponse]:
+        roll = rng.random()
+        if model in self.config.fail_models or roll < self.config.rate_5xx:
+            self.stats["5xx"] += 1
+            status = rng.choice((500, 502, 503))
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": f"Injected upstream error for {model}", "code": status}}
+            )
+        if roll < self.config.rate_5xx + self.config.rate_429:
+            self.stats["429"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit exceeded", "code": 429}},
+                headers={"Retry-After": f"{self.config.retry_after:g}"}
+            )
+        return None
+
+    def pick_tool_call(self, rng: random.Random, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """tools가 있고 아직 tool 결과를 받기 전이면 확률적으로 tool call 생성"""
+        tools = body.get("tools") or []
+        messages = body.get("messages") or []
+        if not tools or (messages and messages[-1].get("role") == "tool"):
+            return None
+        if rng.random() >= self.config.tool_call_rate:
+            return None
+
+        functions = [tool["function"] for tool in tools if tool.get("type") == "function"]
+        preferred = [f for f in functions if f["name"] in PREFERRED_TOOLS]
+        function = rng.choice(preferred or functions)
+        properties = (function.get("parameters") or {}).get("properties") or {}
+        required = (function.get("parameters") or {}).get("required") or []
+        arguments = {
+            name: SAMPLE_ARGUMENTS.get(name, "benchmark") if properties[name].get("type") == "string" else 1
+            for name in required if name in properties
+        }
+        self.stats["tool_calls"] += 1
+        return {
+            "id": f"call_{uuid.UUID(int=rng.getrandbits(128)).hex[:24]}",
+            "type": "function",
+            "function": {"name": function["name"], "arguments": json.dumps(arguments)}
+        }
+
+    def completion_text(self, rng: random.Random) -> List[str]:
+        count = max(1, int(self.completion_tokens(rng)))
+        return [rng.choice(WORDS) + " " for _ in range(count)]
+
+
+def usage(messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, int]:
+    # 대략 4글자 = 1 token
+    prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4 + 1
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="Stub OpenAI-compatible upstream")
+    stub = StubUpstream(config)
+    app.state.stub = stub
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub-model")
+        rng = stub.rng()
+        stub.stats["requests"] += 1
+
+        error = stub.injected_error(rng, model)
+        if error is not None:
+            # 실제 provider처럼 에러도 약간의 지연 후 반환
+            await asyncio.sleep(stub.first_token(rng) / 4)
+            return error
+
+        tool_call = stub.pick_tool_call(rng, body)
+        tokens = [] if tool_call else stub.completion_text(rng)
+        completion_id = f"chatcmpl-{uuid.UUID(int=rng.getrandbits(128)).hex}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            stub.stats["streams"] += 1
+            return StreamingResponse(
+                _stream(stub, rng, body, model, completion_id, created, tokens, tool_call),
+                media_type="text/event-stream"
+            )
+
+        await asyncio.sleep(stub.latency(rng))
+        message: Dict[str, Any] = {"role": "assistant", "content": "".join(tokens) or None}
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_call else "stop"
+            }],
+            "usage": usage(body.get("messages") or [], len(tokens) or 12)
+        }
+
+    # OPENROUTER_BASE_URL을 .../api/v1 또는 서버 루트로 지정해도 동작
+    app.add_api_route("/api/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, int]:
+        return stub.stats
+
+    return app
+
+
+def _chunk(completion_id: str, created: int, model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(payload)}\n\n".encode()
+
+
+async def _stream(
+    stub: StubUpstream,
+    rng: random.Random,
+    body: Dict[str, Any],
+    model: str,
+    completion_id: str,
+    created: int,
+    tokens: List[str],
+    tool_call: Optional[Dict[str, Any]]
+) -> AsyncGenerator[bytes, None]:
+    await asyncio.sleep(stub.first_token(rng))
+    yield _chunk(completion_id, created, model, {"role": "assistant", "content": ""})
+
+    if tool_call:
+        # 실제 provider처럼 이름/id 먼저, 인자는 나눠서 전송
+        arguments = tool_call["function"]["arguments"]
+        yield _chunk(completion_id, created, model, {"tool_calls": [{
+            "index": 0, "id": tool_call["id"], "type": "function",
+            "function": {"name": tool_call["function"]["name"], "arguments": ""}
+        }]})
+        middle = len(arguments) // 2
+        for part in (arguments[:middle], arguments[middle:]):
+            yield _chunk(completion_id, created, model, {"tool_calls": [{"index": 0, "function": {"arguments": part}}]})
+        yield _chunk(completion_id, created, model, {}, "tool_calls")
+    else:
+        interval = 1.0 / stub.config.tokens_per_second if stub.config.tokens_per_second > 0 else 0.0
+        started = time.perf_counter()
+        for index, token in enumerate(tokens):
+            # 누적 목표 시각에 맞춰 sleep (sleep 오차가 쌓이지 않도록)
+            delay = started + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield _chunk(completion_id, created, model, {"content": token})
+        yield _chunk(completion_id, created, model, {}, "stop")
+
+    if (body.get("stream_options") or {}).get("include_usage"):
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [], "usage": usage(body.get("messages") or [], len(tokens) or 12)
+        }
+        yield f"data: {json.dumps(payload)}\n\n".encode()
+    yield b"data: [DONE]\n\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--seed", type=int, default=StubConfig.seed)
+    parser.add_argument("--latency", default=StubConfig.latency, help="비스트리밍 응답 시간 분포 (초)")
+    parser.add_argument("--first-token", default=StubConfig.first_token, help="스트리밍 첫 token 시간 분포 (초)")
+    parser.add_argument("--tokens-per-second", type=float, default=StubConfig.tokens_per_second)
+    parser.add_argument("--completion-tokens", default=StubConfig.completion_tokens, help="응답 token 수 분포")
+    parser.add_argument("--rate-429", type=float, default=StubConfig.rate_429)
+    parser.add_argument("--rate-5xx", type=float, default=StubConfig.rate_5xx)
+    parser.add_argument("--retry-after", type=float, default=StubConfig.retry_after)
+    parser.add_argument("--tool-call-rate", type=float, default=StubConfig.tool_call_rate)
+    parser.add_argument("--fail-models", default="", help="항상 5xx를 반환할 모델 (쉼표 구분)")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        seed=args.seed,
+        latency=args.latency,
+        first_token=args.first_token,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        tool_call_rate=args.tool_call_rate,
+        fail_models=[m.strip() for m in args.fail_models.split(",") if m.strip()]
+    )
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import time
 import uvicorn
 import structlog
 
 from app.core.config import settings
-from app.models.database import init_db
+from app.core.serialization import DefaultJSONResponse
+from app.core.metrics import CONTENT_TYPE_LATEST, http_request_duration, register_stats, render_latest
+from app.core.tracing import start_trace
+from app.models.database import init_db, close_db
 from app.services.session_manager import session_manager
-from app.routers import chat, models
+from app.services.http_client import close_http_client
+from app.services.history_writer import history_writer
+from app.services.admission import admission
+from app.services.usage_rollup import backfill_rollups
+from app.routers import chat, models, usage
 # from app.routers import chat_simple  # save_message 함수가 없어서 임시 주석처리
 
 
@@ -40,6 +48,8 @@ async def lifespan(app: FastAPI):
     
     # Initialize database
     await init_db()
+    await backfill_rollups()
+    history_writer.start()
     logger.info("Database initialized")
     
     # Connect to Redis
@@ -51,9 +61,18 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Agent LLM POC server")
     
+    # Flush queued chat history before closing connections
+    await history_writer.close()
+    await close_db()
+    logger.info("Chat history flushed")
+    
     # Disconnect from Redis
     await session_manager.disconnect()
     logger.info("Redis disconnected")
+    
+    # Close shared OpenRouter connection pool
+    await close_http_client()
+    logger.info("HTTP connection pool closed")
 
 
 # Create FastAPI app
@@ -61,7 +80,8 @@ app = FastAPI(
     title=settings.app_name,
     description="LLM Agent with Tool Calling using OpenRouter",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=DefaultJSONResponse
 )
 
 # Configure CORS
@@ -73,9 +93,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics
+if settings.metrics_enabled:
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # path 대신 route template으로 label (session id 등으로 cardinality가 늘지 않도록)
+            route = request.scope.get("route")
+            http_request_duration.labels(
+                method=request.method,
+                route=route.path if route is not None else "unmatched",
+                status=str(status)
+            ).observe(time.perf_counter() - started)
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics"""
+        return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+    
+    register_stats("history_writer", history_writer.stats, "ChatHistory write-behind queue")
+    register_stats("admission", admission.stats, "Chat turn admission control")
+    if hasattr(session_manager, "stats"):
+        register_stats("session_store", session_manager.stats, "Session store")
+
+# Per-request stage tracing (Server-Timing header + one structured log line)
+if settings.tracing_enabled:
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        trace = start_trace()
+        response = await call_next(request)
+        response.headers["Server-Timing"] = trace.server_timing()
+        
+        # 스트리밍 응답은 헤더가 먼저 나가므로 Server-Timing에는 스트림 시작 전 단계만 포함됨.
+        # 로그는 body를 다 보낸 뒤 전체 단계로 남김
+        body_iterator = response.body_iterator
+        
+        async def traced_body():
+            try:
+                async for chunk in body_iterator:
+                    yield chunk
+            finally:
+                logger.info(
+                    "request_trace",
+                    method=request.method,
+                    path=request.url.path,
+                    status=response.status_code,
+                    **trace.summary()
+                )
+        
+        response.body_iterator = traced_body()
+        return response
+
 # Include routers
 app.include_router(chat.router)
 app.include_router(models.router)
+app.include_router(usage.router)
 # app.include_router(chat_simple.router)  # save_message 함수가 없어서 임시 주석처리
 
 
@@ -95,7 +173,9 @@ async def health_check():
     return {
         "status": "healthy",
         "app": settings.app_name,
-        "environment": settings.app_env
+        "environment": settings.app_env,
+        "history_writer": history_writer.stats(),
+        "admission": admission.stats()
     }
 
 
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# app.core.config.Settings는 import 시점에 환경 변수를 읽음
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.gettempdir()}/agent-llm-test.db")
+os.environ.setdefault("SESSION_BACKEND", "memory")
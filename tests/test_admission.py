@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(max_wait_seconds: float = 5.0) -> AdmissionController:
+    return AdmissionController(max_concurrency=1, max_queue_size=2, max_wait_seconds=max_wait_seconds)
+
+
+async def _queued(controller: AdmissionController, count: int) -> list:
+    """대기열에 count개의 acquire()를 세우고 task 반환"""
+    tasks = [asyncio.create_task(controller.acquire()) for _ in range(count)]
+    while len(controller._waiters) < count:
+        await asyncio.sleep(0)
+    return tasks
+
+
+async def test_fast_path_and_idempotent_release():
+    controller = _controller()
+    ticket = await controller.acquire()
+    assert controller.stats()["active"] == 1
+
+    ticket.release()
+    ticket.release()
+    assert controller.stats()["active"] == 0
+
+
+async def test_queue_full_is_rejected_immediately():
+    controller = _controller()
+    ticket = await controller.acquire()
+    waiters = await _queued(controller, 2)
+
+    with pytest.raises(AdmissionRejected) as e:
+        await controller.acquire()
+    assert e.value.reason == "queue_full"
+    assert e.value.retry_after >= 1
+
+    for task in waiters:
+        task.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    ticket.release()
+    assert controller.stats()["active"] == 0
+
+
+async def test_waiter_timeout_leaves_the_queue():
+    controller = _controller(max_wait_seconds=0.01)
+    ticket = await controller.acquire()
+
+    with pytest.raises(AdmissionRejected) as e:
+        await controller.acquire()
+    assert e.value.reason == "timeout"
+    assert controller.stats()["queued"] == 0
+
+    ticket.release()
+    assert controller.stats()["active"] == 0
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    controller = _controller()
+    ticket = await controller.acquire()
+    [waiter] = await _queued(controller, 1)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert controller.stats()["queued"] == 0
+
+    ticket.release()
+    assert controller.stats()["active"] == 0
+
+
+async def test_release_hands_the_slot_over_in_fifo_order():
+    controller = _controller()
+    ticket = await controller.acquire()
+    first, second = await _queued(controller, 2)
+
+    ticket.release()
+    first_ticket = await first
+    assert not second.done()
+    assert controller.stats()["active"] == 1
+
+    first_ticket.release()
+    (await second).release()
+    assert controller.stats()["active"] == 0
+
+
+async def test_slot_handed_to_a_cancelled_waiter_moves_on():
+    controller = _controller()
+    ticket = await controller.acquire()
+    first, second = await _queued(controller, 2)
+
+    # 슬롯을 넘겨받은 직후, first가 깨어나기 전에 취소됨
+    ticket.release()
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    second_ticket = await second
+    assert controller.stats()["active"] == 1
+    second_ticket.release()
+    assert controller.stats()["active"] == 0
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import openrouter_client
+from app.services.circuit_breaker import CircuitBreaker, CircuitState, circuit_breaker
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker(failure_threshold=2, cooldown_seconds=30, rate_limit_cooldown_seconds=60)
+
+
+def _half_open(breaker: CircuitBreaker, model_id: str):
+    """cooldown이 끝난 OPEN circuit (다음 allow_request가 시험 요청이 됨)"""
+    circuit = breaker._get(model_id)
+    circuit.state = CircuitState.OPEN
+    circuit.open_until = time.monotonic() - 1
+
+
+def test_opens_after_threshold_and_allows_one_probe():
+    breaker = _breaker()
+    breaker.record_failure("m", "500")
+    assert breaker.allow_request("m")
+    breaker.record_failure("m", "500")
+    assert not breaker.allow_request("m")
+
+    breaker._get("m").open_until = time.monotonic() - 1
+    assert breaker.allow_request("m")
+    assert breaker._get("m").state == CircuitState.HALF_OPEN
+    assert not breaker.allow_request("m")  # 시험 요청은 하나만
+
+    breaker.record_success("m")
+    assert breaker._get("m").state == CircuitState.CLOSED
+    assert breaker.allow_request("m")
+
+
+def test_failed_probe_reopens():
+    breaker = _breaker()
+    _half_open(breaker, "m")
+    assert breaker.allow_request("m")
+    breaker.record_failure("m", "502")
+    assert breaker._get("m").state == CircuitState.OPEN
+    assert not breaker.allow_request("m")
+
+
+def test_release_frees_the_probe_slot():
+    breaker = _breaker()
+    _half_open(breaker, "m")
+    assert breaker.allow_request("m")
+    breaker.release("m")
+    assert breaker.allow_request("m")
+
+
+def test_rate_limit_uses_retry_after():
+    breaker = _breaker()
+    breaker.record_failure("m", "Error code: 429", retry_after=5)
+    circuit = breaker._get("m")
+    assert circuit.state == CircuitState.OPEN
+    assert 4 < circuit.open_until - time.monotonic() <= 5
+
+
+@pytest.fixture
+def half_open_model():
+    model_id = "test/half-open-model"
+    _half_open(circuit_breaker, model_id)
+    yield model_id
+    circuit_breaker._circuits.pop(model_id, None)
+
+
+async def test_cancelled_probe_is_released(monkeypatch, half_open_model):
+    started = asyncio.Event()
+
+    async def hang(client, **kwargs):
+        started.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(openrouter_client, "create_completion", hang)
+    client = openrouter_client.OpenRouterClient()
+    monkeypatch.setattr(client, "_get_models_to_try", lambda model: [half_open_model])
+
+    task = asyncio.create_task(client.simple_chat_completion([{"role": "user", "content": "hi"}]))
+    await asyncio.wait_for(started.wait(), 1)
+    assert circuit_breaker._get(half_open_model).probe_in_flight
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # 취소된 시험 요청이 슬롯을 반환해야 다음 요청이 다시 시험할 수 있음
+    assert circuit_breaker.allow_request(half_open_model)
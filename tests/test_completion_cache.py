@@ -0,0 +1,53 @@
+import asyncio
+
+from app.services.completion_cache import CompletionCache
+
+
+def _cache() -> CompletionCache:
+    return CompletionCache(max_entries=10, ttl_seconds=60, use_redis=False)
+
+
+async def test_concurrent_requests_share_one_compute():
+    cache = _cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"content": "ok"}
+
+    results = await asyncio.gather(*(cache.get_or_compute("k", compute, lambda v: True) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert [cached for _, cached in results].count(False) == 1
+
+
+async def test_follower_computes_itself_when_leader_is_cancelled():
+    cache = _cache()
+    calls = []
+    release = asyncio.Event()
+
+    async def compute():
+        calls.append(1)
+        await release.wait()
+        return {"content": "ok"}
+
+    leader = asyncio.create_task(cache.get_or_compute("k", compute, lambda v: True))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_compute("k", compute, lambda v: True))
+    await asyncio.sleep(0)
+    assert len(calls) == 1
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    release.set()
+
+    value, cached = await asyncio.wait_for(follower, 1)
+    assert leader.cancelled()
+    assert value == {"content": "ok"}
+    assert cached is False
+    assert len(calls) == 2
+    assert cache._in_flight == {}
+    # 새 leader의 결과가 캐시됨
+    assert await cache.get_or_compute("k", compute, lambda v: True) == (value, True)
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.core.model_config import ModelConfig
+from app.services.openrouter_fallback_client import OpenRouterFallbackClient
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _models(*names: str):
+    return [
+        ModelConfig(id=f"hedge-test/{name}", name=name, supports_tools=True, is_free=False, context_length=100000)
+        for name in names
+    ]
+
+
+class FakeModels:
+    """모델별 동작을 지정하는 _try_model 대체"""
+
+    def __init__(self, behaviours):
+        self.behaviours = behaviours
+        self.started = []
+        self.cancelled = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def __call__(self, model_id, messages, tools=None, temperature=None, max_tokens=None):
+        self.started.append(model_id)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await self.behaviours[model_id.split("/")[1]](model_id)
+        except asyncio.CancelledError:
+            self.cancelled.append(model_id)
+            raise
+        finally:
+            self.in_flight -= 1
+
+
+def _sleep_then_succeed(seconds):
+    async def run(model_id):
+        await asyncio.sleep(seconds)
+        return {"success": True, "response": model_id, "model_used": model_id}
+    return run
+
+
+def _client(fake: FakeModels) -> OpenRouterFallbackClient:
+    client = OpenRouterFallbackClient()
+    client._try_model = fake
+    client._hedge_delay = lambda model_id: 0.01
+    return client
+
+
+async def _race(client, models, max_hedges):
+    return await client._race_models(models, MESSAGES, None, 0.0, 100, max_hedges)
+
+
+async def test_slow_primary_loses_and_is_cancelled():
+    fake = FakeModels({"slow": _sleep_then_succeed(10), "fast": _sleep_then_succeed(0)})
+    model, result, error = await _race(_client(fake), _models("slow", "fast"), max_hedges=1)
+    await asyncio.sleep(0)
+
+    assert model.id == "hedge-test/fast"
+    assert result["response"] == "hedge-test/fast"
+    assert error is None
+    assert fake.cancelled == ["hedge-test/slow"]
+
+
+async def test_max_hedges_bounds_requests_in_flight():
+    fake = FakeModels({name: _sleep_then_succeed(0.05) for name in ("a", "b", "c")})
+    model, result, _ = await _race(_client(fake), _models("a", "b", "c"), max_hedges=1)
+
+    assert model.id == "hedge-test/a"
+    assert fake.started == ["hedge-test/a", "hedge-test/b"]
+    assert fake.peak_in_flight == 2
+
+
+async def test_no_hedge_is_sequential_fallback():
+    async def fail(model_id):
+        return {"success": False, "error": "502", "model_used": model_id}
+
+    fake = FakeModels({"a": fail, "b": _sleep_then_succeed(0.02)})
+    model, _, _ = await _race(_client(fake), _models("a", "b"), max_hedges=0)
+
+    assert model.id == "hedge-test/b"
+    assert fake.peak_in_flight == 1
+
+
+async def test_success_in_same_batch_beats_api_key_error():
+    gate = asyncio.Event()
+    asyncio.get_running_loop().call_later(0.05, gate.set)
+
+    async def unauthorized(model_id):
+        await gate.wait()
+        raise RuntimeError("Invalid API key")
+
+    async def succeed(model_id):
+        await gate.wait()
+        return {"success": True, "response": model_id, "model_used": model_id}
+
+    fake = FakeModels({"bad": unauthorized, "good": succeed})
+    model, _, _ = await _race(_client(fake), _models("bad", "good"), max_hedges=1)
+    assert model.id == "hedge-test/good"
+
+    # 성공한 요청이 없으면 API 키 에러는 그대로 전파
+    fake = FakeModels({"bad": unauthorized})
+    gate.clear()
+    asyncio.get_running_loop().call_later(0.01, gate.set)
+    with pytest.raises(RuntimeError, match="Invalid API key"):
+        await _race(_client(fake), _models("bad"), max_hedges=1)
@@ -0,0 +1,36 @@
+import uuid
+
+from app.models.database import AsyncSessionLocal, ChatHistory, init_db
+from app.routers.chat import _etag_matches, _history_etag
+from app.services.chat_history import get_latest_id, iter_history
+
+
+def test_etag_matches_entity_tag_list():
+    etag = _history_etag(7, "export", True)
+
+    assert _etag_matches(etag, etag)
+    assert _etag_matches(f"W/{etag}", etag)
+    assert _etag_matches(f'"other", W/{etag}', etag)
+    assert _etag_matches("*", etag)
+    assert not _etag_matches(None, etag)
+    assert not _etag_matches('"other"', etag)
+    assert not _etag_matches(_history_etag(7, "export", False), etag)
+
+
+async def test_export_stops_at_etag_version():
+    await init_db()
+    session_id = f"etag-{uuid.uuid4()}"
+
+    async def add(text):
+        async with AsyncSessionLocal() as db:
+            db.add(ChatHistory(session_id=session_id, user_message=text, assistant_message=text, model_used="m"))
+            await db.commit()
+
+    await add("first")
+    latest_id = await get_latest_id(session_id)
+    await add("second")
+
+    exported = [item async for item in iter_history(session_id, batch_size=1, up_to_id=latest_id)]
+    assert [item["user_message"] for item in exported] == ["first"]
+    exported = [item async for item in iter_history(session_id, batch_size=1)]
+    assert [item["user_message"] for item in exported] == ["first", "second"]
@@ -0,0 +1,65 @@
+from app.services.history_writer import HistoryWriter
+
+
+def _writer() -> HistoryWriter:
+    return HistoryWriter(max_queue_size=10, batch_size=10, flush_interval_seconds=0, max_retries=2, retry_backoff_seconds=0)
+
+
+async def test_transient_failure_is_retried():
+    writer = _writer()
+    written, attempts = [], []
+
+    async def write(batch):
+        attempts.append(len(batch))
+        if len(attempts) < 3:
+            raise RuntimeError("database is locked")
+        written.extend(batch)
+
+    async def write_rollups(batch):
+        pass
+
+    writer._write, writer._write_rollups = write, write_rollups
+    await writer._save([{"session_id": "a"}, {"session_id": "b"}])
+
+    assert attempts == [2, 2, 2]
+    assert len(written) == 2
+    assert (writer.written, writer.failed, writer.retries) == (2, 0, 2)
+
+
+async def test_bad_row_is_isolated_after_retries():
+    writer = _writer()
+    written = []
+
+    async def write(batch):
+        if any(row.get("bad") for row in batch):
+            raise ValueError("bad row")
+        written.extend(batch)
+
+    rolled_up = []
+
+    async def write_rollups(batch):
+        rolled_up.extend(batch)
+
+    writer._write, writer._write_rollups = write, write_rollups
+    await writer._save([{"session_id": "a"}, {"session_id": "b", "bad": True}, {"session_id": "c"}])
+
+    assert [row["session_id"] for row in written] == ["a", "c"]
+    assert rolled_up == written
+    assert (writer.written, writer.failed) == (2, 1)
+
+
+async def test_rollup_failure_keeps_history_rows():
+    writer = _writer()
+    written = []
+
+    async def write(batch):
+        written.extend(batch)
+
+    async def write_rollups(batch):
+        raise RuntimeError("rollup failed")
+
+    writer._write, writer._write_rollups = write, write_rollups
+    await writer._save([{"session_id": "a"}])
+
+    assert len(written) == 1
+    assert (writer.written, writer.failed, writer.rollup_failed) == (1, 0, 1)
@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.agents.chat_agent import ChatAgent
+from app.core.model_config import ModelConfig
+from app.routers import chat
+from app.services.openrouter_fallback_client import OpenRouterFallbackClient
+from app.services.rate_limiter import RateLimited, rate_limiter
+from main import app
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _exhausted_models(*names: str):
+    """bucket이 빈 ":free" 모델 (기본 20 rpm → token 하나에 3초)"""
+    models = []
+    for name in names:
+        model = ModelConfig(id=f"rate-limited-test/{name}:free", name=name, supports_tools=True, is_free=True, context_length=100000)
+        rate_limiter._get(model.id).tokens = 0
+        models.append(model)
+    return models
+
+
+def _client(models) -> OpenRouterFallbackClient:
+    client = OpenRouterFallbackClient()
+    client._get_models_to_try = lambda use_tools, free_only: models
+    return client
+
+
+async def test_all_models_skipped_locally_is_rate_limited():
+    client = _client(_exhausted_models("a", "b"))
+
+    with pytest.raises(RateLimited) as e:
+        await client.chat_completion_with_fallback(MESSAGES, use_tools=False)
+    assert e.value.retry_after == 3
+
+
+async def test_upstream_failure_is_not_rate_limited():
+    models = _exhausted_models("c") + [
+        ModelConfig(id="rate-limited-test/upstream", name="upstream", supports_tools=True, is_free=False, context_length=100000)
+    ]
+    client = _client(models)
+
+    async def fail(model_id, messages, tools=None, temperature=None, max_tokens=None):
+        return {"success": False, "error": "Error code: 502", "model_used": model_id}
+
+    client._try_model = fail
+    result = await client.chat_completion_with_fallback(MESSAGES, use_tools=False)
+    assert result["content"] == "All models failed. Last error: Error code: 502"
+
+
+async def test_stream_reports_retry_after():
+    client = _client(_exhausted_models("d"))
+    events = [event async for event in client.stream_chat_completion_with_fallback(MESSAGES, use_tools=False)]
+    assert events == [{"type": "error", "error": "Rate limit reached for all models, retry after 3s", "retry_after": 3}]
+
+
+async def test_agent_does_not_switch_to_mock_mode():
+    agent = ChatAgent()
+
+    async def rate_limited(**kwargs):
+        raise RateLimited(2.5)
+
+    agent.openrouter_client.chat_completion_with_fallback = rate_limited
+    with pytest.raises(RateLimited):
+        await agent.process_message("rate-limited-test", "hi")
+    assert not agent.use_mock_mode
+
+
+def test_message_endpoint_returns_503_with_retry_after(monkeypatch):
+    async def rate_limited(**kwargs):
+        raise RateLimited(4.2)
+
+    monkeypatch.setattr(chat.chat_agent, "process_message", rate_limited)
+    response = TestClient(app).post("/api/chat/message", json={"message": "hi"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
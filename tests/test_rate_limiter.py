@@ -0,0 +1,106 @@
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rate_limiter as rate_limiter_module
+from app.services.rate_limiter import RateLimiter, WINDOW_SECONDS, parse_reset, parse_retry_after, rate_limit_delay
+
+
+def _limiter(requests_per_minute: float = 60) -> RateLimiter:
+    return RateLimiter(
+        requests_per_minute=requests_per_minute,
+        free_requests_per_minute=6,
+        burst=2,
+        max_concurrency=4,
+        decrease_factor=0.5,
+        backoff_seconds=1.0
+    )
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after("-3") == 0
+    assert 28 <= parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_parse_reset_formats():
+    assert 18 <= parse_reset(str((time.time() + 20) * 1000)) <= 20  # epoch ms
+    assert 18 <= parse_reset(str(time.time() + 20)) <= 20  # epoch s
+    assert parse_reset("12") == 12  # 남은 초
+    assert parse_reset(str((time.time() - 5) * 1000)) == 0
+    assert parse_reset("") is None
+    assert parse_reset("never") is None
+
+
+def test_rate_limited_delay_prefers_retry_after_then_reset_then_backoff():
+    limiter = _limiter()
+    assert limiter.record_rate_limited("a", {"Retry-After": "3", "X-RateLimit-Reset": "9"}) == 3
+    assert limiter.record_rate_limited("b", {"x-ratelimit-reset": "9"}) == 9
+
+    # 헤더 없는 연속 429는 backoff를 2배씩
+    assert [limiter.record_rate_limited("c") for _ in range(3)] == [1.0, 2.0, 4.0]
+    limiter.record_success("c")
+    assert limiter.record_rate_limited("c") == 1.0
+
+
+def test_aimd_decrease_and_recovery():
+    limiter = _limiter(requests_per_minute=60)
+    limiter.record_rate_limited("m")
+    limit = limiter._get("m")
+    assert limit.concurrency == 2.0
+    assert limit.rate == pytest.approx(30 / WINDOW_SECONDS)
+    assert limiter.try_acquire("m") == "blocked"
+
+    for _ in range(100):
+        limiter.record_success("m")
+    assert limit.concurrency == 4.0
+    assert limit.rate == pytest.approx(60 / WINDOW_SECONDS)
+
+
+def test_try_acquire_reasons_and_release():
+    limiter = _limiter(requests_per_minute=0)  # bucket 없음 - 동시성만 제한
+    assert [limiter.try_acquire("m") for _ in range(5)] == [None, None, None, None, "concurrency"]
+    limiter.release("m")
+    assert limiter.try_acquire("m") is None
+
+    # ":free" 모델은 기본 bucket (burst=2)
+    assert [limiter.try_acquire("m:free") for _ in range(3)] == [None, None, "bucket_empty"]
+    assert limiter._get("m:free").skipped == 1
+    assert not limiter.is_available("m:free")
+
+
+def test_headers_teach_the_limit():
+    limiter = _limiter(requests_per_minute=0)
+    limiter.record_success("m", {"X-RateLimit-Limit": "120"})
+    limit = limiter._get("m")
+    assert limit.max_rate == pytest.approx(2.0)
+    assert limit.capacity == 2
+
+    limiter.record_success("m", {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"})
+    assert limiter.try_acquire("m") == "blocked"
+    assert 29 <= limiter.blocked_for("m") <= 30
+
+
+def test_rate_limit_delay_only_for_429(monkeypatch):
+    limiter = _limiter()
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", limiter)
+
+    error = SimpleNamespace(status_code=429, response=SimpleNamespace(headers={"retry-after": "4"}))
+    assert rate_limit_delay("m", error) == 4
+    assert limiter._get("m").rate_limited == 1
+
+    assert rate_limit_delay("m", RuntimeError("upstream 502")) is None
+    assert limiter._get("m").rate_limited == 1
+
+
+def test_available_in_covers_refill_and_block():
+    limiter = _limiter(requests_per_minute=60)
+    assert limiter.available_in("m") == 0
+    limiter._get("m").tokens = 0
+    assert limiter.available_in("m") == pytest.approx(1.0, abs=0.05)
+    limiter.record_rate_limited("m", {"Retry-After": "9"})
+    assert limiter.available_in("m") == pytest.approx(9, abs=0.05)
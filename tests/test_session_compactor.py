@@ -0,0 +1,36 @@
+from app.core.config import settings
+from app.services.session_compactor import needs_compaction, session_compactor
+from app.services.session_manager import session_manager
+
+
+def _messages(count: int, content: str = "short message."):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": content, "timestamp": f"2024-01-01T00:00:{i:02d}"}
+        for i in range(count)
+    ]
+
+
+def test_short_sessions_are_left_alone():
+    assert not needs_compaction(_messages(settings.session_max_messages - 2))
+
+
+def test_compacts_before_the_message_cap_trims_history():
+    # 토큰은 적어도 다음 턴(2개)에서 session_max_messages를 넘으면 요약
+    assert needs_compaction(_messages(settings.session_max_messages - 1))
+
+
+def test_compacts_when_tokens_exceed_trigger():
+    assert needs_compaction(_messages(settings.compaction_keep_messages + 2, "word " * settings.compaction_trigger_tokens))
+
+
+async def test_compact_summarizes_instead_of_losing_old_turns(monkeypatch):
+    monkeypatch.setattr(settings, "compaction_use_llm", False)
+    session_id = await session_manager.create_session()
+    for i in range(settings.session_max_messages - 1):
+        await session_manager.add_message(session_id, "user" if i % 2 == 0 else "assistant", f"Message number {i}.")
+
+    assert await session_compactor.compact(session_id)
+
+    session = await session_manager.get_session(session_id)
+    assert len(session["messages"]) == settings.compaction_keep_messages
+    assert "Message number 0." in session["context"]["summary"]
@@ -0,0 +1,64 @@
+from app.services.session_manager_cached import CachedSession, CachedSessionManager
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commands = []
+
+    async def on_connect(self):
+        self.commands.append(("on_connect",))
+
+    async def send_command(self, *args):
+        self.commands.append(args)
+
+    async def read_response(self):
+        return b"OK"
+
+
+def _manager() -> CachedSessionManager:
+    manager = CachedSessionManager(max_entries=10, max_connections=4)
+    manager._listener_id = 7
+    return manager
+
+
+def _cached(manager: CachedSessionManager, session_id: str):
+    manager._put(session_id, CachedSession(data={"created_at": "", "messages": [], "context": {}}, rev=1, touched_at=0.0))
+
+
+async def test_every_pooled_connection_enables_tracking():
+    manager = _manager()
+    connections = [FakeConnection(), FakeConnection()]
+    for connection in connections:
+        await manager._enable_tracking(connection)
+
+    for connection in connections:
+        assert connection.commands[1] == (
+            "CLIENT", "TRACKING", "ON", "REDIRECT", 7, "BCAST", "PREFIX", "session:", "NOLOOP"
+        )
+
+
+async def test_pool_growth_keeps_cache_but_reconnect_clears_it():
+    manager = _manager()
+    first, second = FakeConnection(), FakeConnection()
+    await manager._enable_tracking(first)
+    _cached(manager, "a")
+
+    # 새 연결 추가 - 기존 연결이 계속 추적 중이므로 캐시 유지
+    await manager._enable_tracking(second)
+    assert "a" in manager._cache
+
+    # 기존 연결이 다시 연결됨 - 끊긴 동안의 무효화를 놓쳤을 수 있음
+    await manager._enable_tracking(first)
+    assert "a" not in manager._cache
+
+
+def test_duplicate_invalidations_are_counted_once():
+    manager = _manager()
+    _cached(manager, "a")
+
+    # pool 연결마다 같은 BCAST 무효화가 옴
+    for _ in range(3):
+        manager._invalidate(["session:a:meta"])
+
+    assert manager._cache["a"].suspect == 3
+    assert manager.invalidations == 1
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.tools.tool_cache import ToolResultCache
+
+
+async def test_follower_executes_itself_when_leader_is_cancelled():
+    cache = ToolResultCache(sqlite_path=None)
+    calls = []
+    release = asyncio.Event()
+
+    async def execute():
+        calls.append(1)
+        await release.wait()
+        return {"success": True, "result": 2}
+
+    leader = asyncio.create_task(cache.get_or_execute("calculator", 60, 10, {"expression": "1+1"}, execute))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_execute("calculator", 60, 10, {"expression": "1+1"}, execute))
+    await asyncio.sleep(0)
+    assert len(calls) == 1
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    release.set()
+
+    result = await asyncio.wait_for(follower, 1)
+    assert leader.cancelled()
+    assert result == {"success": True, "result": 2}
+    assert len(calls) == 2
+    assert cache._in_flight == {}
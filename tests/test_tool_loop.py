@@ -0,0 +1,122 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.circuit_breaker import circuit_breaker
+from app.services.rate_limiter import rate_limiter
+from app.services.tool_executor import FOLLOWUP_FAILED_MESSAGE, Deadline, run_tool_loop
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def _response(content=None, tool_calls=None):
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    usage = SimpleNamespace(prompt_tokens=1, completion_tokens=1, total_tokens=2)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def _tool_request(call_id: str):
+    call = SimpleNamespace(id=call_id, function=SimpleNamespace(name="missing_tool", arguments="{}"))
+    return _response(tool_calls=[call])
+
+
+class FakeClient:
+    """with_raw_response.create()가 outcomes를 순서대로 반환 (예외면 raise)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=self))
+
+    async def create(self, **kwargs):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(headers={}, parse=lambda: outcome)
+
+
+async def _run(client, model_id):
+    return await run_tool_loop(
+        client=client,
+        model_id=model_id,
+        messages=[{"role": "user", "content": "hi"}],
+        response=_tool_request("call_1"),
+        tools=None,
+        temperature=0.0,
+        max_tokens=100,
+        deadline=Deadline(30)
+    )
+
+
+async def test_failed_followup_returns_tool_results():
+    model_id = "tool-loop-test/5xx"
+    result = await _run(FakeClient(UpstreamError(500)), model_id)
+
+    assert result["content"] == FOLLOWUP_FAILED_MESSAGE
+    assert result["error"] == "Error code: 500"
+    assert [r["tool_call_id"] for r in result["tool_calls"]] == ["call_1"]
+    assert circuit_breaker._get(model_id).consecutive_failures == 1
+
+
+async def test_failure_in_a_later_round_keeps_earlier_rounds():
+    model_id = "tool-loop-test/later"
+    result = await _run(FakeClient(_tool_request("call_2"), UpstreamError(502)), model_id)
+
+    assert [r["tool_call_id"] for r in result["tool_calls"]] == ["call_1", "call_2"]
+    assert result["usage"]["total_tokens"] == 4
+    assert "error" in result
+
+
+async def test_rate_limited_followup_backs_off_the_model():
+    model_id = "tool-loop-test/429"
+    result = await _run(FakeClient(UpstreamError(429, {"retry-after": "7"})), model_id)
+
+    assert "error" in result
+    assert 6 <= rate_limiter.blocked_for(model_id) <= 7
+
+
+async def test_successful_followup_answers():
+    result = await _run(FakeClient(_response(content="done")), "tool-loop-test/ok")
+    assert result["content"] == "done"
+    assert "error" not in result
+
+
+async def test_followup_uses_a_token_and_returns_the_slot():
+    model_id = "tool-loop-test/charged:free"
+    limit = rate_limiter._get(model_id)
+    tokens = limit.tokens
+
+    await _run(FakeClient(_tool_request("call_2"), _response(content="done")), model_id)
+
+    assert limit.tokens == pytest.approx(tokens - 2, abs=0.1)
+    assert limit.in_flight == 0
+
+
+async def test_followup_waits_for_a_token_within_the_deadline():
+    model_id = "tool-loop-test/refill:free"
+    rate_limiter._get(model_id).tokens = 0.9  # 20 rpm → 0.3초 후 token
+    client = FakeClient(_response(content="done"))
+
+    started = time.monotonic()
+    result = await _run(client, model_id)
+
+    assert result["content"] == "done"
+    assert 0.2 <= time.monotonic() - started < 2
+
+
+async def test_followup_is_not_sent_when_the_limit_outlasts_the_deadline():
+    model_id = "tool-loop-test/blocked:free"
+    rate_limiter.record_rate_limited(model_id, {"Retry-After": "60"})
+    client = FakeClient(_response(content="never sent"))
+
+    result = await _run(client, model_id)
+
+    assert result["error"] == f"Rate limit reached for {model_id}"
+    assert [r["tool_call_id"] for r in result["tool_calls"]] == ["call_1"]
+    assert len(client.outcomes) == 1
+    assert circuit_breaker._get(model_id).consecutive_failures == 0
@@ -0,0 +1,26 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models.database import UsageDaily
+from app.services.usage_rollup import _upsert, upsert_insert
+
+
+@pytest.mark.parametrize("dialect_name, dialect", [("sqlite", sqlite.dialect()), ("postgresql", postgresql.dialect())])
+def test_upsert_compiles_per_dialect(dialect_name, dialect):
+    stmt = _upsert(
+        dialect_name,
+        UsageDaily,
+        [{"day": date(2024, 1, 1), "model_used": "m", "requests": 1}],
+        ["day", "model_used"],
+        ["requests"]
+    )
+    sql = str(stmt.compile(dialect=dialect))
+    assert "ON CONFLICT (day, model_used) DO UPDATE" in sql
+    assert "requests = (usage_daily.requests + excluded.requests)" in sql
+
+
+def test_unsupported_dialect_fails_clearly():
+    with pytest.raises(RuntimeError, match="mysql"):
+        upsert_insert("mysql")